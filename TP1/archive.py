@@ -0,0 +1,223 @@
+import gzip
+import threading
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import urlparse
+
+from sink import JsonlSink
+
+
+class HtmlArchive:
+    """
+    WARC-style store of the raw HTML of crawled pages.
+
+    Each page is written as a WARC `resource` record compressed in its own
+    gzip member (the usual `.warc.gz` layout), and its offset and length
+    are appended to a tab-separated index next to the archive. One page can
+    therefore be read back with a single seek and the decompression of its
+    member only. All methods are thread safe.
+
+    Parameters
+    ----------
+    path : str
+        Path to the archive, e.g. "output/pages.warc.gz". The index is
+        written to `path + ".idx"`.
+    mode : str, optional
+        "w" to start a new archive, "a" to append to an existing one.
+    """
+
+    def __init__(self, path, mode="w"):
+        self.path = path
+        self.fp = open(path, mode + "b")
+        self.fp.seek(0, 2) #appended records start at the current end
+        self.index = open(index_path(path), mode, encoding="utf-8")
+        self.lock = threading.Lock()
+        self.written = 0
+
+    def write(self, url, html):
+        """
+        Append the raw HTML of a page.
+
+        Parameters
+        ----------
+        url : str
+            URL of the page.
+        html : bytes
+            Raw HTML content of the page, as fetched.
+        """
+        header = (
+            "WARC/1.0\r\n"
+            "WARC-Type: resource\r\n"
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+            f"WARC-Date: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            "Content-Type: text/html\r\n"
+            f"Content-Length: {len(html)}\r\n"
+            "\r\n"
+        ).encode("utf-8")
+        member = gzip.compress(header + html + b"\r\n\r\n")
+        with self.lock:
+            offset = self.fp.tell()
+            self.fp.write(member)
+            self.index.write(f"{offset}\t{len(member)}\t{url}\n")
+            self.written += 1
+
+    def flush(self):
+        """
+        Flush the archive, then its index, so the index never points past
+        the end of the archive.
+        """
+        with self.lock:
+            self.fp.flush()
+            self.index.flush()
+
+    def close(self):
+        self.flush()
+        self.fp.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def index_path(path):
+    return str(path) + ".idx"
+
+
+def parse_record(data):
+    """
+    Split a decompressed WARC record into its headers and its content.
+
+    Returns
+    -------
+    tuple
+        (dict of headers, bytes of content)
+    """
+    head, _, rest = data.partition(b"\r\n\r\n")
+    headers = {}
+    for line in head.decode("utf-8").split("\r\n")[1:]: #skip the WARC/1.0 line
+        name, _, value = line.partition(":")
+        headers[name.strip()] = value.strip()
+    return headers, rest[:int(headers["Content-Length"])]
+
+
+class ArchiveReader:
+    """
+    Random and sequential access to an `HtmlArchive`.
+
+    The index is loaded in memory (url -> offset, length). Records listed
+    in the index but cut short on disk, e.g. after a crash, are ignored.
+    When a page was archived several times, the latest copy wins.
+
+    Parameters
+    ----------
+    path : str
+        Path to the archive.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fp = open(path, "rb")
+        size = self.fp.seek(0, 2)
+        self.entries = {} #url -> (offset, length), in archive order
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            for line in f:
+                offset, length, url = line.rstrip("\n").split("\t", 2)
+                offset, length = int(offset), int(length)
+                if offset + length <= size:
+                    self.entries.pop(url, None)
+                    self.entries[url] = (offset, length)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def urls(self):
+        return list(self.entries)
+
+    def get(self, url):
+        """
+        Return the raw HTML of a page, decompressing only its record.
+
+        Raises
+        ------
+        KeyError
+            If the page is not in the archive.
+        """
+        offset, length = self.entries[url]
+        self.fp.seek(offset)
+        return parse_record(gzip.decompress(self.fp.read(length)))[1]
+
+    def __iter__(self):
+        """
+        Iterate over (url, raw HTML) pairs in archive order.
+        """
+        for url in self.entries:
+            yield url, self.get(url)
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def reextract(archive_path, output_path, base_url=None, extractor="fast", compress=False, batch_size=100):
+    """
+    Re-run the extraction of an archived crawl offline, without any network
+    access, and write the records in the `crawl_to_jsonl` format.
+
+    Parameters
+    ----------
+    archive_path : str
+        Path to an `HtmlArchive`.
+    output_path : str
+        Path to the output JSONL file.
+    base_url : str, optional
+        Base URL of the crawl, used to keep internal links only. If None,
+        the host of the first archived page is used.
+    extractor : str, optional
+        Extractor backend, "fast" (default) or "soup".
+    compress : bool, optional
+        If True, the output is gzip-compressed JSONL.
+
+    Returns
+    -------
+    int
+        Number of records written.
+    """
+    from crawler import Crawler #imported here, crawler imports this module
+
+    nb_records = 0
+    with ArchiveReader(archive_path) as reader, \
+            JsonlSink(output_path, batch_size=batch_size, compress=compress) as sink:
+        if base_url is None and len(reader):
+            parsed = urlparse(reader.urls()[0])
+            base_url = f"{parsed.scheme}://{parsed.netloc}/"
+        parser = Crawler(base_url, extractor=extractor)
+        for url, html in reader:
+            soup = parser.extractor.parse(html)
+            sink.write({
+                "url": url,
+                "title": parser.extract_title(soup),
+                "description": parser.extract_first_paragraph(soup),
+                "links": parser.extract_links(soup, url)
+            })
+            parser.pop_rewrites()
+            nb_records += 1
+    return nb_records
+
+
+if __name__ == "__main__":
+    output_dir = Path("TP1/output")
+    nb_records = reextract(output_dir / "pages.warc.gz", output_dir / "products.reextracted.jsonl")
+    print(f"{nb_records} records re-extracted")
@@ -0,0 +1,300 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from crawler import Crawler
+
+
+class HostScheduler:
+    """
+    Per-host token scheduler used to keep the crawl polite while many
+    requests are in flight.
+
+    Each host owns a single token: a request may only start once the
+    previous request to the same host started at least `delay` seconds ago.
+    Requests reserve their start slot in order, and requests to different
+    hosts never wait for each other. The scheduler works both from asyncio
+    (`acquire`) and from threads (`acquire_blocking`).
+    """
+
+    def __init__(self, default_delay=1.0):
+        self.default_delay = default_delay
+        self.delays = {} #host -> delay in seconds
+        self.next_slot = {} #host -> earliest start time of the next request
+        self.lock = threading.Lock()
+
+    def set_delay(self, host, delay):
+        """
+        Set the minimum interval between two requests to a host.
+
+        Parameters
+        ----------
+        host : str
+            Network location (netloc) of the host.
+        delay : float or None
+            Delay in seconds. If None, the default delay is used.
+        """
+        self.delays[host] = self.default_delay if delay is None else delay
+
+    def get_delay(self, host):
+        return self.delays.get(host, self.default_delay)
+
+    def configure(self, host, robot_parser):
+        """
+        Set the delay of a host from its robots.txt rules.
+        """
+        self.set_delay(host, robots_delay(robot_parser, self.default_delay))
+
+    def reserve(self, host):
+        """
+        Reserve the next start slot of a host.
+
+        Returns
+        -------
+        float
+            Number of seconds to wait before the request may start.
+        """
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot.get(host, 0.0), now)
+            self.next_slot[host] = slot + self.get_delay(host)
+        return slot - now
+
+    async def acquire(self, host):
+        """
+        Wait until a request to the given host is allowed to start.
+
+        Parameters
+        ----------
+        host : str
+            Network location (netloc) of the host.
+        """
+        wait = self.reserve(host)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, host):
+        """
+        Thread version of `acquire`.
+        """
+        wait = self.reserve(host)
+        if wait > 0:
+            time.sleep(wait)
+
+
+def robots_delay(robot_parser, default=1.0):
+    """
+    Compute the politeness delay of a host from its robots.txt rules.
+
+    Parameters
+    ----------
+    robot_parser : urllib.robotparser.RobotFileParser
+        Parser already loaded with the robots.txt of the host.
+    default : float or None, optional
+        Delay used when robots.txt specifies neither a crawl delay nor a
+        request rate (default is 1 second, as in `Crawler.be_polite`).
+
+    Returns
+    -------
+    float or None
+        Minimum number of seconds between two requests.
+    """
+    delay = robot_parser.crawl_delay("*")
+    if delay is not None:
+        return float(delay)
+    rate = robot_parser.request_rate("*")
+    if rate is not None and rate.requests > 0:
+        return rate.seconds / rate.requests
+    return default
+
+
+class AsyncCrawler(Crawler):
+    """
+    Crawler running many requests concurrently with asyncio.
+
+    The frontier, the robots.txt checks and the `get_page_content` /
+    `extract_*` helpers are inherited from `Crawler`. Blocking network and
+    parsing calls run in a thread pool, while a `HostScheduler` enforces the
+    robots.txt crawl delay (or request rate) per host. With a
+    `rate_control.AdaptiveRateController`, the controller is the scheduler
+    and its window also caps the requests in flight.
+    """
+
+    def __init__(self, base_url, concurrency=8, checkpoint_dir=None, checkpoint_every=100, cache_dir=None,
+                 extractor="fast", robots_cache_dir=None, robots_ttl=86400, canonicalizer=None,
+                 visited_capacity=None, visited_error_rate=0.001, metrics=None,
+                 rate_control=None, max_retries=2, fetch_timeout=30, scorer=None):
+        super().__init__(base_url, checkpoint_dir, checkpoint_every, cache_dir, extractor,
+                         robots_cache_dir, robots_ttl, canonicalizer, visited_capacity, visited_error_rate,
+                         metrics, rate_control, max_retries, fetch_timeout, scorer)
+        self.concurrency = concurrency
+        self.scheduler = rate_control or HostScheduler()
+
+    def in_flight_limit(self):
+        if self.rate_control is None:
+            return self.concurrency
+        return min(self.concurrency, self.rate_control.limit())
+
+    async def fetch_page(self, url, executor):
+        """
+        Fetch and parse one page once its host token is available.
+
+        Parameters
+        ----------
+        url : str
+            URL of the page to fetch.
+        executor : concurrent.futures.Executor
+            Executor running the blocking fetch and parse.
+
+        Returns
+        -------
+        dict or None
+            Extracted page information, or None if crawling is not allowed.
+        """
+        if not self.is_parsing_allowed(url):
+            return None
+        host = urlparse(url).netloc
+        if host not in self.scheduler.delays:
+            self.scheduler.configure(host, self.robots.get(url))
+        with self.metrics.stage("politeness"):
+            await self.scheduler.acquire(host)
+
+        loop = asyncio.get_running_loop()
+        soup = await loop.run_in_executor(executor, self.get_page_content, url)
+        if soup is None:
+            return None
+        with self.metrics.stage("extract"):
+            title = self.extract_title(soup)
+            desc = self.extract_first_paragraph(soup)
+        with self.metrics.stage("links"):
+            links = self.extract_links(soup, url)
+            self.account_rewrites(self.pop_rewrites())
+        return {
+            "url": url,
+            "title": title,
+            "description": desc,
+            "links": links
+        }
+
+    async def iter_crawl_async(self, start_url=None, max_pages=50):
+        """
+        Crawl the website with up to `concurrency` requests in flight (fewer
+        while the rate controller backs off).
+
+        URLs are marked visited when they are dispatched, so a checkpoint is
+        only taken once every page in flight has been yielded: dispatching
+        pauses every `checkpoint_every` pages until the pending fetches
+        complete. A page whose fetch or parsing raises is counted as a
+        "failed_page" error and skipped.
+
+        Parameters
+        ----------
+        start_url : str, optional
+            URL from which the crawl starts. If None, the base URL is used.
+        max_pages : int, optional
+            Maximum number of pages to crawl (default is 50).
+
+        Yields
+        ------
+        dict
+            Extracted information of a visited page, in completion order.
+        """
+        parsed = urlparse(self.base_url)
+        robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.init_robot_parser, robots_url)
+        if start_url is None:
+            start_url = self.base_url
+
+        nb_pages = 0
+        visited = self.frontier.visited
+        self.metrics.start()
+        self.add_to_queue(start_url, visited)
+        pending = set()
+        checkpoint_due = False #wait for the pages in flight, then checkpoint
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                while True:
+                    # fill the pipeline without dispatching more than max_pages
+                    while (not checkpoint_due and len(pending) < self.in_flight_limit()
+                           and nb_pages + len(pending) < max_pages):
+                        with self.metrics.stage("queue"):
+                            current_url = self.pop_next_url()
+                        if current_url is None:
+                            break
+                        if current_url in visited:
+                            continue
+                        self.frontier.mark_visited(current_url)
+                        pending.add(asyncio.ensure_future(self.fetch_page(current_url, executor)))
+
+                    if not pending:
+                        if checkpoint_due:
+                            self.save_checkpoint()
+                            checkpoint_due = False
+                            continue
+                        break
+
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        try:
+                            record = task.result()
+                        except Exception:
+                            self.metrics.count_error("failed_page") #fetch errors are also counted by type
+                            continue
+                        if record is None:
+                            continue
+                        with self.metrics.stage("queue"):
+                            for link in record["links"]:
+                                self.add_to_queue(link, visited, parent=record["url"])
+                        self.metrics.gauge("frontier", len(self.frontier))
+                        self.metrics.gauge("in_flight", len(pending))
+                        nb_pages += 1
+                        self.metrics.count_page()
+                        yield record
+                        if nb_pages % self.checkpoint_every == 0:
+                            checkpoint_due = True
+            finally:
+                for task in pending:
+                    task.cancel()
+
+        self.save_checkpoint()
+        self.metrics.finish()
+
+    def iter_crawl(self, start_url=None, max_pages=50):
+        """
+        Synchronous generator driving `iter_crawl_async` on a private event
+        loop, so `crawl` and `crawl_to_jsonl` work unchanged.
+
+        Parameters
+        ----------
+        start_url : str, optional
+            URL from which the crawl starts. If None, the base URL is used.
+        max_pages : int, optional
+            Maximum number of pages to crawl (default is 50).
+
+        Yields
+        ------
+        dict
+            Extracted information of a visited page.
+        """
+        loop = asyncio.new_event_loop()
+        agen = self.iter_crawl_async(start_url=start_url, max_pages=max_pages)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(agen.aclose())
+            loop.close()
+
+
+if __name__ == "__main__":
+    crawler = AsyncCrawler("https://web-scraping.dev/products", concurrency=8)
+    start = time.perf_counter()
+    nb_pages = crawler.crawl_to_jsonl("TP1/output/products.jsonl", max_pages=50)
+    print(f"{nb_pages} pages in {time.perf_counter() - start:.1f}s")
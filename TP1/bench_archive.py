@@ -0,0 +1,61 @@
+import gzip
+import os
+import random
+import tempfile
+import time
+
+import jsonlines
+
+from archive import ArchiveReader, reextract
+from crawler import Crawler
+from standin_server import CatalogServer
+
+
+class NoDelayCrawler(Crawler):
+    def be_polite(self, url=None):
+        pass #the stand-in server does not need politeness
+
+
+if __name__ == "__main__":
+    server = CatalogServer(nb_products=300, latency=0.002, padding=5000).start()
+    with tempfile.TemporaryDirectory(prefix="archive_") as out:
+        plain, packed = f"{out}/products.jsonl", f"{out}/products.jsonl.gz"
+        warc, again = f"{out}/pages.warc.gz", f"{out}/products.again.jsonl"
+        try:
+            start = time.perf_counter()
+            NoDelayCrawler(f"{server.base_url}/products").crawl_to_jsonl(plain, max_pages=320)
+            crawl_time = time.perf_counter() - start
+            NoDelayCrawler(f"{server.base_url}/products").crawl_to_jsonl(
+                packed, max_pages=320, compress=True, archive_path=warc)
+        finally:
+            server.stop()
+
+        with jsonlines.open(plain) as f:
+            records = list(f)
+        with gzip.open(packed, "rt", encoding="utf-8") as f:
+            assert list(jsonlines.Reader(f)) == records
+        print(f"records        : {len(records)}, crawl {crawl_time:.2f}s")
+        print(f"jsonl          : {os.path.getsize(plain) / 1e3:.0f}kB plain,"
+              f" {os.path.getsize(packed) / 1e3:.0f}kB gzip")
+
+        with ArchiveReader(warc) as reader:
+            raw_size = sum(len(html) for _, html in reader)
+            print(f"html archive   : {raw_size / 1e6:.2f}MB raw, {os.path.getsize(warc) / 1e6:.2f}MB on disk")
+
+            start = time.perf_counter()
+            reextract(warc, again)
+            elapsed = time.perf_counter() - start
+            with jsonlines.open(again) as f:
+                assert list(f) == records
+            print(f"re-extraction  : {elapsed:.2f}s, {len(records) / elapsed:.0f} pages/s, identical records")
+
+            urls = random.Random(0).sample(reader.urls(), 50)
+            start = time.perf_counter()
+            for url in urls:
+                reader.get(url)
+            random_access = (time.perf_counter() - start) / len(urls)
+            start = time.perf_counter()
+            with gzip.open(warc, "rb") as f:
+                f.read()
+            full_pass = time.perf_counter() - start
+            print(f"one page       : {random_access * 1e6:.0f}us, full decompression {full_pass * 1e3:.1f}ms")
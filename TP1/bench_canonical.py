@@ -0,0 +1,51 @@
+import sys
+import tracemalloc
+
+from bloom import BloomFilter
+from canonical import UrlCanonicalizer
+from crawler import Crawler
+from standin_server import CatalogServer
+
+
+class NoDelayCrawler(Crawler):
+    def be_polite(self, url=None):
+        pass #the stand-in server does not need politeness
+
+
+class RawUrls(UrlCanonicalizer):
+    """
+    Canonicaliser reproducing the previous cleanup only (fragment and
+    trailing slash removal).
+    """
+
+    def canonicalize(self, url):
+        return url.split("#", 1)[0].rstrip("/")
+
+
+if __name__ == "__main__":
+    server = CatalogServer(nb_products=100, latency=0).start()
+    server.variant_links = True
+    try:
+        for name, canonicalizer in (("raw", RawUrls()), ("canonical", UrlCanonicalizer())):
+            hits = server.hits
+            crawler = NoDelayCrawler(f"{server.base_url}/products", canonicalizer=canonicalizer)
+            data = crawler.crawl(max_pages=10000)
+            print(f"{name:<10}: {len(data)} pages fetched ({server.hits - hits} requests),"
+                  f" fetches avoided={crawler.fetches_avoided}")
+    finally:
+        server.stop()
+
+    # visited set memory: exact set of URL strings vs Bloom filter
+    n = 200000
+    urls = [f"https://web-scraping.dev/product/{i}?variant=color-{i % 7}" for i in range(n)]
+    tracemalloc.start()
+    visited = set(urls)
+    set_bytes = tracemalloc.get_traced_memory()[0] + sum(sys.getsizeof(u) for u in urls)
+    tracemalloc.stop()
+    bloom = BloomFilter(n, 0.001)
+    for url in urls:
+        bloom.add(url)
+    false_positives = sum(f"https://other.dev/{i}" in bloom for i in range(n)) / n
+    print(f"visited set for {n} URLs: set ~{set_bytes / 1e6:.1f} MB,"
+          f" bloom {bloom.size_bytes / 1e6:.2f} MB (measured fp rate {false_positives:.4f})")
+    print(f"bloom for 50M URLs at 0.1%: {BloomFilter(50_000_000, 0.001).size_bytes / 1e6:.0f} MB")
@@ -0,0 +1,82 @@
+import html
+import time
+from pathlib import Path
+
+import jsonlines
+
+from extractors import FastExtractor, SoupExtractor
+from standin_server import CatalogServer
+
+
+def rebuild_page(record):
+    """
+    Rebuild an HTML page from a record of TP1/output/products.jsonl, with a
+    navigation header and footer similar to the original shop pages.
+
+    Parameters
+    ----------
+    record : dict
+        Crawled page (url, title, description, links).
+
+    Returns
+    -------
+    bytes
+        HTML page whose title, first paragraph and links match the record.
+    """
+    links = "\n".join(
+        f'<li><a class="nav" href="{html.escape(link)}">{html.escape(link)}</a></li>'
+        for link in record["links"]
+    )
+    description = "" if record["description"] == "No description found" else \
+        f'<p class="product-description">{html.escape(record["description"])}</p>'
+    return (
+        "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(record['title'])}</title>"
+        "<link rel=\"stylesheet\" href=\"/static/style.css\">"
+        "<script>window.dataLayer = window.dataLayer || [];</script></head>"
+        f"<body><header><nav><ul>{links}</ul></nav></header>"
+        f"<main><div class=\"row\"><div class=\"col\">{description}"
+        "<p>Other paragraph.</p><img src=\"/img.png\"><br></div></div></main>"
+        "<footer><p>web-scraping.dev</p></footer></body></html>"
+    ).encode("utf-8")
+
+
+#character references that `html.unescape` resolves differently from the
+#BeautifulSoup tree builder
+ENTITY_PAGES = [
+    b"<title>Tom &foo; R&D</title><p>Tom &foo; R&D</p>",
+    b"<p>x&ampy &amp; &AMP</p>",
+    b"<p>&notit; &not it</p>",
+    b"<p>&#65;&#x42;&#128;&#0; &#65abc</p><a href='/p?a=1&amp;b=2&c'>x</a>",
+]
+
+
+def bench(extractor, pages, repeat=5):
+    """
+    Parse all pages `repeat` times and return the results and pages/sec.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [
+            (extractor.title(doc), extractor.first_paragraph(doc), extractor.hrefs(doc))
+            for doc in map(extractor.parse, pages)
+        ]
+    return results, repeat * len(pages) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    output = Path(__file__).parent / "output" / "products.jsonl"
+    with jsonlines.open(output) as reader:
+        pages = [rebuild_page(record) for record in reader]
+    server = CatalogServer(padding=0)
+    pages += [server.listing_page(k).encode("utf-8") for k in range(1, 11)]
+    pages += [server.product_page(k).encode("utf-8") for k in range(1, 11)]
+    server.server_close()
+    pages += ENTITY_PAGES
+
+    soup_results, soup_rate = bench(SoupExtractor(), pages)
+    fast_results, fast_rate = bench(FastExtractor(), pages)
+    assert soup_results == fast_results, "extractors disagree"
+    print(f"{len(pages)} pages, identical output")
+    print(f"soup : {soup_rate:8.1f} pages/s")
+    print(f"fast : {fast_rate:8.1f} pages/s  (x{fast_rate / soup_rate:.1f})")
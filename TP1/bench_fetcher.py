@@ -0,0 +1,31 @@
+import tempfile
+import time
+
+from crawler import Crawler
+from standin_server import CatalogServer
+
+
+class NoDelayCrawler(Crawler):
+    def be_polite(self, url=None):
+        pass #the stand-in server does not need politeness
+
+
+if __name__ == "__main__":
+    server = CatalogServer(nb_products=200, latency=0.005, padding=20000).start()
+    with tempfile.TemporaryDirectory(prefix="fetch_cache_") as cache_dir:
+        try:
+            for run in ("first crawl", "recrawl"):
+                crawler = NoDelayCrawler(f"{server.base_url}/products", cache_dir=cache_dir)
+                start = time.perf_counter()
+                data = crawler.crawl(max_pages=220)
+                elapsed = time.perf_counter() - start
+                report = crawler.fetcher.report()
+                print(f"{run:<12}: {len(data)} pages in {elapsed:.2f}s")
+                print(f"    requests={report['requests']} not_modified={report['not_modified']}"
+                      f" downloaded={report['bytes_downloaded'] / 1e6:.2f}MB"
+                      f" saved={report['bytes_saved'] / 1e6:.2f}MB"
+                      f" time_saved={report['time_saved']:.2f}s"
+                      f" connections opened/reused={report['connections_opened']}/{report['connections_reused']}")
+                crawler.fetcher.close()
+        finally:
+            server.stop()
@@ -0,0 +1,44 @@
+import random
+import time
+
+from crawler import Crawler
+from frontier import Frontier
+from scored_frontier import ScoredFrontier
+from standin_server import CatalogServer
+
+
+class NoDelayCrawler(Crawler):
+    def be_polite(self, url=None):
+        pass #the stand-in server does not need politeness
+
+
+def push_pop(frontier, urls, parents):
+    start = time.perf_counter()
+    for url, parent in zip(urls, parents):
+        frontier.push(url, level=0 if "product/" in url else 1, parent=parent)
+    push_time = time.perf_counter() - start
+    start = time.perf_counter()
+    while frontier.pop() is not None:
+        pass
+    return push_time, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n = 1000000
+    rng = random.Random(0)
+    urls = [f"https://shop.example/{'product' if rng.random() < 0.3 else 'page'}/{rng.randrange(n)}" for _ in range(n)]
+    parents = [None] * 1000 + urls[:n - 1000]
+    for name, frontier in (("two levels", Frontier()), ("scored heap", ScoredFrontier())):
+        push_time, pop_time = push_pop(frontier, urls, parents)
+        print(f"{name:<12}: {n} pushes in {push_time:.2f}s ({push_time / n * 1e6:.2f}us each),"
+              f" all pops in {pop_time:.2f}s")
+
+    server = CatalogServer(nb_products=300, per_page=10, latency=0.002).start()
+    try:
+        for name, scorer in (("two levels", False), ("scored heap", None)):
+            crawler = NoDelayCrawler(f"{server.base_url}/products", scorer=scorer)
+            data = crawler.crawl(max_pages=100)
+            products = sum("/product/" in record["url"] for record in data)
+            print(f"{name:<12}: {products} product pages in a budget of 100")
+    finally:
+        server.stop()
@@ -0,0 +1,38 @@
+import json
+import tempfile
+from pathlib import Path
+
+from async_crawler import AsyncCrawler
+from metrics import CrawlMetrics
+from standin_server import CatalogServer
+
+
+def live(snapshot):
+    print(f"  {snapshot['pages']:>4} pages  {snapshot['pages_per_sec']:6.1f} pages/s"
+          f"  {snapshot['bytes_per_sec'] / 1e3:8.1f} kB/s"
+          f"  frontier={snapshot['queues'].get('frontier', {}).get('last')}")
+
+
+if __name__ == "__main__":
+    server = CatalogServer(
+        nb_products=200,
+        latency=0.02,
+        robots_txt="User-agent: *\nRequest-rate: 100/1\n",
+        padding=5000
+    ).start()
+    with tempfile.TemporaryDirectory() as workdir:
+        dump_path = Path(workdir) / "metrics.json"
+        try:
+            metrics = CrawlMetrics(callback=live, report_every=50, dump_path=dump_path)
+            crawler = AsyncCrawler(f"{server.base_url}/products", concurrency=8, metrics=metrics)
+            crawler.crawl(max_pages=200)
+        finally:
+            server.stop()
+
+        with open(dump_path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        print(f"dumped to {dump_path}")
+        print(f"{'stage':<11}{'count':>7}{'total s':>10}{'mean ms':>10}{'p90 ms':>10}")
+        for stage, h in sorted(report["stages"].items(), key=lambda item: -item[1]["total"]):
+            print(f"{stage:<11}{h['count']:>7}{h['total']:>10.3f}{h['mean'] * 1e3:>10.3f}{h['p90'] * 1e3:>10.3f}")
+        print("errors:", report["errors"], " queues:", report["queues"])
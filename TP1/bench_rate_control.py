@@ -0,0 +1,41 @@
+import time
+
+from async_crawler import AsyncCrawler, HostScheduler
+from rate_control import AdaptiveRateController
+from standin_server import CatalogServer
+
+
+def run(make_crawler, max_pages):
+    server = CatalogServer(nb_products=1200, latency=0.02, max_rate=30, capacity=4).start()
+    try:
+        crawler = make_crawler(f"{server.base_url}/products")
+        start = time.perf_counter()
+        data = crawler.crawl(max_pages=max_pages)
+        elapsed = time.perf_counter() - start
+        return len(data), len(data) / elapsed, server.throttled, crawler
+    finally:
+        server.stop()
+
+
+def unthrottled(url):
+    crawler = AsyncCrawler(url, concurrency=16)
+    crawler.scheduler = HostScheduler(default_delay=0.0) #no delay at all
+    return crawler
+
+
+if __name__ == "__main__":
+    print("stand-in server: 30 requests/s allowed, 4 processed at once, 20ms per page")
+    scenarios = (
+        ("fixed 1s delay", lambda url: AsyncCrawler(url, concurrency=16), 15),
+        ("no delay, c=16", unthrottled, 1000),
+        ("adaptive, c<=16", lambda url: AsyncCrawler(url, concurrency=16,
+                                                    rate_control=AdaptiveRateController()), 1000),
+    )
+    for name, make_crawler, max_pages in scenarios:
+        nb_pages, rate, throttled, crawler = run(make_crawler, max_pages)
+        print(f"{name:<16}: {nb_pages} pages, {rate:5.1f} pages/s, {throttled} answers 429,"
+              f" errors={crawler.metrics.snapshot()['errors']}")
+        if crawler.rate_control is not None:
+            report = crawler.rate_control.report()
+            print(f"    window={report['window']:.1f} delays={report['delays']}"
+                  f" backoffs={report['backoffs']} slow={report['slow']}")
@@ -0,0 +1,43 @@
+import tempfile
+
+from crawler import Crawler
+from standin_server import CatalogServer
+
+
+class NoDelayCrawler(Crawler):
+    def be_polite(self, url=None):
+        pass #the stand-in server does not need politeness
+
+
+def run(server, name, max_pages, state_path=None, sitemap=False):
+    hits = server.hits
+    crawler = NoDelayCrawler(f"{server.base_url}/products")
+    nb_seeded = crawler.seed_from_sitemaps(state_path=state_path) if sitemap else 0
+    data = crawler.crawl(max_pages=max_pages)
+    crawler.save_checkpoint() #saves the sitemap state
+    products = sum("/product/" in record["url"] for record in data)
+    unchanged = crawler.sitemaps.stats["unchanged"] if sitemap else 0
+    print(f"{name:<28}: {server.hits - hits:>3} page fetches, {products:>3} product pages,"
+          f" {nb_seeded:>3} seeded, {unchanged:>3} skipped as unchanged")
+
+
+if __name__ == "__main__":
+    server = CatalogServer(nb_products=300, per_page=10, latency=0.002, sitemap_size=100).start()
+    server.robots_txt = f"User-agent: *\nAllow: /\nSitemap: {server.base_url}/sitemap.xml\n"
+    with tempfile.TemporaryDirectory(prefix="sitemap_") as workdir:
+        state_path = f"{workdir}/sitemap_state.json"
+        try:
+            print("budget of 100 pages")
+            run(server, "links only", 100)
+            run(server, "sitemap", 100, sitemap=True)
+
+            print("full crawl, then recrawl after 20 products changed")
+            run(server, "links only", 400)
+            run(server, "sitemap", 400, state_path, sitemap=True)
+            for k in range(1, 301, 15):
+                server.lastmod[k] = "2026-02-01T08:00:00Z"
+            run(server, "links only, recrawl", 400)
+            run(server, "sitemap, recrawl", 400, state_path, sitemap=True)
+            print(f"sitemap documents served: {server.sitemap_hits}")
+        finally:
+            server.stop()
@@ -0,0 +1,58 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Compact probabilistic set of strings.
+
+    Membership tests never miss an added string, and answer True for a
+    string that was never added with probability about `error_rate` once
+    `capacity` strings have been added.
+
+    Parameters
+    ----------
+    capacity : int
+        Expected number of strings.
+    error_rate : float, optional
+        Target false-positive rate (default is 0.001).
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.nb_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.nb_hashes = max(1, int(round(self.nb_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.nb_bits + 7) // 8)
+        self.count = 0 #number of strings added (false positives excluded)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.nb_bits for i in range(self.nb_hashes)]
+
+    def add(self, item):
+        """
+        Add a string. Returns True if it was (probably) not already present.
+        """
+        new = False
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] >> bit & 1:
+                self.bits[byte] |= 1 << bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[pos >> 3] >> (pos & 7) & 1 for pos in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def size_bytes(self):
+        return len(self.bits)
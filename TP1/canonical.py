@@ -0,0 +1,75 @@
+from fnmatch import fnmatchcase
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+class UrlCanonicalizer:
+    """
+    Rewrite equivalent URLs to a single canonical form.
+
+    The scheme and host are lowercased, default ports, fragments and
+    trailing slashes are removed, and the query string is rebuilt from
+    sorted parameters after applying the configured rules.
+
+    Parameters
+    ----------
+    drop_params : iterable of str, optional
+        Shell-style patterns (e.g. "utm_*") of query parameters removed from
+        every URL (default is tracking parameters).
+    single_value_params : iterable of str, optional
+        Parameters keeping only their first value when repeated, e.g.
+        ["variant"] to treat `?variant=a&variant=a` as `?variant=a`.
+    sort_query : bool, optional
+        If True (default), query parameters are sorted by name so that their
+        order does not matter.
+    """
+
+    DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+    def __init__(self, drop_params=("utm_*", "fbclid", "gclid"), single_value_params=(), sort_query=True):
+        self.drop_params = tuple(drop_params)
+        self.single_value_params = set(single_value_params)
+        self.sort_query = sort_query
+
+    def is_dropped(self, name):
+        return any(fnmatchcase(name, pattern) for pattern in self.drop_params)
+
+    def canonicalize_query(self, query):
+        params = []
+        seen = set() #(name, value) pairs already kept
+        single_seen = set() #single-value parameters already kept
+        for name, value in parse_qsl(query, keep_blank_values=True):
+            if self.is_dropped(name) or (name, value) in seen:
+                continue
+            if name in self.single_value_params:
+                if name in single_seen:
+                    continue
+                single_seen.add(name)
+            seen.add((name, value))
+            params.append((name, value))
+        if self.sort_query:
+            params.sort(key=lambda p: p[0]) #stable: values of a parameter keep their order
+        return urlencode(params)
+
+    def canonicalize(self, url):
+        """
+        Return the canonical form of an absolute URL.
+
+        Parameters
+        ----------
+        url : str
+            Absolute URL.
+
+        Returns
+        -------
+        str
+            Canonical URL.
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        netloc = parts.netloc.lower()
+        host, _, port = netloc.rpartition(":")
+        if host and port == self.DEFAULT_PORTS.get(scheme):
+            netloc = host
+        path = parts.path.rstrip("/")
+        query = self.canonicalize_query(parts.query) if parts.query else ""
+        return urlunsplit((scheme, netloc, path, query, ""))
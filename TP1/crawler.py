@@ -1,23 +1,67 @@
-from bs4 import BeautifulSoup
-import urllib.robotparser
-from urllib.request import urlopen
 import time
-import urllib.request
 import jsonlines
+from urllib.error import HTTPError
 from urllib.parse import urljoin, urlparse
+from frontier import Frontier
+from scored_frontier import ScoredFrontier
+from fetcher import Fetcher, retry_after
+from sink import JsonlSink
+from archive import HtmlArchive
+from extractors import EXTRACTORS
+from robots_cache import RobotsCache
+from canonical import UrlCanonicalizer
+from metrics import CrawlMetrics
+from sitemap import SitemapSeeder, newest, parse_lastmod
 
 class Crawler:
-    def __init__(self, base_url):
+    def __init__(self, base_url, checkpoint_dir=None, checkpoint_every=100, cache_dir=None, extractor="fast",
+                 robots_cache_dir=None, robots_ttl=86400, canonicalizer=None,
+                 visited_capacity=None, visited_error_rate=0.001, metrics=None,
+                 rate_control=None, max_retries=2, fetch_timeout=30, scorer=None):
         self.base_url = base_url 
-        self.already_visited = [] #We don't want to keep same results
-        self.robot_parser = None #Permissions in robots.txt
-        self.queue = [] #Normal queue
-        self.priority_queue = [] #Priority queue for product pages
+        self.metrics = metrics or CrawlMetrics() #stage timings, throughput, errors
+        self.rate_control = rate_control #AdaptiveRateController, replaces the fixed delay if set
+        self.max_retries = max_retries #retries after a 429, 503 or timeout
+        self.robot_parser = None #Permissions in robots.txt of the base host
+        self.robots = RobotsCache(robots_cache_dir, ttl=robots_ttl) #robots.txt rules of every host
+        self.extractor = EXTRACTORS[extractor]() #"fast" streaming parser or full "soup" tree
+        self.fetcher = Fetcher(cache_dir, timeout=fetch_timeout) #keep-alive connections + conditional GET cache
+        self.canonicalizer = canonicalizer or UrlCanonicalizer() #query parameter rules
+        # URLs ordered by a scorer (None or True: UrlScorer, product pages first, then recent and shallow pages);
+        # scorer=False: level 0 product pages, level 1 other pages, FIFO queues spilled to the checkpoint_dir
+        # visited_capacity switches the visited set to a Bloom filter for huge crawls
+        scorer = None if scorer is True else scorer
+        if scorer is not False and checkpoint_dir is None:
+            self.frontier = ScoredFrontier(scorer=scorer, visited_capacity=visited_capacity,
+                                           visited_error_rate=visited_error_rate)
+        elif scorer is not False:
+            self.frontier = ScoredFrontier.load(checkpoint_dir, scorer=scorer, visited_capacity=visited_capacity,
+                                                visited_error_rate=visited_error_rate) #resume if a checkpoint exists
+        elif checkpoint_dir is None:
+            self.frontier = Frontier(2, None, visited_capacity=visited_capacity,
+                                     visited_error_rate=visited_error_rate)
+        else:
+            self.frontier = Frontier.load(checkpoint_dir, 2, visited_capacity=visited_capacity,
+                                          visited_error_rate=visited_error_rate) #resume if a checkpoint exists
+        self.rewrites = [] #(raw, canonical) forms of the links of the last parsed page
+        self.rewritten_seen = set() #raw forms already accounted
+        self.fetches_avoided = 0 #links only recognised as known after canonicalisation
+        self.checkpoint_every = checkpoint_every
+        self.sink = None #JsonlSink used by crawl_to_jsonl
+        self.archive = None #HtmlArchive of the raw pages, if crawl_to_jsonl keeps them
+        self.sitemaps = None #SitemapSeeder, once the frontier is seeded from sitemaps
+
+    @property
+    def already_visited(self):
+        return self.frontier.visited #We don't want to keep same results
 
     def init_robot_parser(self, robot_url):
         """
         Initialize and configure the robots.txt parser for the target website.
 
+        The rules come from the robots cache, so they are only downloaded
+        again once they have expired.
+
         Parameters:
         ----------
         robot_urlo :str
@@ -26,14 +70,13 @@ class Crawler:
         Returns:
 
         """
-        self.robot_parser = urllib.robotparser.RobotFileParser()
-        self.robot_parser.set_url(robot_url)
-        self.robot_parser.read()
+        self.robot_parser = self.robots.get(robot_url)
         return self.robot_parser
     
     def is_parsing_allowed(self, url):
         """
-        Check whether the given URL is allowed to be crawled according to robots.txt.
+        Check whether the given URL is allowed to be crawled according to the
+        robots.txt of its host.
 
         Parameters:
         ----------
@@ -45,23 +88,46 @@ class Crawler:
         bool
             True if crawling is allowed, False otherwise.
         """
-        return self.robot_parser.can_fetch("*", url)
+        with self.metrics.stage("robots"):
+            return self.robots.can_fetch(url)
     
-    def be_polite(self):
+    def be_polite(self, url=None):
         """
         Enforce politeness by respecting the crawl delay specified in robots.txt.
 
         If no craw delay is specified, a default delay of 1 second is applied.
+        With a rate controller, the delay adapts to the server instead (see
+        `rate_control.AdaptiveRateController`).
+
+        Parameters
+        ----------
+        url : str, optional
+            URL about to be fetched. If None, the base URL host is used.
         """
-        delay = self.robot_parser.crawl_delay("*")
-        if delay is None:
-            time.sleep(1)
-        else:
-            time.sleep(delay)
+        url = url or self.base_url
+        with self.metrics.stage("politeness"):
+            if self.rate_control is not None:
+                host = urlparse(url).netloc
+                if host not in self.rate_control.delays:
+                    self.rate_control.configure(host, self.robots.get(url))
+                self.rate_control.acquire_blocking(host)
+                return
+            delay = self.robots.crawl_delay(url)
+            if delay is None:
+                time.sleep(1)
+            else:
+                time.sleep(delay)
 
     def get_html(self, url):
         """
-    Retrieve the raw HTML content of a web page.
+    Retrieve the raw HTML content of a web page through the connection pool,
+    revalidating it with the fetch cache if one is configured. The page is
+    also stored in the HTML archive when one is open.
+
+    429 and 503 answers, timeouts and connection errors are retried up to
+    `max_retries` times, after the Retry-After delay if the server sent one
+    (exponential back-off otherwise). Each outcome is reported to the rate
+    controller, if any.
 
     Parameters
     ----------
@@ -73,12 +139,50 @@ class Crawler:
     bytes
         Raw HTML content of the page.
     """
-        req = urllib.request.Request(
-            url=url,
-            method="GET")
-        response = urllib.request.urlopen(req)
-        data=response.read()
-        return(data)
+        host = urlparse(url).netloc
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            with self.metrics.stage("fetch"):
+                try:
+                    data = self.fetcher.get(url)
+                    error = None
+                except Exception as err:
+                    self.metrics.count_error(type(err).__name__)
+                    error = err
+            status = error.code if isinstance(error, HTTPError) else None
+            wait = retry_after(error.headers) if isinstance(error, HTTPError) else None
+            timeout = isinstance(error, (TimeoutError, ConnectionError))
+            if self.rate_control is not None:
+                self.rate_control.record(host, time.perf_counter() - start, status, wait, timeout)
+            if error is None:
+                break
+            if attempt == self.max_retries or not (timeout or status in (429, 503)):
+                raise error
+            self.wait_before_retry(url, attempt, wait)
+
+        self.metrics.add_bytes(len(data))
+        if self.archive is not None:
+            self.archive.write(url, data)
+        return data
+
+    def wait_before_retry(self, url, attempt, wait=None):
+        """
+        Wait before retrying a failed request.
+
+        Parameters
+        ----------
+        url : str
+            URL of the failed request.
+        attempt : int
+            Number of the failed attempt, starting at 0.
+        wait : float, optional
+            Delay asked by the server with Retry-After.
+        """
+        with self.metrics.stage("politeness"):
+            if self.rate_control is not None:
+                self.rate_control.acquire_blocking(urlparse(url).netloc) #already pushed back by record
+            else:
+                time.sleep(wait if wait is not None else 2 ** attempt)
     
     def get_page_content(self, url):
         """
@@ -91,24 +195,29 @@ class Crawler:
 
     Returns
     -------
-    bs4.BeautifulSoup or None
-        Parsed HTML content as a BeautifulSoup object if allowed,
-        None otherwise.
+    bs4.BeautifulSoup, extractors.PageSummary or None
+        Parsed HTML content, as returned by the extractor backend, if
+        allowed, None otherwise.
     """
         if not self.is_parsing_allowed(url):
             return None
 
         html = self.get_html(url)
-        return BeautifulSoup(html, "html.parser")
+        with self.metrics.stage("parse"):
+            return self.extractor.parse(html)
 
            
     def extract_links(self,soup, current_url):
         """
-    Extract and normalize internal links from a parsed HTML page.
+    Extract and canonicalise internal links from a parsed HTML page.
+
+    The raw and canonical forms of each link are recorded in
+    `self.rewrites` so the crawl can count the fetches canonicalisation
+    avoided (see `account_rewrites`).
 
     Parameters
     ----------
-    soup : bs4.BeautifulSoup
+    soup : bs4.BeautifulSoup or extractors.PageSummary
         Parsed HTML content of the current page.
     current_url : str
         URL of the page from which links are extracted.
@@ -119,28 +228,60 @@ class Crawler:
         List of unique internal absolute URLs extracted from the page.
     """
         links = []
-        base_netloc = urlparse(self.base_url).netloc #extract domain name
-
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
+        base_netloc = urlparse(self.base_url).netloc.lower() #extract domain name
 
+        for href in self.extractor.hrefs(soup):
             if href.startswith("#"): #we dont want to consider anchors
                 continue
             absolute = urljoin(current_url, href) #we add base url if relative
-            absolute = absolute.split("#", 1)[0].rstrip("/") #cleaning if necessary
+            raw = absolute.split("#", 1)[0].rstrip("/") #cleaning if necessary
+            absolute = self.canonicalizer.canonicalize(absolute) #query order, tracking params...
             if urlparse(absolute).netloc != base_netloc: #not absolute need in this case ( we stay on the same domain)
                 continue
+            self.rewrites.append((raw, absolute))
 
             links.append(absolute)
         return list(dict.fromkeys(links))
 
+    def account_rewrites(self, rewrites):
+        """
+        Count the fetches avoided thanks to URL canonicalisation.
+
+        Every raw form of a URL seen for the first time would have been
+        crawled on its own without canonicalisation. For each canonical URL
+        of the page, all its new raw forms count as avoided fetches, except
+        one when the canonical URL is neither known yet nor linked as is.
+        Call it before the links of the page are queued; the count is a
+        lower bound.
+
+        Parameters
+        ----------
+        rewrites : list of tuple
+            (raw URL, canonical URL) pairs returned by `pop_rewrites`.
+        """
+        new_raw = {} #canonical -> number of new rewritten raw forms
+        unchanged = set() #canonical URLs linked in their canonical form
+        for raw, canonical in rewrites:
+            if raw == canonical:
+                unchanged.add(canonical)
+            elif raw not in self.rewritten_seen:
+                self.rewritten_seen.add(raw)
+                new_raw[canonical] = new_raw.get(canonical, 0) + 1
+        for canonical, count in new_raw.items():
+            known = canonical in unchanged or canonical in self.frontier or canonical in self.frontier.visited
+            self.fetches_avoided += count if known else count - 1
+
+    def pop_rewrites(self):
+        rewrites, self.rewrites = self.rewrites, []
+        return rewrites
+
     def extract_first_paragraph(self, soup):
         """
     Extract the text of the first paragraph from a parsed HTML page.
 
     Parameters
     ----------
-    soup : bs4.BeautifulSoup
+    soup : bs4.BeautifulSoup or extractors.PageSummary
         Parsed HTML content of the page.
 
     Returns
@@ -148,8 +289,8 @@ class Crawler:
     str
         Text content of the first paragraph, or a default message if none exists.
     """
-        first_paragraph = soup.find("p")
-        return first_paragraph.get_text(strip=True) if first_paragraph else "No description found"
+        first_paragraph = self.extractor.first_paragraph(soup)
+        return first_paragraph if first_paragraph is not None else "No description found"
 
     def extract_title(self, soup):
         """
@@ -157,7 +298,7 @@ class Crawler:
 
     Parameters
     ----------
-    soup : bs4.BeautifulSoup
+    soup : bs4.BeautifulSoup or extractors.PageSummary
         Parsed HTML content of the page.
 
     Returns
@@ -165,13 +306,12 @@ class Crawler:
     str
         Page title, or a default message if the title tag is missing.
     """
-        if soup.title and soup.title.string:
-            title = soup.title.string.strip() 
-        else:
+        title = self.extractor.title(soup)
+        if title is None:
             title = 'No title found'
         return title
     
-    def add_to_queue(self, url, visited_set):
+    def add_to_queue(self, url, visited_set, parent=None, lastmod=None):
         """
     Add a URL to the appropriate crawl queue if it has not been visited yet.
 
@@ -181,16 +321,74 @@ class Crawler:
         URL to be added to the crawl queue.
     visited_set : set
         Set of URLs that have already been visited.
+    parent : str, optional
+        URL of the page the link was found on (depth and in-links of a
+        scored frontier).
+    lastmod : float, optional
+        Last modification time of the page from a sitemap.
     """
         if url in visited_set:
             return #early exit because already visited
-        if url in self.queue or url in self.priority_queue:
-            return #same
 
-        if "product/" in url:
-            self.priority_queue.append(url)
-        else:
-            self.queue.append(url)
+        level = 0 if "product/" in url else 1
+        if self.frontier.push(url, level=level, parent=parent, lastmod=lastmod): #no-op if already queued
+            self.robots.prefetch(url) #load the rules of a new host in the background
+
+    def seed_from_sitemaps(self, sitemap_urls=None, state_path=None, max_urls=100000):
+        """
+    Bulk-load the frontier with the pages listed in the sitemaps of the
+    website, most recently modified first.
+
+    Pages whose lastmod did not change since they were crawled in a previous
+    run (see `state_path`) are marked as visited instead, so neither the
+    sitemap nor the links of other pages make the crawl fetch them again.
+    Only the `max_urls` most recent pages are queued; the others can still
+    be reached through links.
+
+    Parameters
+    ----------
+    sitemap_urls : list of str, optional
+        Sitemaps or sitemap indexes to read. If None, the `Sitemap:` lines
+        of robots.txt are used, or /sitemap.xml if there are none.
+    state_path : str, optional
+        JSON file remembering the lastmod of the crawled pages between
+        runs. It is updated at each checkpoint.
+    max_urls : int, optional
+        Maximum number of pages queued (default is 100000), which bounds
+        the memory used while reading the sitemaps.
+
+    Returns
+    -------
+    int
+        Number of URLs queued.
+    """
+        parsed = urlparse(self.base_url)
+        root = f"{parsed.scheme}://{parsed.netloc}"
+        if sitemap_urls is None:
+            sitemap_urls = self.robots.get(root).site_maps() or [root + "/sitemap.xml"]
+        self.sitemaps = SitemapSeeder(state_path)
+        base_netloc = parsed.netloc.lower()
+        visited = self.frontier.visited
+
+        def candidates():
+            for url, lastmod in self.sitemaps.entries(sitemap_urls):
+                url = self.canonicalizer.canonicalize(url)
+                if urlparse(url).netloc != base_netloc or url in visited:
+                    continue
+                if self.sitemaps.unchanged(url, lastmod):
+                    self.frontier.mark_visited(url) #still up to date from the last run
+                    self.sitemaps.stats["unchanged"] += 1
+                    continue
+                yield url, lastmod
+
+        newest_first, self.sitemaps.stats["over_limit"] = newest(candidates(), max_urls)
+        nb_queued = 0
+        for url, lastmod in newest_first:
+            if url not in self.frontier:
+                self.add_to_queue(url, visited, lastmod=parse_lastmod(lastmod))
+                self.sitemaps.seeded[url] = lastmod
+                nb_queued += 1
+        return nb_queued
 
     def pop_next_url(self):
         """
@@ -201,15 +399,12 @@ class Crawler:
     str or None
         Next URL to crawl, or None if no URL remains in the queues.
     """
-        if self.priority_queue:
-            return self.priority_queue.pop(0)
-        if self.queue:
-            return self.queue.pop(0)
-        return None
+        return self.frontier.pop()
 
-    def crawl(self, start_url=None, max_pages=50):
+    def iter_crawl(self, start_url=None, max_pages=50):
         """
-    Crawl the website starting from a given URL and collect page information.
+    Crawl the website and yield the information of each page as soon as it
+    is parsed.
 
     Parameters
     ----------
@@ -218,11 +413,11 @@ class Crawler:
     max_pages : int, optional
         Maximum number of pages to crawl (default is 50).
 
-    Returns
-    -------
-    list of dict
-        List of dictionaries containing the extracted information for each
-        visited page.
+    Yields
+    ------
+    dict
+        Extracted information (url, title, description, links) of a visited
+        page.
     """
         parsed = urlparse(self.base_url)
         robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt" #we construct robots.txt url
@@ -230,43 +425,139 @@ class Crawler:
         if start_url is None:
             start_url = self.base_url
 
-        outputs = []
-        visited = set(self.already_visited) #to avoid revisiting pages
+        nb_pages = 0
+        visited = self.frontier.visited #to avoid revisiting pages
+        self.metrics.start()
 
         # init queue
         self.add_to_queue(start_url, visited)
 
-        while len(outputs) < max_pages: # crawl until we reach max pages
-            current_url = self.pop_next_url()
+        while nb_pages < max_pages: # crawl until we reach max pages
+            with self.metrics.stage("queue"):
+                current_url = self.pop_next_url()
             if current_url is None:
                 break  # nothing to visit
 
             if current_url in visited: # already visited
                 continue
-            visited.add(current_url)
+            self.frontier.mark_visited(current_url)
 
-            self.be_polite() #we respect the site
+            self.be_polite(current_url) #we respect the site
 
             soup = self.get_page_content(current_url)
             if soup is None: 
-                return outputs 
-
-            title = self.extract_title(soup)
-            desc = self.extract_first_paragraph(soup)
-            links = self.extract_links(soup, current_url)
-
-            for link in links:
-                self.add_to_queue(link, visited) # add new links to the good queue
-
-            outputs.append({
+                break
+
+            with self.metrics.stage("extract"):
+                title = self.extract_title(soup)
+                desc = self.extract_first_paragraph(soup)
+            with self.metrics.stage("links"):
+                links = self.extract_links(soup, current_url)
+                self.account_rewrites(self.pop_rewrites())
+
+            with self.metrics.stage("queue"):
+                for link in links:
+                    self.add_to_queue(link, visited, parent=current_url) # add new links to the good queue
+            self.metrics.gauge("frontier", len(self.frontier))
+
+            nb_pages += 1
+            self.metrics.count_page()
+            yield {
                 "url": current_url,
                 "title": title,
                 "description": desc,
                 "links": links
-            })
+            }
+            if nb_pages % self.checkpoint_every == 0:
+                self.save_checkpoint()
+
+        self.save_checkpoint()
+        self.metrics.finish()
+
+    def crawl(self, start_url=None, max_pages=50):
+        """
+    Crawl the website starting from a given URL and collect page information.
+
+    Parameters
+    ----------
+    start_url : str, optional
+        URL from which the crawl starts. If None, the base URL is used.
+    max_pages : int, optional
+        Maximum number of pages to crawl (default is 50).
+
+    Returns
+    -------
+    list of dict
+        List of dictionaries containing the extracted information for each
+        visited page.
+    """
+        return list(self.iter_crawl(start_url, max_pages))
+
+    def save_checkpoint(self):
+        """
+        Flush the output sink and the HTML archive, if any, then checkpoint
+        the frontier, so a resumed crawl never misses records of pages marked
+        as visited. The lastmod of the sitemap pages crawled so far is saved
+        last.
+        """
+        if self.sink is not None:
+            self.sink.flush()
+        if self.archive is not None:
+            self.archive.flush()
+        self.frontier.checkpoint()
+        if self.sitemaps is not None:
+            self.sitemaps.commit(self.frontier.visited)
+
+    def crawl_to_jsonl(self, output_path, start_url=None, max_pages=50, batch_size=100, mode=None,
+                       compress=False, archive_path=None):
+        """
+        Crawl the website and stream each record to a JSONL file.
 
-        self.already_visited = list(visited)
-        return outputs
+        Records are written by batches of `batch_size`, so memory does not
+        grow with `max_pages`. When the crawl resumes from a checkpoint, the
+        records are appended to the existing file.
+
+        Parameters
+        ----------
+        output_path : str
+            Path to the output JSONL file.
+        start_url : str, optional
+            URL from which the crawl starts. If None, the base URL is used.
+        max_pages : int, optional
+            Maximum number of pages to crawl (default is 50).
+        batch_size : int, optional
+            Number of records buffered before a write (default is 100).
+        mode : str, optional
+            "w" or "a". If None, the file is appended to only when resuming.
+        compress : bool, optional
+            If True, the records are written as gzip-compressed JSONL.
+        archive_path : str, optional
+            If given, the raw HTML of every fetched page is kept in an
+            `archive.HtmlArchive` at this path, so the extraction can be
+            re-run offline with `archive.reextract`.
+
+        Returns
+        -------
+        int
+            Number of records written.
+        """
+        if mode is None:
+            mode = "a" if self.frontier.visited else "w" #resumed crawl
+        nb_records = 0
+        with JsonlSink(output_path, batch_size=batch_size, mode=mode, compress=compress) as sink:
+            self.sink = sink
+            if archive_path is not None:
+                self.archive = HtmlArchive(archive_path, mode)
+            try:
+                for record in self.iter_crawl(start_url, max_pages):
+                    sink.write(record)
+                    nb_records += 1
+            finally:
+                self.sink = None
+                if self.archive is not None:
+                    self.archive.close()
+                    self.archive = None
+        return nb_records
     
     def save_to_jsonl(self, data, output_path):
         """
@@ -285,11 +576,14 @@ class Crawler:
 
 
 if __name__ == "__main__":
-    crawler = Crawler("https://web-scraping.dev/products")
-    data = crawler.crawl(
-        max_pages=50
+    crawler = Crawler(
+        "https://web-scraping.dev/products",
+        metrics=CrawlMetrics(dump_path="/home/ensai/Documents/Indexation/TpScrawler/TP1/output/metrics.json")
     )
-    crawler.save_to_jsonl(
-        data,
-        "/home/ensai/Documents/Indexation/TpScrawler/TP1/output/products.jsonl"
+    crawler.crawl_to_jsonl(
+        "/home/ensai/Documents/Indexation/TpScrawler/TP1/output/products.jsonl",
+        max_pages=50
     )
+    print("Fetch report:", crawler.fetcher.report())
+    print("Fetches avoided by URL canonicalisation:", crawler.fetches_avoided)
+    print("Pages/s:", crawler.metrics.snapshot()["pages_per_sec"])
@@ -0,0 +1,382 @@
+import hashlib
+import sqlite3
+import time
+from multiprocessing import Process
+from multiprocessing.connection import wait
+from pathlib import Path
+from urllib.parse import urlparse
+
+import jsonlines
+
+from crawler import Crawler
+
+QUEUED, CLAIMED, DONE, FAILED = 0, 1, 2, 3
+
+
+def shard_of(url, nb_shards, by="host"):
+    """
+    Return the shard owning a URL.
+
+    Parameters
+    ----------
+    url : str
+        URL to assign.
+    nb_shards : int
+        Number of shards (workers).
+    by : str, optional
+        "host" (default) keeps every URL of a host on one worker, so the
+        per-host politeness stays local; "url" spreads single-host crawls.
+
+    Returns
+    -------
+    int
+        Shard number in [0, nb_shards).
+    """
+    key = urlparse(url).netloc if by == "host" else url
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % nb_shards
+
+
+class SharedFrontier:
+    """
+    Crawl frontier shared by several worker processes through SQLite.
+
+    Each URL is stored once (the primary key deduplicates across workers)
+    with its shard, its priority level and a state: queued, claimed by a
+    worker, done or failed. Workers claim batches of their own shard, push
+    the links they discover into whatever shard owns them, and mark pages
+    done once their records are on disk. A global page budget is reserved
+    at claim time. The shard of a worker that keeps crashing can be
+    dropped, so that the others do not wait for it forever.
+
+    Parameters
+    ----------
+    db_path : str
+        Path to the SQLite database.
+    nb_shards : int
+        Number of shards.
+    shard_by : str, optional
+        Sharding key, "host" or "url" (see `shard_of`).
+    """
+
+    def __init__(self, db_path, nb_shards, shard_by="host"):
+        self.nb_shards = nb_shards
+        self.shard_by = shard_by
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, shard INTEGER, level INTEGER, state INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS urls_claim ON urls (shard, state, level)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('reserved', 0)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS dropped (shard INTEGER PRIMARY KEY)")
+
+    def push_many(self, urls):
+        """
+        Queue URLs that no worker has seen yet.
+
+        Parameters
+        ----------
+        urls : iterable of tuple
+            (url, level) pairs, level 0 being served first.
+        """
+        rows = [(url, shard_of(url, self.nb_shards, self.shard_by), level, QUEUED) for url, level in urls]
+        if rows:
+            self.conn.executemany("INSERT OR IGNORE INTO urls VALUES (?, ?, ?, ?)", rows)
+
+    def claim(self, shard, n, max_pages):
+        """
+        Atomically claim up to `n` queued URLs of a shard within the global
+        page budget.
+
+        Returns
+        -------
+        list of str
+            Claimed URLs, highest priority first.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            reserved = self.conn.execute("SELECT value FROM meta WHERE key = 'reserved'").fetchone()[0]
+            n = min(n, max_pages - reserved)
+            urls = []
+            if n > 0:
+                urls = [row[0] for row in self.conn.execute(
+                    "SELECT url FROM urls WHERE shard = ? AND state = ? ORDER BY level, rowid LIMIT ?",
+                    (shard, QUEUED, n))]
+                self.conn.executemany("UPDATE urls SET state = ? WHERE url = ?", [(CLAIMED, u) for u in urls])
+                self.conn.execute("UPDATE meta SET value = value + ? WHERE key = 'reserved'", (len(urls),))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return urls
+
+    def mark_done(self, urls, state=DONE):
+        if urls:
+            self.conn.executemany("UPDATE urls SET state = ? WHERE url = ?", [(state, u) for u in urls])
+
+    def release_claims(self, shard, drop=False):
+        """
+        Give back the URLs a crashed worker of this shard had claimed but not
+        finished, together with their budget.
+
+        Parameters
+        ----------
+        shard : int
+            Shard of the crashed worker.
+        drop : bool, optional
+            Also drop the shard: its URLs are no longer waited for by
+            `is_finished` (default is False).
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        cursor = self.conn.execute("UPDATE urls SET state = ? WHERE shard = ? AND state = ?",
+                                   (QUEUED, shard, CLAIMED))
+        self.conn.execute("UPDATE meta SET value = value - ? WHERE key = 'reserved'", (cursor.rowcount,))
+        if drop:
+            self.conn.execute("INSERT OR IGNORE INTO dropped VALUES (?)", (shard,))
+        self.conn.execute("COMMIT")
+
+    def is_finished(self, max_pages):
+        """
+        True when the page budget is spent or no URL is queued or being
+        crawled in any shard that was not dropped.
+        """
+        reserved = self.conn.execute("SELECT value FROM meta WHERE key = 'reserved'").fetchone()[0]
+        if reserved >= max_pages:
+            return True
+        busy = self.conn.execute(
+            "SELECT 1 FROM urls WHERE state IN (?, ?) AND shard NOT IN (SELECT shard FROM dropped) LIMIT 1",
+            (QUEUED, CLAIMED)).fetchone()
+        return busy is None
+
+    def close(self):
+        self.conn.close()
+
+
+class ShardWorker(Crawler):
+    """
+    Crawler working on one shard of a `SharedFrontier`.
+
+    The fetch, robots, politeness and `extract_*` helpers come from
+    `Crawler`; only the scheduling goes through the shared store. Claimed
+    pages are marked done at each checkpoint, right after the output shard
+    is flushed, so a restarted worker refetches exactly the pages whose
+    records were not written. A page whose fetch or parsing raises is
+    marked failed and counted as a "failed_page" error, and the crawl goes
+    on.
+
+    Parameters
+    ----------
+    base_url : str
+        Base URL of the website.
+    shared : SharedFrontier
+        Shared frontier.
+    shard : int
+        Shard handled by this worker.
+    claim_size : int, optional
+        Number of URLs claimed at once (default is 20).
+    poll_interval : float, optional
+        Seconds to wait when the shard is empty but other workers are busy.
+    """
+
+    def __init__(self, base_url, shared, shard, claim_size=20, poll_interval=0.2, **kwargs):
+        super().__init__(base_url, checkpoint_every=claim_size, **kwargs)
+        self.shared = shared
+        self.shard = shard
+        self.claim_size = claim_size
+        self.poll_interval = poll_interval
+        self.outbox = [] #(url, level) discovered since the last push
+        self.completed = [] #pages crawled since the last checkpoint
+
+    def be_polite(self, url=None):
+        """
+        Respect the crawl delay of the host. When URLs are sharded by URL,
+        every worker may hit the same host, so each one waits `nb_shards`
+        times the delay to keep the combined rate within robots.txt.
+        """
+        share = self.shared.nb_shards if self.shared.shard_by == "url" else 1
+        with self.metrics.stage("politeness"):
+            delay = self.robots.crawl_delay(url or self.base_url)
+            time.sleep((1 if delay is None else delay) * share)
+
+    def add_to_queue(self, url, visited_set, parent=None, lastmod=None):
+        self.outbox.append((url, 0 if "product/" in url else 1))
+
+    def save_checkpoint(self):
+        if self.sink is not None:
+            self.sink.flush()
+        self.shared.mark_done(self.completed)
+        self.completed = []
+
+    def iter_crawl(self, start_url=None, max_pages=50):
+        """
+        Crawl the pages of this worker's shard until the shared frontier is
+        exhausted or the global page budget is spent.
+
+        Yields
+        ------
+        dict
+            Extracted information of a visited page.
+        """
+        parsed = urlparse(self.base_url)
+        self.init_robot_parser(f"{parsed.scheme}://{parsed.netloc}/robots.txt")
+        self.metrics.start()
+        self.shared.release_claims(self.shard)
+        self.add_to_queue(start_url or self.base_url, None)
+        self.shared.push_many(self.outbox)
+        self.outbox = []
+
+        while True:
+            batch = self.shared.claim(self.shard, self.claim_size, max_pages)
+            if not batch:
+                self.save_checkpoint()
+                if self.shared.is_finished(max_pages):
+                    break
+                time.sleep(self.poll_interval) #other shards may still feed this one
+                continue
+
+            for current_url in batch:
+                self.be_polite(current_url)
+                try:
+                    soup = self.get_page_content(current_url)
+                    if soup is not None:
+                        record = {
+                            "url": current_url,
+                            "title": self.extract_title(soup),
+                            "description": self.extract_first_paragraph(soup),
+                            "links": self.extract_links(soup, current_url)
+                        }
+                except Exception:
+                    self.metrics.count_error("failed_page") #fetch errors are also counted by type
+                    self.pop_rewrites()
+                    self.shared.mark_done([current_url], FAILED)
+                    continue
+                self.completed.append(current_url)
+                if soup is None:
+                    continue
+                self.account_rewrites(self.pop_rewrites())
+                for link in record["links"]:
+                    self.add_to_queue(link, None)
+                self.shared.push_many(self.outbox)
+                self.outbox = []
+                self.metrics.count_page()
+                yield record
+            self.save_checkpoint()
+
+        self.metrics.finish()
+
+
+def run_worker(base_url, db_path, nb_shards, shard, output_dir, max_pages, shard_by="host", **kwargs):
+    """
+    Entry point of a worker process: crawl one shard into
+    `output_dir/shard-<shard>.jsonl`.
+    """
+    shared = SharedFrontier(db_path, nb_shards, shard_by)
+    worker = ShardWorker(base_url, shared, shard, **kwargs)
+    worker.crawl_to_jsonl(shard_path(output_dir, shard), max_pages=max_pages,
+                          batch_size=worker.claim_size, mode="a")
+    shared.close()
+
+
+def shard_path(output_dir, shard):
+    return str(Path(output_dir) / f"shard-{shard}.jsonl")
+
+
+def merge_shards(shard_paths, output_path):
+    """
+    Merge worker shards into a single JSONL file in the `save_to_jsonl`
+    record format, dropping duplicate URLs.
+
+    Parameters
+    ----------
+    shard_paths : list of str
+        JSONL shards written by the workers.
+    output_path : str
+        Path to the merged JSONL file.
+
+    Returns
+    -------
+    int
+        Number of records written.
+    """
+    seen = set()
+    nb_records = 0
+    with jsonlines.open(output_path, mode="w") as writer:
+        for path in shard_paths:
+            if not Path(path).exists():
+                continue
+            with jsonlines.open(path) as reader:
+                for record in reader:
+                    if record["url"] in seen:
+                        continue
+                    seen.add(record["url"])
+                    writer.write(record)
+                    nb_records += 1
+    return nb_records
+
+
+def crawl_distributed(base_url, nb_workers, output_dir, max_pages=50, shard_by="host", max_restarts=2, **kwargs):
+    """
+    Crawl a website with `nb_workers` local processes sharing a SQLite
+    frontier in `output_dir`, then merge their shards.
+
+    A worker that dies is restarted on its shard, up to `max_restarts`
+    times; after that its shard is dropped so that the other workers can
+    finish. Workers on other machines can join by calling `run_worker` with
+    the same database and shard count, as long as they see the same files.
+
+    If `output_dir` already holds a shared frontier, the crawl resumes it
+    and the workers append to their shards; otherwise the shards of a
+    former crawl are deleted first.
+
+    Returns
+    -------
+    int
+        Number of records in `output_dir/products.jsonl`.
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    db_path = str(Path(output_dir) / "frontier.sqlite")
+    if not Path(db_path).exists(): #fresh crawl: the workers append to their shards
+        for path in Path(output_dir).glob("shard-*.jsonl"):
+            path.unlink()
+    shared = SharedFrontier(db_path, nb_workers, shard_by) #creates the schema once
+
+    def start(shard):
+        worker = Process(target=run_worker,
+                         args=(base_url, db_path, nb_workers, shard, output_dir, max_pages, shard_by),
+                         kwargs=kwargs)
+        worker.start()
+        return worker
+
+    workers = {shard: start(shard) for shard in range(nb_workers)}
+    restarts = dict.fromkeys(workers, 0)
+    while workers:
+        wait([worker.sentinel for worker in workers.values()])
+        for shard, worker in list(workers.items()):
+            if worker.is_alive():
+                continue
+            del workers[shard]
+            if worker.exitcode == 0:
+                continue
+            if restarts[shard] < max_restarts:
+                restarts[shard] += 1
+                workers[shard] = start(shard) #releases the claims of the dead worker
+            else:
+                shared.release_claims(shard, drop=True)
+    shared.close()
+    paths = [shard_path(output_dir, shard) for shard in range(nb_workers)]
+    return merge_shards(paths, str(Path(output_dir) / "products.jsonl"))
+
+
+if __name__ == "__main__":
+    nb_records = crawl_distributed(
+        "https://web-scraping.dev/products",
+        nb_workers=4,
+        output_dir="TP1/output/distributed",
+        max_pages=50,
+        shard_by="url" #a single host: spread its URLs over the workers
+    )
+    print(f"{nb_records} records merged")
@@ -0,0 +1,264 @@
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup, UnicodeDammit
+from bs4.dammit import EntitySubstitution
+
+
+class SoupExtractor:
+    """
+    Extractor backend building a full BeautifulSoup tree (reference
+    behaviour of the crawler).
+
+    Parameters
+    ----------
+    features : str, optional
+        BeautifulSoup parser to use (default is "html.parser").
+    """
+
+    def __init__(self, features="html.parser"):
+        self.features = features
+
+    def parse(self, html):
+        return BeautifulSoup(html, self.features)
+
+    def title(self, soup):
+        if soup.title and soup.title.string:
+            return soup.title.string.strip()
+        return None
+
+    def first_paragraph(self, soup):
+        first_paragraph = soup.find("p")
+        return first_paragraph.get_text(strip=True) if first_paragraph else None
+
+    def hrefs(self, soup):
+        return [link["href"] for link in soup.find_all("a", href=True)]
+
+
+class PageSummary:
+    """
+    The only parts of a page the crawler reads: title, first paragraph text
+    and the href of every link.
+    """
+
+    __slots__ = ("title", "first_paragraph", "hrefs")
+
+    def __init__(self, title, first_paragraph, hrefs):
+        self.title = title
+        self.first_paragraph = first_paragraph
+        self.hrefs = hrefs
+
+
+class SummaryParser(HTMLParser):
+    """
+    Streaming HTML parser materialising only `<title>`, the first `<p>` and
+    the `<a href>` attributes.
+
+    Element nesting follows the BeautifulSoup html.parser tree builder: void
+    elements never open, and an end tag closes the most recent open element
+    of the same name together with everything opened after it (stray end
+    tags are ignored). Character references are resolved as by the tree
+    builder too, not by `html.unescape`: an unknown named reference is kept
+    without its semicolon, and only complete names are looked up.
+    """
+
+    VOID_ELEMENTS = {
+        "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+        "link", "menuitem", "meta", "param", "source", "track", "wbr",
+        "basefont", "bgsound", "command", "frame", "image", "isindex",
+        "nextid", "spacer"
+    }
+    HIDDEN_TEXT = {"script", "style", "template", "rt", "rp"} #strings ignored by get_text
+    NUMERIC_REFERENCE = {10: re.compile("^([0-9]+)(.*)"), 16: re.compile("^([0-9a-f]+)(.*)")}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack = [] #names of the open elements
+        self.hrefs = []
+        # title: list of child nodes of the first <title>, a node being
+        # (kind, str) for strings, comments, declarations..., or
+        # ("tag", [child nodes]) for elements
+        self.title_nodes = None
+        self.title_depth = None #stack depth of the first <title>
+        self.title_open = [] #node lists of the open elements inside <title>
+        # first paragraph
+        self.p_depth = None
+        self.p_done = False
+        self.p_parts = []
+        self.hidden = 0 #open script/style/template/rt/rp elements
+        self.in_data = False #True while consecutive data chunks form one string
+
+    def handle_starttag(self, tag, attrs):
+        self.in_data = False
+        if tag == "a":
+            href = None
+            for name, value in attrs:
+                if name == "href":
+                    href = "" if value is None else value #last duplicate wins
+            if href is not None:
+                self.hrefs.append(href)
+
+        if tag in self.VOID_ELEMENTS:
+            if self.title_open:
+                self.title_open[-1].append(("tag", []))
+            return
+
+        if self.title_open:
+            children = []
+            self.title_open[-1].append(("tag", children))
+            self.title_open.append(children)
+        elif tag == "title" and self.title_nodes is None:
+            self.title_nodes = []
+            self.title_open = [self.title_nodes]
+            self.title_depth = len(self.stack)
+
+        if tag in self.HIDDEN_TEXT:
+            self.hidden += 1
+        elif tag == "p" and self.p_depth is None and not self.p_done:
+            self.p_depth = len(self.stack)
+
+        self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in self.VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self.in_data = False
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i] == tag:
+                break
+        else:
+            return #stray end tag
+        while len(self.stack) > i:
+            name = self.stack.pop()
+            depth = len(self.stack)
+            if self.title_open:
+                if depth == self.title_depth:
+                    self.title_open = []
+                else:
+                    self.title_open.pop()
+            if name in self.HIDDEN_TEXT:
+                self.hidden -= 1
+            elif depth == self.p_depth:
+                self.p_depth = None
+                self.p_done = True
+
+    def handle_data(self, data):
+        # the tokenizer may split a text run (e.g. around a bare "<"),
+        # BeautifulSoup joins it back into a single string
+        if self.title_open:
+            nodes = self.title_open[-1]
+            if self.in_data:
+                nodes[-1] = ("text", nodes[-1][1] + data)
+            else:
+                nodes.append(("text", data))
+        if self.p_depth is not None and not self.hidden:
+            if self.in_data and self.p_parts:
+                self.p_parts[-1] += data
+            else:
+                self.p_parts.append(data)
+        self.in_data = True
+
+    def handle_charref(self, name):
+        base = 10
+        if name.startswith(("x", "X")):
+            name, base = name[1:], 16
+        extra = ""
+        try:
+            code = int(name, base)
+        except ValueError: #digits followed by plain text
+            match = self.NUMERIC_REFERENCE[base].search(name)
+            if match is None:
+                self.handle_data(name)
+                return
+            code, extra = int(match.group(1), base), match.group(2)
+        self.handle_data(UnicodeDammit.numeric_character_reference(code)[0])
+        if extra:
+            self.handle_data(extra)
+
+    def handle_entityref(self, name):
+        self.handle_data(EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name, f"&{name}"))
+
+    def handle_comment(self, data):
+        self.in_data = False
+        if self.title_open:
+            self.title_open[-1].append(("comment", data)) #a lone comment is still a .string
+
+    def handle_decl(self, decl):
+        self.in_data = False
+        if self.title_open:
+            self.title_open[-1].append(("decl", decl[len("DOCTYPE "):] or " "))
+
+    def handle_pi(self, data):
+        self.in_data = False
+        if self.title_open:
+            self.title_open[-1].append(("pi", data))
+
+    def unknown_decl(self, data):
+        self.in_data = False
+        if data.upper().startswith("CDATA["): #CData strings are kept by get_text
+            data = data[len("CDATA["):]
+            if self.title_open:
+                self.title_open[-1].append(("cdata", data))
+            if self.p_depth is not None:
+                self.p_parts.append(data)
+
+    def title_string(self):
+        """
+        Equivalent of BeautifulSoup `soup.title.string`.
+        """
+        nodes = self.title_nodes
+        while nodes is not None and len(nodes) == 1:
+            kind, value = nodes[0]
+            if kind != "tag":
+                return value
+            nodes = value
+        return None
+
+    def first_paragraph_text(self):
+        """
+        Equivalent of BeautifulSoup `soup.find("p").get_text(strip=True)`.
+        """
+        if self.p_depth is None and not self.p_done:
+            return None
+        return "".join(s for s in (part.strip() for part in self.p_parts) if s)
+
+
+class FastExtractor:
+    """
+    Extractor backend parsing pages in one streaming pass with
+    `SummaryParser`, without building a tree.
+
+    It produces the same title, first paragraph and links as
+    `SoupExtractor` with the html.parser backend.
+    """
+
+    def parse(self, html):
+        if isinstance(html, bytes):
+            html = UnicodeDammit(html, is_html=True).unicode_markup #same decoding as BeautifulSoup
+        parser = SummaryParser()
+        parser.feed(html)
+        parser.close()
+        title = parser.title_string()
+        return PageSummary(
+            title.strip() if title else None,
+            parser.first_paragraph_text(),
+            parser.hrefs
+        )
+
+    def title(self, page):
+        return page.title
+
+    def first_paragraph(self, page):
+        return page.first_paragraph
+
+    def hrefs(self, page):
+        return page.hrefs
+
+
+EXTRACTORS = {
+    "soup": SoupExtractor,
+    "fast": FastExtractor
+}
@@ -0,0 +1,283 @@
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+
+def retry_after(headers):
+    """
+    Parse the Retry-After header of a response.
+
+    Parameters
+    ----------
+    headers : email.message.Message or None
+        Response headers.
+
+    Returns
+    -------
+    float or None
+        Seconds to wait, or None if the header is missing or invalid.
+    """
+    value = headers.get("Retry-After") if headers is not None else None
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0) #HTTP date
+    except (TypeError, ValueError):
+        return None
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP connections reused per host.
+
+    Idle connections are stored per (scheme, netloc). A thread takes one
+    with `acquire` and gives it back with `release` once the response body
+    has been fully read, so the same TCP/TLS connection serves many pages.
+    """
+
+    def __init__(self, timeout=30, max_idle_per_host=8):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.idle = {} #(scheme, netloc) -> list of idle connections
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def acquire(self, scheme, netloc):
+        """
+        Return an idle connection to the host, or open a new one.
+
+        Returns
+        -------
+        tuple
+            (connection, reused) where reused is True if the connection was
+            already open.
+        """
+        with self.lock:
+            conns = self.idle.get((scheme, netloc))
+            if conns:
+                self.reused += 1
+                return conns.pop(), True
+            self.opened += 1
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout), False
+        return http.client.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def release(self, scheme, netloc, conn):
+        with self.lock:
+            conns = self.idle.setdefault((scheme, netloc), [])
+            if len(conns) < self.max_idle_per_host:
+                conns.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            for conns in self.idle.values():
+                for conn in conns:
+                    conn.close()
+            self.idle = {}
+
+
+class FetchCache:
+    """
+    On-disk cache of fetched pages with their validators.
+
+    For each URL the body is stored next to a small JSON file holding the
+    ETag, the Last-Modified date, the body size and the time the full
+    download took.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    def get(self, url):
+        """
+        Return the cached metadata of a URL, or None if it is not cached.
+        """
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def read_body(self, url):
+        _, body_path = self._paths(url)
+        with open(body_path, "rb") as f:
+            return f.read()
+
+    def put(self, url, body, etag, last_modified, fetch_time):
+        """
+        Store a freshly downloaded page if the server sent a validator.
+        """
+        if etag is None and last_modified is None:
+            return #nothing to revalidate with
+        meta_path, body_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": len(body),
+            "fetch_time": fetch_time
+        }
+        for path, content, mode in ((body_path, body, "wb"), (meta_path, json.dumps(meta), "w")):
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            with open(tmp_path, mode) as f:
+                f.write(content)
+            os.replace(tmp_path, path) #body first, so metadata never points to a missing body
+
+
+class Fetcher:
+    """
+    HTTP client combining a keep-alive connection pool and an optional
+    conditional-GET cache.
+
+    When a page is in the cache, the request carries `If-None-Match` /
+    `If-Modified-Since`; a 304 answer is served from disk and counted in the
+    bytes and time saved.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Directory of the fetch cache. If None, nothing is cached.
+    timeout : float, optional
+        Socket timeout in seconds (default is 30).
+    max_redirects : int, optional
+        Maximum number of redirects followed (default is 5).
+    """
+
+    RETRYABLE = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+    def __init__(self, cache_dir=None, timeout=30, max_redirects=5):
+        self.pool = ConnectionPool(timeout=timeout)
+        self.cache = FetchCache(cache_dir) if cache_dir else None
+        self.max_redirects = max_redirects
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "not_modified": 0,
+            "bytes_downloaded": 0,
+            "bytes_saved": 0,
+            "time_saved": 0.0
+        }
+
+    def _request(self, url, headers):
+        """
+        Send one GET request over a pooled connection.
+
+        Returns
+        -------
+        tuple
+            (status, response headers, body)
+        """
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        for attempt in range(2):
+            conn, reused = self.pool.acquire(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except self.RETRYABLE:
+                conn.close()
+                if reused and attempt == 0:
+                    continue #the server closed an idle connection, retry on a new one
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self.pool.release(parts.scheme, parts.netloc, conn)
+            return response.status, response.headers, body
+
+    def get(self, url):
+        """
+        Fetch the body of a web page, revalidating it if it is cached.
+
+        Parameters
+        ----------
+        url : str
+            URL of the web page to fetch.
+
+        Returns
+        -------
+        bytes
+            Raw content of the page.
+
+        Raises
+        ------
+        urllib.error.HTTPError
+            If the server answers with an error status.
+        """
+        for _ in range(self.max_redirects + 1):
+            cached = self.cache.get(url) if self.cache else None
+            headers = {"Accept-Encoding": "identity"}
+            if cached:
+                if cached["etag"]:
+                    headers["If-None-Match"] = cached["etag"]
+                if cached["last_modified"]:
+                    headers["If-Modified-Since"] = cached["last_modified"]
+
+            start = time.perf_counter()
+            status, resp_headers, body = self._request(url, headers)
+            elapsed = time.perf_counter() - start
+
+            if status in (301, 302, 303, 307, 308) and "Location" in resp_headers:
+                url = urljoin(url, resp_headers["Location"])
+                continue
+
+            with self.lock:
+                self.stats["requests"] += 1
+                self.stats["bytes_downloaded"] += len(body)
+                if status == 304 and cached:
+                    self.stats["not_modified"] += 1
+                    self.stats["bytes_saved"] += cached["size"]
+                    self.stats["time_saved"] += max(cached["fetch_time"] - elapsed, 0.0)
+
+            if status == 304 and cached:
+                return self.cache.read_body(url)
+            if status >= 400:
+                raise HTTPError(url, status, http.client.responses.get(status, ""), resp_headers, None)
+            if self.cache:
+                self.cache.put(url, body, resp_headers.get("ETag"),
+                               resp_headers.get("Last-Modified"), elapsed)
+            return body
+        raise HTTPError(url, 310, "Too many redirects", None, None)
+
+    def report(self):
+        """
+        Summarise the work saved by connection reuse and revalidation.
+
+        Returns
+        -------
+        dict
+            Request counts, bytes downloaded and saved, time saved and
+            connection pool usage.
+        """
+        report = dict(self.stats)
+        report["connections_opened"] = self.pool.opened
+        report["connections_reused"] = self.pool.reused
+        return report
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,376 @@
+import json
+import os
+from collections import deque
+from pathlib import Path
+
+from bloom import BloomFilter
+
+
+class SpillQueue:
+    """
+    FIFO queue of URLs keeping at most `max_in_memory` entries in RAM.
+
+    The oldest URLs live in an in-memory deque. Once it is full, newer URLs
+    are appended to a spill file on disk and read back by chunks when the
+    in-memory part runs empty, so the FIFO order is preserved.
+
+    Spill files are numbered by generation (`<spill_path>.<generation>`):
+    once a file is fully read back, the next URLs go to a new generation.
+    The drained files are only removed by `purge`, after a checkpoint no
+    longer refers to them, so a crawl can always resume from the last
+    checkpoint.
+
+    Parameters
+    ----------
+    spill_path : str, optional
+        Prefix of the spill files. If None, every URL stays in memory.
+    max_in_memory : int, optional
+        Maximum number of URLs kept in RAM.
+    on_refill : callable, optional
+        Called with the list of URLs loaded back from a spill file.
+    """
+
+    def __init__(self, spill_path=None, max_in_memory=100000, on_refill=None):
+        self.memory = deque()
+        self.spill_path = spill_path
+        self.max_in_memory = max_in_memory
+        self.on_refill = on_refill
+        self.generation = 0 #number of the current spill file
+        self.drained = [] #spill files fully read back, removed by purge
+        self.read_offset = 0 #bytes of the spill file already loaded back
+        self.spilled = 0 #number of URLs waiting in the spill file
+        self.writer = None
+
+    def __len__(self):
+        return len(self.memory) + self.spilled
+
+    @property
+    def path(self):
+        """
+        Path of the current spill file.
+        """
+        return f"{self.spill_path}.{self.generation}"
+
+    def push(self, url):
+        """
+        Append a URL.
+
+        Returns
+        -------
+        bool
+            True if it is kept in memory, False if it went to the spill
+            file.
+        """
+        if self.spill_path is None or (not self.spilled and len(self.memory) < self.max_in_memory):
+            self.memory.append(url)
+            return True
+        if self.writer is None:
+            self.writer = open(self.path, "w", encoding="utf-8") #new file, or one left by an older run
+        self.writer.write(url + "\n")
+        self.spilled += 1
+        return False
+
+    def pop(self):
+        if not self.memory and self.spilled:
+            self.refill()
+        return self.memory.popleft() if self.memory else None
+
+    def refill(self):
+        """
+        Load the next chunk of spilled URLs back into memory.
+        """
+        self.writer.flush()
+        loaded = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.seek(self.read_offset)
+            while self.spilled and len(loaded) < self.max_in_memory:
+                loaded.append(f.readline().rstrip("\n"))
+                self.spilled -= 1
+            self.read_offset = f.tell()
+        self.memory.extend(loaded)
+        if self.on_refill is not None:
+            self.on_refill(loaded)
+        if not self.spilled: #spill file fully consumed, the next URLs go to a new one
+            self.writer.close()
+            self.writer = None
+            self.drained.append(self.path) #still needed to resume from the last checkpoint
+            self.generation += 1
+            self.read_offset = 0
+
+    def iter_spilled(self):
+        """
+        Iterate over the URLs currently waiting in the spill file.
+        """
+        if not self.spilled:
+            return
+        self.writer.flush()
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.seek(self.read_offset)
+            for _ in range(self.spilled):
+                yield f.readline().rstrip("\n")
+
+    def state(self):
+        """
+        Return a JSON-serialisable snapshot of the queue.
+        """
+        end_offset = 0
+        if self.writer is not None:
+            self.writer.flush()
+            end_offset = self.writer.tell()
+        return {
+            "memory": list(self.memory),
+            "generation": self.generation,
+            "read_offset": self.read_offset,
+            "end_offset": end_offset,
+            "spilled": self.spilled
+        }
+
+    def purge(self):
+        """
+        Remove the drained spill files. Call it once a checkpoint with the
+        current generation is saved.
+        """
+        for path in self.drained:
+            if os.path.exists(path):
+                os.remove(path)
+        self.drained = []
+
+    def restore(self, state):
+        """
+        Restore the queue from a snapshot produced by `state`.
+
+        Bytes appended to the spill file after the snapshot, and the spill
+        files of other generations, are discarded.
+        """
+        self.close()
+        self.memory = deque(state["memory"])
+        self.generation = state["generation"]
+        self.read_offset = state["read_offset"]
+        self.spilled = state["spilled"]
+        self.drained = []
+        if self.spill_path is None:
+            return
+        spill_path = Path(self.spill_path)
+        for path in spill_path.parent.glob(f"{spill_path.name}.*"):
+            if str(path) != self.path or not self.spilled:
+                os.remove(path)
+        if self.spilled:
+            self.writer = open(self.path, "r+", encoding="utf-8")
+            self.writer.truncate(state["end_offset"])
+            self.writer.seek(state["end_offset"])
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class Frontier:
+    """
+    Crawl frontier with constant-time membership tests and dequeues.
+
+    URLs are stored in several FIFO queues ordered by priority (level 0 is
+    served first). A set of the queued URLs held in memory and a set of
+    visited URLs make duplicate checks O(1). When `checkpoint_dir` is
+    given, the queues spill to disk and `checkpoint` saves the whole state
+    so an interrupted crawl can resume with `Frontier.load`. The spilled
+    URLs are remembered in a set, or in a `BloomFilter` when
+    `spilled_capacity` is given.
+
+    Parameters
+    ----------
+    levels : int, optional
+        Number of priority levels (default is 2: product pages, others).
+    checkpoint_dir : str, optional
+        Directory holding spill files and checkpoints.
+    max_in_memory : int, optional
+        Maximum number of URLs kept in RAM per queue.
+    visited_capacity : int, optional
+        If given, visited URLs are stored in a `BloomFilter` sized for this
+        many URLs instead of an exact set. A false positive makes the crawl
+        skip a page it never fetched.
+    visited_error_rate : float, optional
+        False-positive rate of the Bloom filter (default is 0.001).
+    spilled_capacity : int, optional
+        If given, the URLs on disk are remembered by a `BloomFilter` sized
+        for this many URLs at a time instead of an exact set, and it is
+        emptied whenever no URL is left on disk. A false positive makes the
+        crawl skip a URL it never queued.
+    spilled_error_rate : float, optional
+        False-positive rate of that Bloom filter (default is 0.001).
+    """
+
+    STATE_FILE = "frontier.json"
+    VISITED_FILE = "visited.log"
+
+    def __init__(self, levels=2, checkpoint_dir=None, max_in_memory=100000,
+                 visited_capacity=None, visited_error_rate=0.001, spilled_capacity=None,
+                 spilled_error_rate=0.001):
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+        if self.checkpoint_dir is not None:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        self.queued = set() #URLs waiting in the memory part of a queue
+        self.queues = [
+            SpillQueue(self._spill_path(level), max_in_memory, self.refilled)
+            for level in range(levels)
+        ]
+        self.spilled_capacity = spilled_capacity
+        self.spilled_error_rate = spilled_error_rate
+        self.spilled_urls = None #URLs sent to a spill file
+        if self.checkpoint_dir is not None and spilled_capacity is None:
+            self.spilled_urls = set()
+        elif self.checkpoint_dir is not None:
+            self.spilled_urls = BloomFilter(spilled_capacity, spilled_error_rate)
+        if visited_capacity is None:
+            self.visited = set() #URLs already fetched
+        else:
+            self.visited = BloomFilter(visited_capacity, visited_error_rate)
+        self.new_visited = [] #visited since the last checkpoint
+
+    def _spill_path(self, level):
+        if self.checkpoint_dir is None:
+            return None
+        return str(self.checkpoint_dir / f"queue_{level}.spill")
+
+    def __len__(self):
+        return len(self.queued) + sum(queue.spilled for queue in self.queues)
+
+    def refilled(self, urls):
+        """
+        Move URLs loaded back from a spill file to the in-memory set.
+        """
+        self.queued.update(urls)
+        if isinstance(self.spilled_urls, set):
+            self.spilled_urls.difference_update(urls)
+
+    def __contains__(self, url):
+        return url in self.queued or (self.spilled_urls is not None and url in self.spilled_urls)
+
+    def push(self, url, level=0, parent=None, lastmod=None):
+        """
+        Add a URL to the queue of the given level if it is not already
+        queued or visited. `parent` and `lastmod` are only used by
+        `scored_frontier.ScoredFrontier`.
+
+        Returns
+        -------
+        bool
+            True if the URL was added, False otherwise.
+        """
+        if url in self or url in self.visited:
+            return False
+        if self.queues[level].push(url):
+            self.queued.add(url)
+        else:
+            self.spilled_urls.add(url)
+        return True
+
+    def pop(self):
+        """
+        Remove and return the next URL, highest priority level first.
+
+        Returns
+        -------
+        str or None
+            Next URL to crawl, or None if every queue is empty.
+        """
+        for queue in self.queues:
+            url = queue.pop()
+            if url is not None:
+                self.queued.discard(url)
+                if isinstance(self.spilled_urls, BloomFilter) and self.spilled_urls \
+                        and not any(queue.spilled for queue in self.queues):
+                    #every queued URL is in memory again
+                    self.spilled_urls = BloomFilter(self.spilled_capacity, self.spilled_error_rate)
+                return url
+        return None
+
+    def mark_visited(self, url):
+        if url not in self.visited:
+            self.visited.add(url)
+            self.new_visited.append(url)
+
+    def checkpoint(self):
+        """
+        Save the queues and the visited set to the checkpoint directory.
+
+        Visited URLs are appended to a log, so a checkpoint only writes what
+        changed since the previous one plus the in-memory queue heads.
+        """
+        if self.checkpoint_dir is None:
+            return
+        visited_path = self.checkpoint_dir / self.VISITED_FILE
+        with open(visited_path, "a", encoding="utf-8") as f:
+            for url in self.new_visited:
+                f.write(url + "\n")
+            visited_size = f.tell()
+        self.new_visited = []
+
+        state = {"visited_size": visited_size}
+        state.update(self.queue_state())
+        tmp_path = self.checkpoint_dir / (self.STATE_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_dir / self.STATE_FILE) #atomic
+        for queue in self.queues:
+            queue.purge() #the drained spill files are no longer needed to resume
+
+    def queue_state(self):
+        return {"queues": [queue.state() for queue in self.queues]}
+
+    def restore_queues(self, state):
+        for queue, queue_state in zip(self.queues, state["queues"]):
+            queue.restore(queue_state)
+            self.queued.update(queue.memory)
+            for url in queue.iter_spilled():
+                self.spilled_urls.add(url)
+
+    def resume(self):
+        """
+        Restore the state of the last checkpoint of the checkpoint
+        directory, if there is one.
+
+        Returns
+        -------
+        Frontier
+            The frontier itself.
+        """
+        state_path = self.checkpoint_dir / self.STATE_FILE
+        if not state_path.exists():
+            return self
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+        visited_path = self.checkpoint_dir / self.VISITED_FILE
+        with open(visited_path, "r+", encoding="utf-8") as f:
+            f.truncate(state["visited_size"]) #drop URLs logged after the checkpoint
+            f.seek(0)
+            for line in f:
+                self.visited.add(line.rstrip("\n"))
+        self.restore_queues(state)
+        return self
+
+    @classmethod
+    def load(cls, checkpoint_dir, levels=2, max_in_memory=100000,
+             visited_capacity=None, visited_error_rate=0.001, spilled_capacity=None,
+             spilled_error_rate=0.001):
+        """
+        Build a frontier from the checkpoint directory, or an empty one if
+        no checkpoint exists yet.
+
+        Parameters
+        ----------
+        checkpoint_dir : str
+            Directory given to a previous frontier.
+
+        Returns
+        -------
+        Frontier
+            Frontier in the state of the last checkpoint.
+        """
+        return cls(levels, checkpoint_dir, max_in_memory, visited_capacity, visited_error_rate,
+                   spilled_capacity, spilled_error_rate).resume()
+
+    def close(self):
+        for queue in self.queues:
+            queue.close()
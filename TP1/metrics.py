@@ -0,0 +1,177 @@
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class Histogram:
+    """
+    Latency histogram with logarithmic buckets.
+
+    Bucket `i` counts the observations in [base * 2**(i-1), base * 2**i)
+    seconds (bucket 0 holds everything below `base`), which keeps a constant
+    small memory footprint while giving percentiles within a factor 2.
+    """
+
+    def __init__(self, base=1e-5, nb_buckets=24):
+        self.base = base
+        self.buckets = [0] * nb_buckets
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        i = 0 if value < self.base else int(math.log2(value / self.base)) + 1
+        self.buckets[min(i, len(self.buckets) - 1)] += 1
+
+    def bucket_upper(self, i):
+        return self.base * 2 ** i
+
+    def percentile(self, q):
+        """
+        Upper bound of the bucket holding the q-th percentile (0 < q <= 100).
+        """
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(self.bucket_upper(i), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": {f"<{self.bucket_upper(i):.6g}s": n for i, n in enumerate(self.buckets) if n}
+        }
+
+
+class CrawlMetrics:
+    """
+    Crawl instrumentation: per-stage timings, throughput, queue depths and
+    errors.
+
+    Stages are timed with `with metrics.stage("fetch"): ...`. The crawlers
+    use the stages "queue", "robots", "politeness", "fetch", "parse" and
+    "links". All methods are thread safe.
+
+    Parameters
+    ----------
+    callback : callable, optional
+        Function called with `snapshot()` every `report_every` pages, e.g.
+        to print live throughput.
+    report_every : int, optional
+        Number of pages between two callback calls (default is 100).
+    dump_path : str, optional
+        JSON file written by `finish` at the end of the run.
+    """
+
+    def __init__(self, callback=None, report_every=100, dump_path=None):
+        self.callback = callback
+        self.report_every = report_every
+        self.dump_path = dump_path
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.pages = 0
+        self.bytes = 0
+        self.errors = {}
+        self.gauges = {} #name -> {"last": value, "max": value}
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def start(self):
+        """
+        Reset the metrics at the beginning of a run.
+        """
+        with self.lock:
+            self.reset()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def add_bytes(self, nb_bytes):
+        with self.lock:
+            self.bytes += nb_bytes
+
+    def count_error(self, kind):
+        with self.lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def gauge(self, name, value):
+        with self.lock:
+            g = self.gauges.setdefault(name, {"last": value, "max": value})
+            g["last"] = value
+            g["max"] = max(g["max"], value)
+
+    def count_page(self):
+        with self.lock:
+            self.pages += 1
+            report = self.callback is not None and self.pages % self.report_every == 0
+        if report:
+            self.callback(self.snapshot())
+
+    def snapshot(self):
+        """
+        Return the current metrics as a JSON-serialisable dict.
+        """
+        with self.lock:
+            end = self.finished if self.finished is not None else time.perf_counter()
+            elapsed = end - self.started
+            return {
+                "elapsed": elapsed,
+                "pages": self.pages,
+                "bytes": self.bytes,
+                "pages_per_sec": self.pages / elapsed if elapsed > 0 else 0.0,
+                "bytes_per_sec": self.bytes / elapsed if elapsed > 0 else 0.0,
+                "errors": dict(self.errors),
+                "queues": {name: dict(g) for name, g in self.gauges.items()},
+                "stages": {name: h.to_dict() for name, h in self.stages.items()}
+            }
+
+    def finish(self):
+        """
+        Stop the run clock and dump the metrics to `dump_path` if set.
+
+        Returns
+        -------
+        dict
+            Final snapshot.
+        """
+        with self.lock:
+            self.finished = time.perf_counter()
+        snapshot = self.snapshot()
+        if self.dump_path:
+            Path(self.dump_path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.dump_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=2)
+        return snapshot
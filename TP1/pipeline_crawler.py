@@ -0,0 +1,238 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from crawler import Crawler
+from async_crawler import HostScheduler
+from extractors import EXTRACTORS
+
+_parser = None #PageParser of each worker process
+
+
+class PageParser:
+    """
+    The parsing half of a `Crawler`: its `extract_*` helpers, without the
+    fetcher, robots cache and frontier a worker process does not need.
+
+    Parameters
+    ----------
+    base_url : str
+        Base URL of the website.
+    extractor : str
+        Name of the extractor backend (see `extractors.EXTRACTORS`).
+    canonicalizer : canonical.UrlCanonicalizer
+        Canonicalizer of the crawler.
+    """
+
+    extract_links = Crawler.extract_links
+    extract_title = Crawler.extract_title
+    extract_first_paragraph = Crawler.extract_first_paragraph
+    pop_rewrites = Crawler.pop_rewrites
+
+    def __init__(self, base_url, extractor, canonicalizer):
+        self.base_url = base_url
+        self.extractor = EXTRACTORS[extractor]()
+        self.canonicalizer = canonicalizer
+        self.rewrites = []
+
+
+def _init_parser(base_url, extractor, canonicalizer):
+    global _parser
+    _parser = PageParser(base_url, extractor, canonicalizer)
+
+
+def parse_page(url, html):
+    """
+    Extract the page information in a worker process with the `Crawler`
+    helpers.
+
+    Parameters
+    ----------
+    url : str
+        URL of the page.
+    html : bytes
+        Raw HTML content of the page.
+
+    Returns
+    -------
+    tuple
+        Extracted information (url, title, description, links), the
+        (raw, canonical) link rewrites of the page and the time spent in
+        the parse, extract and links stages.
+    """
+    t0 = time.perf_counter()
+    soup = _parser.extractor.parse(html)
+    t1 = time.perf_counter()
+    title = _parser.extract_title(soup)
+    desc = _parser.extract_first_paragraph(soup)
+    t2 = time.perf_counter()
+    links = _parser.extract_links(soup, url)
+    t3 = time.perf_counter()
+    record = {
+        "url": url,
+        "title": title,
+        "description": desc,
+        "links": links
+    }
+    timings = {"parse": t1 - t0, "extract": t2 - t1, "links": t3 - t2}
+    return record, _parser.pop_rewrites(), timings
+
+
+class PipelineCrawler(Crawler):
+    """
+    Crawler running network fetches and HTML parsing in separate stages.
+
+    A pool of I/O threads downloads pages (spaced per host by a
+    `HostScheduler`) and hands the raw HTML to a process pool running the
+    `extract_*` helpers. At most `window` pages are fetched or parsed at the
+    same time, which bounds the raw HTML held in memory.
+
+    Records are emitted, and their links fed back into the frontier, in the
+    order the URLs were dispatched. New URLs are only dispatched right after
+    a record is emitted, so the crawl order does not depend on which worker
+    finishes first: the output is the same for any number of workers.
+
+    URLs are marked visited when they are dispatched, so a checkpoint is
+    only taken once every page in flight has been emitted: dispatching
+    pauses every `checkpoint_every` pages until the window is empty. A page
+    whose fetch or parsing raises is counted as a "failed_page" error and
+    skipped.
+
+    Parameters
+    ----------
+    base_url : str
+        Base URL of the website.
+    fetch_workers : int, optional
+        Number of I/O threads (default is 8).
+    parse_workers : int, optional
+        Number of parsing processes (default is the number of CPUs).
+    window : int, optional
+        Maximum number of pages in flight (default is 4 * fetch_workers),
+        further capped by the window of the rate controller, if any.
+    """
+
+    def __init__(self, base_url, fetch_workers=8, parse_workers=None, window=None,
+                 checkpoint_dir=None, checkpoint_every=100, cache_dir=None, extractor="fast",
+                 robots_cache_dir=None, robots_ttl=86400, canonicalizer=None,
+                 visited_capacity=None, visited_error_rate=0.001, metrics=None,
+                 rate_control=None, max_retries=2, fetch_timeout=30, scorer=None):
+        super().__init__(base_url, checkpoint_dir, checkpoint_every, cache_dir, extractor,
+                         robots_cache_dir, robots_ttl, canonicalizer, visited_capacity, visited_error_rate,
+                         metrics, rate_control, max_retries, fetch_timeout, scorer)
+        self.extractor_name = extractor
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers or os.cpu_count()
+        self.window = window or 4 * fetch_workers
+        self.scheduler = rate_control or HostScheduler()
+
+    def in_flight_limit(self):
+        if self.rate_control is None:
+            return self.window
+        return min(self.window, self.rate_control.limit())
+
+    def fetch_and_submit(self, url, parse_pool):
+        """
+        Fetch a page in an I/O thread and submit it to the parse stage.
+
+        Returns
+        -------
+        concurrent.futures.Future or None
+            Future of the parsed record, or None if crawling is not allowed.
+        """
+        if not self.is_parsing_allowed(url):
+            return None
+        host = urlparse(url).netloc
+        if host not in self.scheduler.delays:
+            self.scheduler.configure(host, self.robots.get(url))
+        with self.metrics.stage("politeness"):
+            self.scheduler.acquire_blocking(host)
+        html = self.get_html(url)
+        return parse_pool.submit(parse_page, url, html)
+
+    def iter_crawl(self, start_url=None, max_pages=50):
+        """
+        Crawl the website through the fetch and parse pipeline.
+
+        Parameters
+        ----------
+        start_url : str, optional
+            URL from which the crawl starts. If None, the base URL is used.
+        max_pages : int, optional
+            Maximum number of pages to crawl (default is 50).
+
+        Yields
+        ------
+        dict
+            Extracted information of a visited page, in dispatch order.
+        """
+        parsed = urlparse(self.base_url)
+        self.init_robot_parser(f"{parsed.scheme}://{parsed.netloc}/robots.txt")
+        if start_url is None:
+            start_url = self.base_url
+
+        nb_pages = 0
+        visited = self.frontier.visited
+        self.metrics.start()
+        self.add_to_queue(start_url, visited)
+        in_flight = deque() #fetch futures, in dispatch order
+        checkpoint_due = False #wait for the pages in flight, then checkpoint
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as fetch_pool, \
+                ProcessPoolExecutor(max_workers=self.parse_workers, initializer=_init_parser,
+                                    initargs=(self.base_url, self.extractor_name, self.canonicalizer)) as parse_pool:
+            try:
+                while True:
+                    while (not checkpoint_due and len(in_flight) < self.in_flight_limit()
+                           and nb_pages + len(in_flight) < max_pages):
+                        with self.metrics.stage("queue"):
+                            current_url = self.pop_next_url()
+                        if current_url is None:
+                            break
+                        if current_url in visited:
+                            continue
+                        self.frontier.mark_visited(current_url)
+                        in_flight.append(fetch_pool.submit(self.fetch_and_submit, current_url, parse_pool))
+
+                    if not in_flight:
+                        if checkpoint_due:
+                            self.save_checkpoint()
+                            checkpoint_due = False
+                            continue
+                        break
+
+                    try:
+                        parse_future = in_flight.popleft().result() #oldest dispatched page first
+                        if parse_future is None:
+                            continue
+                        record, rewrites, timings = parse_future.result()
+                    except Exception:
+                        self.metrics.count_error("failed_page") #fetch errors are also counted by type
+                        continue
+                    for stage, seconds in timings.items():
+                        self.metrics.observe(stage, seconds)
+                    self.account_rewrites(rewrites)
+                    with self.metrics.stage("queue"):
+                        for link in record["links"]:
+                            self.add_to_queue(link, visited, parent=record["url"])
+                    self.metrics.gauge("frontier", len(self.frontier))
+                    self.metrics.gauge("in_flight", len(in_flight))
+                    nb_pages += 1
+                    self.metrics.count_page()
+                    yield record
+                    if nb_pages % self.checkpoint_every == 0:
+                        checkpoint_due = True
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+        self.save_checkpoint()
+        self.metrics.finish()
+
+
+if __name__ == "__main__":
+    crawler = PipelineCrawler("https://web-scraping.dev/products")
+    start = time.perf_counter()
+    nb_pages = crawler.crawl_to_jsonl("TP1/output/products.jsonl", max_pages=50)
+    print(f"{nb_pages} pages in {time.perf_counter() - start:.1f}s")
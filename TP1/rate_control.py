@@ -0,0 +1,158 @@
+import threading
+import time
+
+from async_crawler import HostScheduler, robots_delay
+
+
+class AdaptiveRateController(HostScheduler):
+    """
+    Per-host scheduler adapting the request rate to how the server copes.
+
+    The interval between two requests to a host follows an AIMD rule, like
+    TCP congestion control: every healthy response adds `increase` requests
+    per second to the rate, while a slow response, a 429, a 503 or a timeout
+    divides it by `1 / decrease`, once per burst: answers to requests sent
+    before the last back-off, or received while a Retry-After period is
+    running, do not count. Until the
+    first back-off of a host, the rate grows by `slow_start` percent per
+    response instead (slow start), so it quickly reaches the server limit. A global
+    window of requests in flight grows and shrinks the same way and is read
+    by the concurrent crawlers through `limit`.
+
+    The interval never drops below the robots.txt crawl delay or request
+    rate of the host, nor below `min_delay`, and a Retry-After header
+    blocks the host until the given time.
+
+    A response is slow when the smoothed latency of the host exceeds
+    `slow_factor` times the lowest smoothed latency seen so far, and by
+    more than `slow_margin` seconds.
+
+    Parameters
+    ----------
+    min_delay : float, optional
+        Lowest interval, whatever robots.txt allows (default is 0.02s).
+    initial_delay : float, optional
+        Interval used for a new host (default is 1s, as `Crawler.be_polite`).
+    max_delay : float, optional
+        Highest interval after back-offs (default is 60s).
+    increase : float, optional
+        Requests per second added after each healthy response.
+    slow_start : float, optional
+        Relative rate increase per healthy response before the first
+        back-off (default is 0.2).
+    decrease : float, optional
+        Factor applied to the rate and the window on congestion.
+    slow_factor, slow_margin : float, optional
+        Latency thresholds of a slow response.
+    max_concurrency : int, optional
+        Upper bound of the window of requests in flight.
+    """
+
+    def __init__(self, min_delay=0.02, initial_delay=1.0, max_delay=60.0, increase=0.2, slow_start=0.2,
+                 decrease=0.5, slow_factor=3.0, slow_margin=0.05, max_concurrency=32):
+        super().__init__(default_delay=initial_delay)
+        self.lock = threading.RLock() #record and reserve both update the slots
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.increase = increase
+        self.slow_start = slow_start
+        self.decrease = decrease
+        self.slow_factor = slow_factor
+        self.slow_margin = slow_margin
+        self.max_concurrency = max_concurrency
+        self.window = 1.0 #requests in flight allowed, all hosts together
+        self.floors = {} #host -> robots.txt interval
+        self.latency = {} #host -> (smoothed latency, lowest smoothed latency)
+        self.blocked_until = {} #host -> end of a Retry-After period
+        self.last_decrease = {} #host -> time of the last back-off
+        self.stats = {"healthy": 0, "slow": 0, "throttled": 0, "timeouts": 0, "backoffs": 0}
+
+    def set_delay(self, host, delay):
+        """
+        Set the robots.txt interval of a host, below which the rate never
+        goes. If None, only `min_delay` applies.
+        """
+        with self.lock:
+            self.floors[host] = max(self.min_delay, delay or 0.0)
+            self.delays[host] = max(self.floors[host], self.default_delay)
+
+    def configure(self, host, robot_parser):
+        self.set_delay(host, robots_delay(robot_parser, default=None))
+
+    def reserve(self, host):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot.get(host, 0.0), now, self.blocked_until.get(host, 0.0))
+            self.next_slot[host] = slot + self.get_delay(host)
+        return slot - now
+
+    def limit(self):
+        """
+        Number of requests currently allowed in flight.
+        """
+        return int(self.window)
+
+    def record(self, host, latency, status=None, retry_after=None, timeout=False):
+        """
+        Update the rate of a host with the outcome of a request.
+
+        Parameters
+        ----------
+        host : str
+            Network location (netloc) of the host.
+        latency : float
+            Duration of the request in seconds.
+        status : int, optional
+            HTTP error status, None for a successful response.
+        retry_after : float, optional
+            Seconds to wait given by a Retry-After header.
+        timeout : bool, optional
+            True if the request timed out or the connection failed.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if host not in self.floors:
+                self.set_delay(host, None)
+            blocked = now < self.blocked_until.get(host, 0.0) #this burst was already answered
+            if retry_after is not None:
+                self.blocked_until[host] = max(self.blocked_until.get(host, 0.0), now + retry_after)
+                self.next_slot[host] = max(self.next_slot.get(host, 0.0), self.blocked_until[host])
+
+            smoothed, lowest = self.latency.get(host, (latency, latency))
+            if timeout:
+                self.stats["timeouts"] += 1
+                congested = True
+            elif status in (429, 503):
+                self.stats["throttled"] += 1
+                congested = True
+            else:
+                smoothed = 0.8 * smoothed + 0.2 * latency
+                lowest = min(lowest, smoothed)
+                self.latency[host] = (smoothed, lowest)
+                congested = smoothed > self.slow_factor * lowest and smoothed - lowest > self.slow_margin
+                self.stats["slow" if congested else "healthy"] += 1
+
+            delay = self.delays[host]
+            if congested:
+                if not blocked and now - latency >= self.last_decrease.get(host, float("-inf")):
+                    self.delays[host] = min(self.max_delay, max(delay / self.decrease, self.floors[host]))
+                    self.window = max(1.0, self.window * self.decrease)
+                    self.last_decrease[host] = now
+                    self.stats["backoffs"] += 1
+            elif status is None:
+                if host in self.last_decrease:
+                    delay = delay / (1 + self.increase * delay) #rate += increase
+                else:
+                    delay = delay / (1 + self.slow_start) #rate *= 1 + slow_start
+                self.delays[host] = max(self.floors[host], delay)
+                self.window = min(self.max_concurrency, self.window + 1 / self.window)
+
+    def report(self):
+        """
+        Current interval of every host, window and outcome counts.
+        """
+        with self.lock:
+            report = dict(self.stats)
+            report["window"] = self.window
+            report["delays"] = dict(self.delays)
+        return report
@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+import urllib.robotparser
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlparse
+from urllib.request import urlopen
+
+
+class RobotsCache:
+    """
+    Cache of parsed robots.txt rules keyed by host, with expiry.
+
+    Rules are loaded lazily the first time a host is seen, from the disk
+    cache if a fresh copy exists, otherwise from the network. Hosts can be
+    prefetched in the background as soon as one of their URLs is queued,
+    and expired rules keep being served while a background refresh runs,
+    so permission checks in the crawl loop do not wait on the network.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Directory storing one JSON file per host. If None, rules are only
+        kept in memory.
+    ttl : float, optional
+        Lifetime of fetched rules in seconds (default is one day).
+    error_ttl : float, optional
+        Lifetime of a failed fetch, during which the host is treated as
+        fully disallowed (default is 5 minutes).
+    timeout : float, optional
+        Timeout of a robots.txt request in seconds (default is 10).
+    """
+
+    def __init__(self, cache_dir=None, ttl=86400, error_ttl=300, timeout=10, user_agent="*"):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.entries = {} #host root -> (parser, expires_at)
+        self.pending = {} #host root -> future of a running fetch
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "fetches": 0}
+
+    @staticmethod
+    def host_root(url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def _disk_path(self, root):
+        return self.cache_dir / (quote(root, safe="") + ".json")
+
+    def _build_parser(self, root, status, text):
+        """
+        Build a parser from a robots.txt answer, following the same rules as
+        `RobotFileParser.read`.
+        """
+        parser = urllib.robotparser.RobotFileParser(root + "/robots.txt")
+        if status in (401, 403):
+            parser.disallow_all = True
+        elif status is not None and 400 <= status < 500:
+            parser.allow_all = True
+        elif status == 200:
+            parser.parse(text.splitlines())
+        #server or network error: no rules loaded, can_fetch answers False
+        return parser
+
+    def _download(self, root):
+        """
+        Fetch robots.txt from the network.
+
+        Returns
+        -------
+        tuple
+            (HTTP status or None on network error, robots.txt text)
+        """
+        try:
+            with urlopen(root + "/robots.txt", timeout=self.timeout) as response:
+                return 200, response.read().decode("utf-8", errors="replace")
+        except HTTPError as err:
+            return err.code, ""
+        except (URLError, OSError):
+            return None, ""
+
+    def _load(self, root):
+        """
+        Load the rules of a host from disk or the network and store them.
+        """
+        record = None
+        if self.cache_dir is not None:
+            try:
+                with open(self._disk_path(root), "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (FileNotFoundError, ValueError):
+                record = None
+        if record is not None and record["expires_at"] > time.time():
+            self.stats["disk_hits"] += 1
+        else:
+            status, text = self._download(root)
+            self.stats["fetches"] += 1
+            ttl = self.ttl if status is not None and status < 500 else self.error_ttl
+            record = {"status": status, "text": text, "expires_at": time.time() + ttl}
+            if self.cache_dir is not None:
+                path = self._disk_path(root)
+                tmp_path = path.with_suffix(".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(record, f)
+                tmp_path.replace(path)
+
+        parser = self._build_parser(root, record["status"], record["text"])
+        with self.lock:
+            self.entries[root] = (parser, record["expires_at"])
+            self.pending.pop(root, None)
+        return parser
+
+    def _schedule(self, root):
+        """
+        Start a background load of a host unless one is already running.
+        """
+        with self.lock:
+            future = self.pending.get(root)
+            if future is None:
+                future = self.executor.submit(self._load, root)
+                self.pending[root] = future
+        return future
+
+    def prefetch(self, url):
+        """
+        Load the rules of the host of `url` in the background if they are
+        missing or expired.
+        """
+        root = self.host_root(url)
+        entry = self.entries.get(root)
+        if entry is None or entry[1] <= time.time():
+            self._schedule(root)
+
+    def get(self, url):
+        """
+        Return the robots.txt parser of the host of `url`.
+
+        Cached rules are returned immediately, even when expired (a refresh
+        is then started in the background). Only the very first request to
+        a host waits for its rules.
+
+        Parameters
+        ----------
+        url : str
+            Any URL of the host (page or robots.txt URL).
+
+        Returns
+        -------
+        urllib.robotparser.RobotFileParser
+            Parser loaded with the rules of the host.
+        """
+        root = self.host_root(url)
+        entry = self.entries.get(root)
+        if entry is not None:
+            self.stats["memory_hits"] += 1
+            if entry[1] <= time.time():
+                self._schedule(root) #stale-while-revalidate
+            return entry[0]
+        return self._schedule(root).result()
+
+    def can_fetch(self, url):
+        return self.get(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        return self.get(url).crawl_delay(self.user_agent)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
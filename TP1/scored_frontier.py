@@ -0,0 +1,248 @@
+import heapq
+import json
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+
+from frontier import Frontier
+
+
+class UrlScorer:
+    """
+    Default scoring of the URLs of a `ScoredFrontier`, and so of the
+    crawlers; higher is crawled first.
+
+    The score adds up:
+    - the weight of every regular expression matching the URL,
+    - `depth_weight` times the link distance from the seeds,
+    - `inlink_weight` times log(1 + number of pages linking to the URL),
+    - `recency_weight` / (1 + days since the sitemap lastmod), so recently
+      modified pages come first.
+
+    Any callable `scorer(url, depth, inlinks, lastmod)` returning a float
+    can be used instead.
+
+    Parameters
+    ----------
+    patterns : iterable of tuple, optional
+        (regular expression, weight) pairs (default puts product pages
+        first, the other terms ordering pages of the same kind).
+    depth_weight : float, optional
+        Weight of the depth (default is -1: shallow pages first).
+    inlink_weight : float, optional
+        Weight of the in-link count (default is 1).
+    recency_weight : float, optional
+        Weight of the lastmod recency (default is 5).
+    """
+
+    def __init__(self, patterns=((r"product/", 100.0),), depth_weight=-1.0, inlink_weight=1.0,
+                 recency_weight=5.0):
+        self.patterns = [(re.compile(pattern), weight) for pattern, weight in patterns]
+        self.depth_weight = depth_weight
+        self.inlink_weight = inlink_weight
+        self.recency_weight = recency_weight
+
+    def __call__(self, url, depth, inlinks, lastmod):
+        score = self.depth_weight * depth + self.inlink_weight * math.log1p(inlinks)
+        for pattern, weight in self.patterns:
+            if pattern.search(url):
+                score += weight
+        if lastmod is not None:
+            age_days = max(time.time() - lastmod, 0.0) / 86400
+            score += self.recency_weight / (1 + age_days)
+        return score
+
+
+class ScoredFrontier(Frontier):
+    """
+    Crawl frontier serving the URL with the highest score first.
+
+    Queued URLs live in a binary heap, so `push` and `pop` cost O(log n).
+    Each queued URL keeps its depth, in-link count and lastmod: pushing an
+    already queued URL counts one more in-link and re-scores it. The old
+    heap entry is left in place and skipped when popped (lazy deletion);
+    the heap is rebuilt when such stale entries outnumber the live ones.
+    Ties are served in insertion order.
+
+    The depth of a link is the depth of its parent page plus one. Parents
+    are looked up among the `recent_parents` last popped URLs, which covers
+    the pages being crawled; links of an older page get depth 1.
+
+    The visited set and the checkpoints work as in `Frontier`. Queued URLs
+    stay in memory; a checkpoint appends the entries changed since the
+    previous one to a queue log, and the log is rewritten from the live
+    entries (in a new file, so the previous checkpoint stays valid) when
+    it holds more than twice as many lines.
+
+    Parameters
+    ----------
+    scorer : callable, optional
+        Function (url, depth, inlinks, lastmod) -> score. Default is
+        `UrlScorer()`.
+    checkpoint_dir, visited_capacity, visited_error_rate
+        See `Frontier`.
+    recent_parents : int, optional
+        Number of popped URLs whose depth is remembered (default 100000).
+    """
+
+    def __init__(self, scorer=None, checkpoint_dir=None, visited_capacity=None, visited_error_rate=0.001,
+                 recent_parents=100000):
+        super().__init__(0, checkpoint_dir, visited_capacity=visited_capacity,
+                         visited_error_rate=visited_error_rate)
+        self.scorer = scorer or UrlScorer()
+        self.heap = [] #(-score, sequence, url), possibly stale
+        self.info = {} #queued url -> [depth, inlinks, lastmod, score, sequence of its live heap entry]
+        self.queued = self.info #membership and length of the queued URLs
+        self.sequence = 0
+        self.recent_parents = recent_parents
+        self.popped_depths = OrderedDict() #last popped urls -> depth
+        self.changed = {} #url -> entry, or None once popped, since the last checkpoint
+        self.log_generation = 0 #queue log number, bumped when it is rewritten
+        self.log_lines = 0
+
+    def _log_path(self, generation):
+        return self.checkpoint_dir / f"queue_{generation}.log"
+
+    def _add_entry(self, url, entry):
+        entry[3] = self.scorer(url, entry[0], entry[1], entry[2])
+        if self.checkpoint_dir is not None:
+            self.changed[url] = entry
+        self.sequence += 1
+        entry[4] = self.sequence
+        heapq.heappush(self.heap, (-entry[3], self.sequence, url))
+        if len(self.heap) > 2 * len(self.info) + 1024:
+            self._compact()
+
+    def _compact(self):
+        """
+        Rebuild the heap from the live entries only.
+        """
+        self.heap = [entry for entry in self.heap
+                     if entry[2] in self.info and entry[1] == self.info[entry[2]][4]]
+        heapq.heapify(self.heap)
+
+    def push(self, url, level=0, parent=None, lastmod=None):
+        """
+        Queue a URL, or count one more in-link if it is already queued.
+
+        Parameters
+        ----------
+        url : str
+            URL to queue.
+        level : int, optional
+            Ignored, the scorer decides the order.
+        parent : str, optional
+            URL of the page linking to `url`, if any.
+        lastmod : float, optional
+            Last modification time (POSIX timestamp) from a sitemap.
+
+        Returns
+        -------
+        bool
+            True if the URL was added, False otherwise.
+        """
+        entry = self.info.get(url)
+        if entry is not None:
+            entry[1] += 1
+            if lastmod is not None:
+                entry[2] = lastmod
+            self._add_entry(url, entry)
+            return False
+        if url in self.visited:
+            return False
+        if parent is None:
+            depth = 0
+        else:
+            depth = self.popped_depths.get(parent, 0) + 1
+        entry = [depth, 0 if parent is None else 1, lastmod, 0.0, 0]
+        self.info[url] = entry
+        self._add_entry(url, entry)
+        return True
+
+    def pop(self):
+        """
+        Remove and return the URL with the highest score.
+
+        Returns
+        -------
+        str or None
+            Next URL to crawl, or None if the frontier is empty.
+        """
+        while self.heap:
+            _, sequence, url = heapq.heappop(self.heap)
+            entry = self.info.get(url)
+            if entry is None or entry[4] != sequence:
+                continue #stale entry
+            del self.info[url]
+            if self.checkpoint_dir is not None:
+                self.changed[url] = None
+            self.popped_depths[url] = entry[0]
+            if len(self.popped_depths) > self.recent_parents:
+                self.popped_depths.popitem(last=False)
+            return url
+        return None
+
+    def queue_state(self):
+        """
+        Write the queue changes to the queue log and return its position.
+
+        Each line is [url, depth, inlinks, lastmod, sequence] for a queued
+        or updated URL, [url] for a popped one; the sequence keeps the order
+        of the ties when resuming.
+        """
+        if self.log_lines > 2 * len(self.info) + 1024:
+            self.log_generation += 1
+            lines = ([url] + entry[:3] + entry[4:] for url, entry in self.info.items())
+            mode, self.log_lines = "w", 0
+        else:
+            lines = ([url] if entry is None else [url] + entry[:3] + entry[4:]
+                     for url, entry in self.changed.items())
+            mode = "a"
+        with open(self._log_path(self.log_generation), mode, encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line) + "\n")
+                self.log_lines += 1
+            size = f.tell()
+        self.changed = {}
+        return {"queue_log": self.log_generation, "queue_size": size, "queue_lines": self.log_lines}
+
+    def checkpoint(self):
+        super().checkpoint()
+        if self.checkpoint_dir is not None:
+            self._remove_old_logs()
+
+    def _remove_old_logs(self):
+        for path in self.checkpoint_dir.glob("queue_*.log"):
+            if path != self._log_path(self.log_generation):
+                os.remove(path) #a rewritten log, or one written after the checkpoint
+
+    def restore_queues(self, state):
+        entries = {}
+        if "entries" in state: #checkpoint written before the queue log
+            entries = {url: [depth, inlinks, lastmod, 0.0, 0] for url, depth, inlinks, lastmod in state["entries"]}
+        else:
+            self.log_generation, self.log_lines = state["queue_log"], state["queue_lines"]
+            with open(self._log_path(self.log_generation), "r+", encoding="utf-8") as f:
+                f.truncate(state["queue_size"]) #drop changes logged after the checkpoint
+                f.seek(0)
+                for line in f:
+                    url, *entry = json.loads(line)
+                    if entry:
+                        entries[url] = entry[:3] + [0.0] + entry[3:]
+                    else:
+                        entries.pop(url, None)
+            self._remove_old_logs()
+        for url, entry in sorted(entries.items(), key=lambda item: item[1][4]): #heap order of the ties
+            self.info[url] = entry
+            self._add_entry(url, entry)
+        self.changed = {}
+
+    @classmethod
+    def load(cls, checkpoint_dir, scorer=None, visited_capacity=None, visited_error_rate=0.001):
+        """
+        Build a scored frontier from the checkpoint directory, or an empty
+        one if no checkpoint exists yet.
+        """
+        return cls(scorer, checkpoint_dir, visited_capacity, visited_error_rate).resume()
@@ -0,0 +1,76 @@
+import gzip
+import io
+import os
+
+import jsonlines
+
+
+class JsonlSink:
+    """
+    Batched JSONL writer with a bounded buffer.
+
+    Records are kept in memory until `batch_size` of them are waiting, then
+    written and flushed to the file in one go. At most `batch_size` records
+    are therefore held at any time, and a crash loses at most one batch.
+
+    Parameters
+    ----------
+    output_path : str
+        Path to the output JSONL file.
+    batch_size : int, optional
+        Number of records buffered before a write (default is 100).
+    mode : str, optional
+        "w" to overwrite the file, "a" to append to it.
+    fsync : bool, optional
+        If True, each flush is also forced to the disk.
+    compress : bool, optional
+        If True, each batch is written as its own gzip member. The file
+        reads back with `gzip.open` like a single stream, and a crash only
+        loses the last batch instead of corrupting the whole file.
+    """
+
+    def __init__(self, output_path, batch_size=100, mode="w", fsync=False, compress=False):
+        self.compress = compress
+        if compress:
+            self.fp = open(output_path, mode + "b")
+            self.block = io.BytesIO() #current batch, before compression
+            self.writer = jsonlines.Writer(self.block)
+        else:
+            self.fp = open(output_path, mode, encoding="utf-8")
+            self.writer = jsonlines.Writer(self.fp)
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.buffer = []
+        self.written = 0
+
+    def write(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records and flush them to the file.
+        """
+        if self.buffer:
+            self.writer.write_all(self.buffer)
+            self.written += len(self.buffer)
+            self.buffer = []
+            if self.compress:
+                self.fp.write(gzip.compress(self.block.getvalue()))
+                self.block.seek(0)
+                self.block.truncate()
+        self.fp.flush()
+        if self.fsync:
+            os.fsync(self.fp.fileno())
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
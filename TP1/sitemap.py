@@ -0,0 +1,241 @@
+import heapq
+import io
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+from http.client import HTTPException
+from pathlib import Path
+from urllib.request import urlopen
+from xml.etree.ElementTree import ParseError, iterparse
+
+
+def parse_lastmod(value):
+    """
+    Parse a sitemap <lastmod> (W3C datetime) into a POSIX timestamp.
+
+    Returns
+    -------
+    float or None
+        Timestamp, or None if the value is missing or invalid. Dates
+        without a timezone are taken as UTC.
+    """
+    if not value:
+        return None
+    try:
+        date = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+
+def newest(entries, max_urls):
+    """
+    Keep the `max_urls` most recently modified sitemap entries in a bounded
+    heap, so memory does not grow with the size of the sitemaps.
+
+    Parameters
+    ----------
+    entries : iterable of tuple
+        (url, lastmod) pairs, lastmod being a string or None (oldest).
+    max_urls : int
+        Number of entries kept.
+
+    Returns
+    -------
+    tuple
+        List of the (url, lastmod) kept, newest first and in sitemap order
+        for the same lastmod, and the number of entries left out. A URL
+        listed several times keeps its newest lastmod.
+    """
+    heap = [] #(timestamp, -rank, url), the oldest entry on top
+    kept = {} #url -> (timestamp, -rank, lastmod) of its live heap entry
+    nb_dropped = 0
+    for rank, (url, lastmod) in enumerate(entries):
+        timestamp = parse_lastmod(lastmod)
+        key = (float("-inf") if timestamp is None else timestamp, -rank)
+        if url in kept and key[0] <= kept[url][0]:
+            continue
+        kept[url] = key + (lastmod,) #a former heap entry of the URL is now stale
+        heapq.heappush(heap, key + (url,))
+        while len(kept) > max_urls:
+            timestamp, neg_rank, oldest = heapq.heappop(heap)
+            if kept.get(oldest, ())[:2] == (timestamp, neg_rank):
+                del kept[oldest]
+                nb_dropped += 1
+        if len(heap) > 2 * max_urls + 1: #drop the stale entries
+            heap = [(timestamp, neg_rank, url) for url, (timestamp, neg_rank, _) in kept.items()]
+            heapq.heapify(heap)
+    order = sorted(kept, key=lambda url: kept[url][:2], reverse=True)
+    return [(url, kept[url][2]) for url in order], nb_dropped
+
+
+class GunzipReader(io.RawIOBase):
+    """
+    File-like object decompressing a gzip stream on the fly, so a gzipped
+    sitemap is parsed without being loaded in memory.
+    """
+
+    def __init__(self, raw, chunk_size=65536):
+        self.raw = raw
+        self.chunk_size = chunk_size
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) #gzip header
+        self.pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            chunk = self.raw.read(self.chunk_size)
+            if not chunk:
+                self.pending = self.decompressor.flush()
+                break
+            self.pending = self.decompressor.decompress(chunk)
+        n = min(len(buffer), len(self.pending))
+        buffer[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+
+def iter_sitemap(stream):
+    """
+    Stream the entries of a sitemap or sitemap index.
+
+    The document is parsed incrementally and each element is dropped once
+    read, so memory stays constant whatever the sitemap size. Gzipped
+    documents are detected from their magic bytes.
+
+    Parameters
+    ----------
+    stream : file-like object
+        Binary stream of the sitemap.
+
+    Yields
+    ------
+    tuple
+        (kind, loc, lastmod) where kind is "url" for a page and "sitemap"
+        for a child sitemap of an index.
+    """
+    stream = io.BufferedReader(stream) if not hasattr(stream, "peek") else stream
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        stream = io.BufferedReader(GunzipReader(stream))
+
+    root = None
+    for event, elem in iterparse(stream, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            continue
+        kind = elem.tag.rsplit("}", 1)[-1] #drop the namespace
+        if kind in ("url", "sitemap"):
+            loc = lastmod = None
+            for child in elem:
+                name = child.tag.rsplit("}", 1)[-1]
+                if name == "loc":
+                    loc = (child.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = (child.text or "").strip()
+            if loc:
+                yield kind, loc, lastmod
+            root.clear() #free the entries already read
+
+
+class SitemapSeeder:
+    """
+    Reader of sitemaps remembering the lastmod of the pages crawled in
+    previous runs.
+
+    Sitemap indexes are followed recursively. The state file maps each
+    crawled URL to the lastmod it had in the sitemap, so a page whose
+    lastmod did not change since can be skipped.
+
+    Parameters
+    ----------
+    state_path : str, optional
+        JSON file holding the lastmod of the pages already crawled. If
+        None, nothing is remembered between runs.
+    timeout : float, optional
+        Timeout of a sitemap request in seconds (default is 30).
+    max_sitemaps : int, optional
+        Maximum number of sitemap documents read, to stop index loops.
+    """
+
+    def __init__(self, state_path=None, timeout=30, max_sitemaps=1000):
+        self.state_path = Path(state_path) if state_path else None
+        self.timeout = timeout
+        self.max_sitemaps = max_sitemaps
+        self.crawled = {} #url -> lastmod at the last crawl
+        if self.state_path is not None and self.state_path.exists():
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.crawled = json.load(f)
+        self.seeded = {} #url -> lastmod of the URLs queued in this run
+        self.stats = {"sitemaps": 0, "urls": 0, "unchanged": 0, "errors": 0, "over_limit": 0}
+
+    def entries(self, sitemap_urls):
+        """
+        Stream the page URLs of sitemaps, following sitemap indexes.
+
+        Parameters
+        ----------
+        sitemap_urls : list of str
+            URLs of the sitemaps or sitemap indexes to read.
+
+        Yields
+        ------
+        tuple
+            (url, lastmod) of each page, lastmod being a string or None.
+        """
+        to_read = list(sitemap_urls)
+        seen = set(to_read)
+        while to_read and self.stats["sitemaps"] < self.max_sitemaps:
+            sitemap_url = to_read.pop(0)
+            self.stats["sitemaps"] += 1
+            try:
+                response = urlopen(sitemap_url, timeout=self.timeout)
+            except OSError:
+                continue #missing sitemap: crawl from the links only
+            with response:
+                try:
+                    for kind, loc, lastmod in iter_sitemap(response):
+                        if kind == "sitemap":
+                            if loc not in seen:
+                                seen.add(loc)
+                                to_read.append(loc)
+                            continue
+                        self.stats["urls"] += 1
+                        yield loc, lastmod
+                except (ParseError, zlib.error, OSError, HTTPException):
+                    self.stats["errors"] += 1 #malformed or cut sitemap: keep its entries read so far
+
+    def unchanged(self, url, lastmod):
+        """
+        True if the page was crawled in a previous run and its lastmod is
+        not newer than at that time.
+        """
+        if url not in self.crawled:
+            return False
+        before, now = parse_lastmod(self.crawled[url]), parse_lastmod(lastmod)
+        return before is not None and now is not None and now <= before
+
+    def commit(self, visited):
+        """
+        Remember the lastmod of the seeded pages now visited and save the
+        state file.
+
+        Parameters
+        ----------
+        visited : set or bloom.BloomFilter
+            URLs visited by the crawl.
+        """
+        done = [url for url in self.seeded if url in visited]
+        for url in done:
+            self.crawled[url] = self.seeded.pop(url)
+        if self.state_path is None or not done:
+            return
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.crawled, f)
+        os.replace(tmp_path, self.state_path) #atomic
@@ -0,0 +1,214 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    """
+    Request handler serving a synthetic product catalog shaped like
+    web-scraping.dev: listing pages `/products?page=N` and product pages
+    `/product/K`.
+
+    Pages carry an ETag and a Last-Modified date and conditional requests
+    are answered with 304 when the page did not change. Requests beyond the
+    server rate limit get a 429 with a Retry-After header. When sitemaps are
+    enabled, `/sitemap.xml` is an index of `/sitemap-N.xml` documents, every
+    other one gzipped (`/sitemap-N.xml.gz`).
+    """
+
+    protocol_version = "HTTP/1.1" #keep-alive
+    disable_nagle_algorithm = True #headers and body are written separately
+
+    def log_message(self, format, *args):
+        pass #keep benchmark output readable
+
+    def send_body(self, body, content_type="text/html; charset=utf-8"):
+        data = body if isinstance(body, bytes) else body.encode("utf-8")
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.server.last_modified)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        p = urlparse(self.path)
+        if p.path == "/robots.txt":
+            self.send_body(server.robots_txt, "text/plain")
+            return
+        if p.path.startswith("/sitemap") and server.sitemap_size:
+            server.sitemap_hits += 1
+            body = server.sitemap_document(p.path)
+            if body is None:
+                self.send_error(404)
+            else:
+                self.send_body(body, "application/xml")
+            return
+
+        if server.throttle():
+            self.send_response(429)
+            self.send_header("Retry-After", str(server.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        with server.lock:
+            server.active += 1
+            load = server.active / server.capacity if server.capacity else 1
+        try:
+            time.sleep(server.latency * max(load, 1)) #simulated processing time, slower when overloaded
+        finally:
+            with server.lock:
+                server.active -= 1
+        server.hits += 1
+        parts = [x for x in p.path.split("/") if x]
+
+        if parts == ["products"]:
+            page = int(parse_qs(p.query).get("page", ["1"])[0])
+            self.send_body(server.listing_page(page))
+        elif len(parts) == 2 and parts[0] == "product" and parts[1].isdigit():
+            self.send_body(server.product_page(int(parts[1])))
+        else:
+            self.send_error(404)
+
+
+class CatalogServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the crawled shop, used by the benchmarks.
+
+    Parameters
+    ----------
+    nb_products : int
+        Number of product pages in the catalog.
+    per_page : int
+        Number of products linked from each listing page.
+    latency : float
+        Seconds the server waits before answering a page request.
+    robots_txt : str
+        Content served at /robots.txt.
+    padding : int
+        Number of filler bytes added to product pages to mimic real pages.
+    max_rate : float, optional
+        Page requests accepted per second; the others get a 429.
+    capacity : int, optional
+        Requests processed at once before the latency grows linearly.
+    sitemap_size : int, optional
+        Number of product URLs per sitemap document. If None, no sitemap
+        is served.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, nb_products=200, per_page=10, latency=0.05,
+                 robots_txt="User-agent: *\nAllow: /\n", padding=0, port=0, max_rate=None, capacity=None,
+                 sitemap_size=None):
+        super().__init__(("127.0.0.1", port), CatalogHandler)
+        self.nb_products = nb_products
+        self.per_page = per_page
+        self.latency = latency
+        self.robots_txt = robots_txt
+        self.padding = padding
+        self.product_page_extra = "" #extra markup appended to product pages
+        self.variant_links = False #link each product to equivalent variant URLs
+        self.hits = 0 #number of page requests served (robots.txt excluded)
+        self.not_modified = 0 #number of 304 answers
+        self.last_modified = "Mon, 05 Jan 2026 10:00:00 GMT"
+        self.max_rate = max_rate
+        self.capacity = capacity
+        self.retry_after = 1 #seconds announced in 429 answers
+        self.throttled = 0 #number of 429 answers
+        self.active = 0 #requests being processed
+        self.recent = deque() #start times of the page requests of the last second
+        self.lock = threading.Lock()
+        self.sitemap_size = sitemap_size
+        self.sitemap_hits = 0 #number of sitemap documents served
+        self.lastmod = {} #product -> lastmod date, default "2026-01-05"
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def throttle(self):
+        """
+        Return True if a new page request exceeds the rate limit.
+        """
+        if self.max_rate is None:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and self.recent[0] <= now - 1:
+                self.recent.popleft()
+            if len(self.recent) >= self.max_rate:
+                self.throttled += 1
+                return True
+            self.recent.append(now)
+            return False
+
+    def sitemap_document(self, path):
+        """
+        Return the sitemap index or one of its sitemaps, or None.
+        """
+        ns = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+        nb_sitemaps = (self.nb_products + self.sitemap_size - 1) // self.sitemap_size
+        if path == "/sitemap.xml":
+            entries = "".join(
+                f"<sitemap><loc>{self.base_url}/sitemap-{i}.xml{'.gz' if i % 2 else ''}</loc></sitemap>"
+                for i in range(nb_sitemaps))
+            return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex {ns}>{entries}</sitemapindex>'
+        name = path[len("/sitemap-"):]
+        number = name.split(".", 1)[0]
+        if not number.isdigit() or int(number) >= nb_sitemaps or name.endswith(".gz") != (int(number) % 2 == 1):
+            return None
+        first = int(number) * self.sitemap_size + 1
+        last = min(first + self.sitemap_size, self.nb_products + 1)
+        entries = "".join(
+            f"<url><loc>{self.base_url}/product/{k}</loc>"
+            f"<lastmod>{self.lastmod.get(k, '2026-01-05')}</lastmod></url>"
+            for k in range(first, last))
+        document = f'<?xml version="1.0" encoding="UTF-8"?><urlset {ns}>{entries}</urlset>'
+        return gzip.compress(document.encode("utf-8")) if name.endswith(".gz") else document
+
+    def listing_page(self, page):
+        nb_pages = (self.nb_products + self.per_page - 1) // self.per_page
+        first = (page - 1) * self.per_page + 1
+        last = min(first + self.per_page, self.nb_products + 1)
+        links = "".join(f'<a href="/product/{k}">Product {k}</a>' for k in range(first, last))
+        if page < nb_pages:
+            links += f'<a href="/products?page={page + 1}">next</a>'
+        return (f"<html><head><title>product page {page}</title></head>"
+                f"<body><nav><a href='/products'>Products</a></nav>{links}</body></html>")
+
+    def product_page(self, k):
+        variants = ""
+        if self.variant_links: #same page, different parameter order / tracking
+            variants = (f"<a href='/product/{k}?variant=red&size=m'>red</a>"
+                        f"<a href='/product/{k}?size=m&variant=red'>red</a>"
+                        f"<a href='/product/{k}?variant=red&size=m&utm_source=shop'>red</a>")
+        return (f"<html><head><title>Product {k}</title></head><body>"
+                f"<a href='/products'>Products</a>{variants}"
+                f"<p>Description of product {k}, a versatile item.</p>"
+                f"<p>Second paragraph.</p>{self.product_page_extra}"
+                f"<!--{'x' * self.padding}--></body></html>")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,88 @@
+import re
+from functools import lru_cache
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+") #applied to lowercased text
+
+
+def load_stop_words():
+    """
+    English stop words of the NLTK corpus.
+    """
+    from nltk.corpus import stopwords
+    return stopwords.words('english')
+
+
+class Analyzer:
+    """
+    Text analysis shared by the indexes (TP2) and the queries (TP3), so a
+    query term always matches the index term of the same word.
+
+    A text is lowercased and split on whitespace; each whitespace token is
+    split into terms made of ASCII letters and digits (so "cat-ear," gives
+    "cat" and "ear"). Stop words are dropped but still count as positions.
+    The terms of a whitespace token are kept in an LRU cache, since the
+    same words come back in every document.
+
+    Parameters
+    ----------
+    stop_words : iterable of str, optional
+        Words to drop (default is the NLTK English list).
+    cache_size : int, optional
+        Number of whitespace tokens whose terms are cached (default 65536).
+    """
+
+    def __init__(self, stop_words=None, cache_size=65536):
+        self.stop_words = frozenset(load_stop_words() if stop_words is None else stop_words)
+        self.split = lru_cache(maxsize=cache_size)(self._split)
+
+    def _split(self, token):
+        """
+        Terms of a lowercased whitespace token, None standing for a stop
+        word.
+        """
+        return tuple(None if term in self.stop_words else term for term in TERM_PATTERN.findall(token))
+
+    def sequence(self, text):
+        """
+        Terms of a text in order, None standing for a stop word.
+        """
+        split = self.split
+        return [term for token in (text or "").lower().split() for term in split(token)]
+
+    def analyze(self, text):
+        """
+        Terms of a text, stop words removed.
+
+        Returns
+        -------
+        list of str
+        """
+        return [term for term in self.sequence(text) if term is not None]
+
+    def positions(self, text):
+        """
+        Terms of a text with their positions, stop words removed but
+        counted.
+
+        Returns
+        -------
+        list of tuple
+            (position, term) pairs.
+        """
+        return [(pos, term) for pos, term in enumerate(self.sequence(text)) if term is not None]
+
+    def analyze_fields(self, texts):
+        """
+        `positions` of several fields of a document in one call.
+
+        Parameters
+        ----------
+        texts : iterable of str
+            Field values (None counts as an empty field).
+
+        Returns
+        -------
+        list of list of tuple
+            (position, term) pairs of each field.
+        """
+        return [self.positions(text) for text in texts]
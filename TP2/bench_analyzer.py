@@ -0,0 +1,84 @@
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import jsonlines
+from nltk.corpus import stopwords
+from nltk.tokenize import RegexpTokenizer
+
+from analyzer import Analyzer
+from bench_index import make_input
+from index import IndexBuilder
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "TP3")) #search engine
+
+from websearcher import Websearcher
+
+
+def former_analysis(texts, stop_words):
+    """
+    Analysis of the former `Index.normalize(Index.tokenize(text))`, with a
+    new RegexpTokenizer at each call.
+    """
+    nb_terms = 0
+    for text in texts:
+        tokenizer = RegexpTokenizer(r"[A-Za-z0-9]+")
+        for token in text.lower().split():
+            for word in tokenizer.tokenize(token):
+                if word not in stop_words:
+                    nb_terms += 1
+    return nb_terms
+
+
+def analyzer_analysis(texts, analyzer):
+    return sum(len(terms) for terms in analyzer.analyze_fields(texts))
+
+
+def check_query_analysis(store):
+    """
+    A document title used as a query gives the terms indexed for it, at
+    the indexed positions.
+    """
+    with tempfile.TemporaryDirectory(prefix="analyzer_") as workdir:
+        IndexBuilder(features_to_keep=["brand", "made in"]).add_file(store).save(workdir)
+        websearcher = Websearcher(
+            title_pos_path=f"{workdir}/positional_title.json",
+            desc_pos_path=f"{workdir}/positional_description.json",
+            reviews_path=f"{workdir}/reviews.json",
+            synonyms_path=str(Path(__file__).resolve().parent.parent / "TP3/input/origin_synonyms.json"),
+            origin_path=f"{workdir}/made in_index.json",
+            brand_path=f"{workdir}/brand_index.json",
+            documents_path=f"{workdir}/documents.json",
+            products_path=store
+        )
+        with jsonlines.open(store) as reader:
+            for doc, o in enumerate(reader):
+                tokens = websearcher.tokenize(o["title"])
+                positions = websearcher.analyzer.positions(o["title"])
+                assert tokens == [t for _, t in positions], o["title"]
+                assert all(pos in websearcher.title_pos[t][doc] for pos, t in positions), o["title"]
+
+
+if __name__ == "__main__":
+    check_query_analysis("input/products_with_id.jsonl")
+    print("query analysis matches index analysis")
+
+    nb_records = 20000
+    with tempfile.TemporaryDirectory(prefix="analyzer_") as workdir:
+        input_file = f"{workdir}/products_with_id.jsonl"
+        make_input(input_file, "input/products_with_id.jsonl", nb_records)
+        with jsonlines.open(input_file) as reader:
+            texts = [text for o in reader for text in (o.get("title") or "", o.get("description") or "")]
+    stop_words = set(stopwords.words('english'))
+    print(f"{len(texts)} fields of {nb_records} documents")
+
+    analyzer = Analyzer(stop_words)
+    for name, run in (("RegexpTokenizer per call (before)", lambda: former_analysis(texts, stop_words)),
+                      ("Analyzer, cold cache", lambda: analyzer_analysis(texts, analyzer)),
+                      ("Analyzer, warm cache", lambda: analyzer_analysis(texts, analyzer))):
+        start = time.perf_counter()
+        nb_terms = run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<34}: {nb_terms} terms, {nb_terms / elapsed / 1e6:5.2f} M terms/s")
+    print(analyzer.split.cache_info())
@@ -0,0 +1,75 @@
+import json
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import jsonlines
+
+import pre_traitement
+from pre_traitement import enrich_file, extract_information, add_information
+
+
+def make_input(path, source_path, nb_records):
+    """
+    Write a synthetic crawl dump by repeating the records of `source_path`
+    with distinct product ids.
+    """
+    with jsonlines.open(source_path) as reader:
+        records = list(reader)
+    with open(path, "w", encoding="utf-8") as f:
+        for k in range(nb_records):
+            o = dict(records[k % len(records)])
+            o["url"] = o["url"].replace("/product/", f"/product/{k}") if "/product/" in o["url"] else o["url"]
+            f.write(json.dumps(o, ensure_ascii=False) + "\n")
+
+
+def legacy(input_path, output_path):
+    add_information(extract_information(input_path), output_path)
+
+
+def streaming(input_path, output_path, workers, codec):
+    if codec == "json":
+        pre_traitement.orjson = None
+        pre_traitement.loads = json.loads
+        encoder = json.JSONEncoder(ensure_ascii=False)
+        pre_traitement.dumps = lambda o: encoder.encode(o).encode("utf-8")
+    enrich_file(input_path, output_path, workers=workers)
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    nb_records = 200000
+    with tempfile.TemporaryDirectory(prefix="enrich_") as workdir:
+        input_path = f"{workdir}/products.jsonl"
+        make_input(input_path, "input/products.jsonl", nb_records)
+        print(f"{nb_records} records, {os.path.getsize(input_path) / 1e6:.0f} MB, {os.cpu_count()} CPU")
+
+        workers = max(os.cpu_count(), 2)
+        scenarios = (
+            ("load all, serial (before)", legacy, ()),
+            ("streaming, json, 1 process", streaming, (1, "json")),
+            ("streaming, orjson, 1 process", streaming, (1, "orjson")),
+            (f"streaming, orjson, {workers} processes", streaming, (workers, "orjson")),
+        )
+        outputs = []
+        for name, function, args in scenarios:
+            output_path = f"{workdir}/{len(outputs)}.jsonl"
+            with ProcessPoolExecutor(max_workers=1) as runner: #fresh process: own peak memory
+                elapsed, peak = runner.submit(measure, function, input_path, output_path, *args).result()
+            outputs.append(output_path)
+            print(f"{name:<32}: {nb_records / elapsed:8.0f} records/s, peak RSS {peak:6.0f} MB")
+
+        with jsonlines.open(outputs[0]) as reference:
+            expected = list(reference)
+        for output_path in outputs[1:]:
+            with jsonlines.open(output_path) as reader:
+                assert list(reader) == expected, output_path
+        print("all outputs hold the same records")
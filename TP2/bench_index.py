@@ -0,0 +1,124 @@
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import jsonlines
+
+from index import Index, IndexBuilder
+
+FEATURES = ["brand", "origin", "material", "size"]
+
+
+def make_input(path, source_path, nb_records):
+    """
+    Write a synthetic corpus by repeating the records of `source_path`
+    with distinct URLs.
+    """
+    with jsonlines.open(source_path) as reader:
+        records = list(reader)
+    with open(path, "w", encoding="utf-8") as f:
+        for k in range(nb_records):
+            o = dict(records[k % len(records)])
+            o["url"] = f"{o['url']}#{k}"
+            f.write(json.dumps(o, ensure_ascii=False) + "\n")
+
+
+def seven_passes(input_file):
+    index = Index()
+    feature_indexes = index.create_inverted_index_features(input_file, features_to_keep=FEATURES)
+    result = {
+        "inverted_title.json": index.create_inverted_index_title(input_file),
+        "inverted_description.json": index.create_inverted_index_description(input_file),
+        "reviews.json": index.create_index_reviews(input_file),
+        "positional_title.json": index.create_position_index(input_file, "title"),
+        "positional_description.json": index.create_position_index(input_file, "description"),
+    }
+    for feat_name in FEATURES:
+        result[f"{feat_name}_index.json"] = feature_indexes[feat_name]
+    return result
+
+
+def single_pass(input_file):
+    return IndexBuilder(features_to_keep=FEATURES).add_file(input_file).indexes()
+
+
+def with_urls(indexes):
+    """
+    Turn the doc id indexes of `IndexBuilder` back into the URL format of
+    the `Index.create_*` methods.
+    """
+    indexes.pop("stats.json", None) #no counterpart in the create_* methods
+    urls = [d["url"] for d in indexes.pop("documents.json")]
+    result = {"reviews.json": {urls[doc]: r for doc, r in enumerate(indexes.pop("reviews.json"))}}
+    for name, index_obj in indexes.items():
+        if name.startswith("positional"):
+            result[name] = {k: {urls[doc]: pos for doc, pos in v} for k, v in index_obj.items()}
+        else:
+            result[name] = {k: [urls[doc] for doc in v] for k, v in index_obj.items()}
+    return result
+
+
+def canonical(indexes):
+    """
+    Indexes with the posting lists sorted (title/description lists come
+    from sets in both paths).
+    """
+    return {name: {k: sorted(v) if isinstance(v, list) else v for k, v in index_obj.items()}
+            for name, index_obj in indexes.items()}
+
+
+def disk_size(indexes, output_dir):
+    index = Index()
+    for name, index_obj in indexes.items():
+        index.save_index(index_obj, f"{output_dir}/{name}")
+    return sum(os.path.getsize(f"{output_dir}/{name}") for name in indexes)
+
+
+def intersections(indexes, nb_queries=2000):
+    """
+    Time AND queries on pairs of frequent description tokens, intersecting
+    the posting lists as sets.
+    """
+    inverted = indexes["inverted_description.json"]
+    frequent = sorted(inverted, key=lambda k: len(inverted[k]), reverse=True)[:40]
+    pairs = [(frequent[i % 40], frequent[(7 * i + 3) % 40]) for i in range(nb_queries)]
+    start = time.perf_counter()
+    for a, b in pairs:
+        set(inverted[a]).intersection(inverted[b])
+    return nb_queries / (time.perf_counter() - start)
+
+
+def measure(function, input_file, output_dir):
+    start = time.perf_counter()
+    indexes = function(input_file)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    size = disk_size(indexes, output_dir)
+    rate = intersections(indexes)
+    if "documents.json" in indexes:
+        indexes = with_urls(indexes)
+    return elapsed, peak, size, rate, canonical(indexes)
+
+
+if __name__ == "__main__":
+    nb_records = 20000
+    with tempfile.TemporaryDirectory(prefix="index_") as workdir:
+        input_file = f"{workdir}/products_with_id.jsonl"
+        make_input(input_file, "input/products_with_id.jsonl", nb_records)
+        print(f"{nb_records} documents, {os.path.getsize(input_file) / 1e6:.0f} MB")
+
+        results = []
+        scenarios = (("create_* x7, URLs (before)", seven_passes), ("IndexBuilder, doc ids", single_pass))
+        for k, (name, function) in enumerate(scenarios):
+            with ProcessPoolExecutor(1, multiprocessing.get_context("spawn")) as runner: #own peak memory
+                elapsed, peak, size, rate, indexes = runner.submit(measure, function, input_file,
+                                                                   f"{workdir}/output_{k}").result()
+            results.append(indexes)
+            print(f"{name:<26}: {elapsed:6.2f}s, {nb_records / elapsed:6.0f} docs/s, peak RSS {peak:5.0f} MB,"
+                  f" {size / 1e6:5.0f} MB on disk, {rate:6.0f} AND queries/s")
+        assert results[0] == results[1]
+        print("same indexes")
@@ -0,0 +1,59 @@
+import gc
+import os
+import pickle
+import tempfile
+import time
+
+from bench_index import FEATURES, make_input
+from index import IndexBuilder, build_parallel, byte_ranges, index_byte_range
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def critical_path(input_file, workers):
+    """
+    Time the steps of a parallel build one after the other: indexing of
+    each byte range, pickling of its builder to the parent process, and
+    merges. With one core per worker, the build takes about the slowest
+    range, plus its transfer, plus the merges (with the garbage collector
+    paused, as in `build_parallel`).
+    """
+    ranges, transfers, merge = [], [], 0
+    builder = IndexBuilder(features_to_keep=FEATURES)
+    for start, end in byte_ranges(input_file, workers):
+        elapsed, local = timed(index_byte_range, input_file, start, end, FEATURES, builder.index.stop_words)
+        ranges.append(elapsed)
+        gc.disable()
+        elapsed, local = timed(lambda o: pickle.loads(pickle.dumps(o, pickle.HIGHEST_PROTOCOL)), local)
+        transfers.append(elapsed)
+        merge += timed(builder.merge, local)[0]
+        gc.enable()
+    return max(ranges) + max(transfers) + merge
+
+
+if __name__ == "__main__":
+    nb_records = 20000
+    with tempfile.TemporaryDirectory(prefix="parallel_") as workdir:
+        input_file = f"{workdir}/products_with_id.jsonl"
+        make_input(input_file, "input/products_with_id.jsonl", nb_records)
+        print(f"{nb_records} documents, {os.cpu_count()} CPU(s)")
+
+        serial, reference = timed(lambda: IndexBuilder(features_to_keep=FEATURES).add_file(input_file))
+        reference.save(f"{workdir}/serial", binary=True)
+        print(f"serial build        : {serial:6.2f}s")
+        print(f"{'workers':>7} {'measured':>9} {'speedup':>8} {'projected (1 core/worker)':>26}")
+        for workers in (1, 2, 4, 8):
+            elapsed, builder = timed(build_parallel, input_file, workers, FEATURES)
+            builder.save(f"{workdir}/parallel_{workers}", binary=True)
+            for name in os.listdir(f"{workdir}/serial"):
+                serial_file, parallel_file = f"{workdir}/serial/{name}", f"{workdir}/parallel_{workers}/{name}"
+                with open(serial_file, "rb") as a, open(parallel_file, "rb") as b:
+                    assert a.read() == b.read(), name
+            projected = critical_path(input_file, workers)
+            print(f"{workers:>7} {elapsed:>8.2f}s {serial / elapsed:>7.2f}x"
+                  f" {projected:>8.2f}s {serial / projected:>7.2f}x")
+        print("byte-identical to the serial build")
@@ -0,0 +1,62 @@
+import gc
+import json
+import os
+import tempfile
+import time
+
+from bench_index import make_input
+from index import IndexBuilder
+from postings import decode_docs, decode_positions, find_term, load_postings
+
+
+def nb_postings(index_obj):
+    return sum(len(v) for v in index_obj.values())
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory(prefix="postings_") as workdir:
+        nb_records = 20000
+        input_file = f"{workdir}/products_with_id.jsonl"
+        make_input(input_file, "input/products_with_id.jsonl", nb_records)
+        builder = IndexBuilder().add_file(input_file)
+        builder.save(f"{workdir}/json")
+        builder.save(f"{workdir}/bin", binary=True)
+        print(f"{nb_records} documents")
+
+        print(f"{'index':<28}{'JSON':>10}{'binary':>10}{'ratio':>7}{'JSON load':>14}{'binary load':>14}")
+        for name in sorted(builder.indexes()):
+            if name in ("documents.json", "reviews.json", "stats.json"):
+                continue
+            json_path = f"{workdir}/json/{name}"
+            bin_path = f"{workdir}/bin/{name[:-len('.json')]}.bin"
+
+            gc.disable() #as load_postings does, so only the formats are compared
+            start = time.perf_counter()
+            with open(json_path, "r", encoding="utf-8") as f:
+                expected = json.load(f)
+            json_time = time.perf_counter() - start
+            gc.enable()
+            if not expected:
+                continue
+            start = time.perf_counter()
+            decoded = load_postings(bin_path)
+            bin_time = time.perf_counter() - start
+            assert decoded == expected, name
+
+            json_size, bin_size = os.path.getsize(json_path), os.path.getsize(bin_path)
+            n = nb_postings(expected) / 1e6
+            print(f"{name:<28}{json_size / 1e6:8.2f}MB{bin_size / 1e6:8.2f}MB{json_size / bin_size:6.1f}x"
+                  f"{n / json_time:9.2f}M p/s{n / bin_time:9.2f}M p/s")
+
+        print("single term, binary search + decode (JSON needs the whole file)")
+        for name in ("inverted_description", "positional_description"):
+            with open(f"{workdir}/bin/{name}.bin", "rb") as f:
+                data = f.read()
+            decode = decode_positions if name.startswith("positional") else decode_docs
+            terms = sorted(builder.indexes()[f"{name}.json"])
+            start = time.perf_counter()
+            for term in terms:
+                df, offset, length = find_term(data, term)
+                decode(data, offset, offset + length)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<28}{1e6 * elapsed / len(terms):8.1f} us per term on average ({len(terms)} terms)")
@@ -0,0 +1,44 @@
+import tempfile
+import time
+
+import jsonlines
+
+from bench_index import make_input
+from index import IndexBuilder
+from segments import SegmentedIndex
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def full_rebuild(records, output_dir):
+    IndexBuilder().add_all(records).save(output_dir, binary=True)
+
+
+if __name__ == "__main__":
+    nb_records, batch_size, change_size = 20000, 1000, 100
+    with tempfile.TemporaryDirectory(prefix="segments_") as workdir:
+        input_file = f"{workdir}/products_with_id.jsonl"
+        make_input(input_file, "input/products_with_id.jsonl", nb_records)
+        with jsonlines.open(input_file) as reader:
+            records = list(reader)
+
+        index = SegmentedIndex(f"{workdir}/segments", merge_factor=4, background=True)
+        print(f"{'indexed':>8} {'segments':>9} {'update of 100 docs':>19} {'full rebuild':>13}")
+        for start in range(0, nb_records, batch_size):
+            index.add_batch(records[start:start + batch_size])
+            indexed = start + batch_size
+            if indexed in (2000, 10000, 20000):
+                index.wait() #measure without a merge running
+                changed = [dict(o, title=o["title"] + " updated") for o in records[:change_size]]
+                update = timed(index.add_batch, changed) + timed(index.delete, [o["url"] for o in records[-10:]])
+                index.wait()
+                rebuild = timed(full_rebuild, records[:indexed], f"{workdir}/full_{indexed}")
+                print(f"{indexed:>8} {len(index.manifest['segments']):>9} {1000 * update:>16.0f} ms {rebuild:>11.1f} s")
+
+        start = time.perf_counter()
+        snapshot = index.snapshot()
+        print(f"snapshot of {len(snapshot.live)} live documents in {1000 * (time.perf_counter() - start):.0f} ms")
@@ -0,0 +1,43 @@
+import filecmp
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_index import FEATURES, make_input
+from index import IndexBuilder
+from spimi import ExternalIndexBuilder
+
+
+def build(input_file, output_dir, memory_budget=None):
+    start = time.perf_counter()
+    if memory_budget is None:
+        builder = IndexBuilder(features_to_keep=FEATURES)
+    else:
+        builder = ExternalIndexBuilder(memory_budget, features_to_keep=FEATURES)
+    builder.add_file(input_file)
+    nb_blocks = len(getattr(builder, "blocks", ()))
+    builder.save(output_dir, binary=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, nb_blocks
+
+
+if __name__ == "__main__":
+    nb_records, memory_budget = 60000, 32 * 2**20
+    with tempfile.TemporaryDirectory(prefix="spimi_") as workdir:
+        input_file = f"{workdir}/products_with_id.jsonl"
+        make_input(input_file, "input/products_with_id.jsonl", nb_records)
+        print(f"{nb_records} documents, {os.path.getsize(input_file) / 1e6:.0f} MB,"
+              f" budget {memory_budget / 2**20:.0f} MB")
+
+        for name, budget in (("IndexBuilder (in memory)", None), ("ExternalIndexBuilder", memory_budget)):
+            with ProcessPoolExecutor(1, multiprocessing.get_context("spawn")) as runner: #own peak memory
+                elapsed, peak, nb_blocks = runner.submit(build, input_file, f"{workdir}/{name[:5]}", budget).result()
+            print(f"{name:<25}: {elapsed:6.2f}s, peak RSS {peak:5.0f} MB, {nb_blocks} blocks")
+
+        names = sorted(os.listdir(f"{workdir}/Index"))
+        assert names == sorted(os.listdir(f"{workdir}/Exter"))
+        assert all(filecmp.cmp(f"{workdir}/Index/{n}", f"{workdir}/Exter/{n}", shallow=False) for n in names)
+        print("byte-identical indexes")
@@ -1,16 +1,25 @@
+import argparse
 import jsonlines
 import nltk
+import gc
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from nltk.corpus import stopwords
-from nltk.tokenize import RegexpTokenizer
 from pathlib import Path
 
+from analyzer import Analyzer
+from postings import DOCS, POSITIONS, save_postings
+
 
 
 class Index:
-    def __init__(self):
-        nltk.download('stopwords')
-        self.stop_words = set(stopwords.words('english'))
+    def __init__(self, stop_words=None):
+        if stop_words is None:
+            nltk.download('stopwords')
+            stop_words = stopwords.words('english')
+        self.stop_words = set(stop_words)
+        self.analyzer = Analyzer(self.stop_words) #shared with the search engine
     
     def tokenize(self, text):
         """
@@ -33,14 +42,8 @@ class Index:
         tokens: List[String]
             The original tokens to normalize
         """
-        tokenizer = RegexpTokenizer(r"[A-Za-z0-9]+")
-        tokens_normalized = []
-        for token in tokens:
-            words = tokenizer.tokenize(token)
-            for word in words:
-                if word not in self.stop_words:
-                    tokens_normalized.append(word)
-        return tokens_normalized
+        split = self.analyzer.split
+        return [word for token in tokens for word in split(token.lower()) if word is not None]
 
     def read_file(self,file):
         """
@@ -268,15 +271,8 @@ class Index:
 
         for o in L:
             url = o["url"]
-            tokens = self.tokenize(o.get(field_name, ""))
-
-            pos = 0
-            for tok in tokens:
-                if tok in self.stop_words:
-                    pos += 1
-                    continue
+            for pos, tok in self.analyzer.positions(o.get(field_name, "")):
                 pos_index.setdefault(tok, {}).setdefault(url, []).append(pos)
-                pos += 1
 
         return pos_index
 
@@ -296,46 +292,388 @@ class Index:
         with open(out_path, "w", encoding="utf-8") as f:
             json.dump(index_obj, f, ensure_ascii=False, indent=2)
 
-    
 
-index = Index()
-index_rewiews = index.create_index_reviews("/home/ensai/Documents/Indexation/TpScrawler/TP2/input/products.jsonl")
-print("Index reviews créé:", index_rewiews)
 
-if __name__ == "__main__":
+class FieldStats:
+    """
+    BM25 statistics of a field, gathered from its positional postings
+    one term at a time.
+
+    Parameters
+    ----------
+    nb_documents : int
+        Number of doc ids (0 to nb_documents - 1).
+    """
+
+    def __init__(self, nb_documents):
+        self.doc_lengths = [0] * nb_documents #number of terms of the field in each document
+        self.df = {}
+
+    def add(self, term, postings):
+        """
+        Count the postings of a term, (doc id, positions) pairs.
+        """
+        self.df[term] = len(postings)
+        doc_lengths = self.doc_lengths
+        for doc, positions in postings:
+            doc_lengths[doc] += len(positions)
+
+    def to_dict(self):
+        """
+        Document lengths, their average over the documents having the
+        field, and the document frequency of each term (in term order).
+        """
+        nb_documents = sum(1 for length in self.doc_lengths if length)
+        return {
+            "avg_length": sum(self.doc_lengths) / nb_documents if nb_documents else 0.0,
+            "doc_lengths": self.doc_lengths,
+            "df": dict(sorted(self.df.items()))
+        }
+
+
+def collection_stats(title, description):
+    """
+    Content of `stats.json` from the `FieldStats` of the title and the
+    description: per field statistics and the number N of documents with
+    at least one title or description term.
+    """
+    return {
+        "nb_documents": sum(1 for a, b in zip(title.doc_lengths, description.doc_lengths) if a or b),
+        "fields": {"title": title.to_dict(), "description": description.to_dict()}
+    }
 
-    input_file = "/home/ensai/Documents/Indexation/TpScrawler/TP2/input/products_with_id.jsonl"
-    output_dir = "/home/ensai/Documents/Indexation/TpScrawler/TP2/output"
 
-    index = Index()
+class IndexBuilder:
+    """
+    Build all the indexes of `Index` from a stream of documents, one
+    document at a time.
+
+    Each document is added to the title and description inverted indexes,
+    the reviews index, the feature indexes and the title and description
+    positional indexes with the same rules as the `Index.create_*` methods,
+    so the documents can come straight from the crawler without being
+    written to or read from a file. Each field is analyzed once for both
+    its inverted and positional indexes.
+
+    Documents get dense integer ids (0, 1, 2... in input order, a URL seen
+    again keeps its id) and the postings hold these ids instead of the
+    URLs. The `documents.json` table maps each id back to the URL and the
+    metadata of the document.
 
-    # Inverted indexes
-    index_title = index.create_inverted_index_title(input_file)
-    index_desc = index.create_inverted_index_description(input_file)
+    Parameters
+    ----------
+    index : Index, optional
+        Index providing the tokenizer and the stop words.
+    features_to_keep : list of str, optional
+        Features of `product_features` to index.
+    """
+
+    def __init__(self, index=None, features_to_keep=("brand", "origin", "material", "size")):
+        self.index = index or Index()
+        self.features_to_keep = list(features_to_keep)
+        self.docids = {} #url -> doc id
+        self.documents = [] #doc id -> url and metadata
+        self.inverted_title = {} #token -> set of doc ids
+        self.inverted_description = {}
+        self.reviews = [] #doc id -> review statistics
+        self.features = {feat: {} for feat in self.features_to_keep}
+        self.positional_title = {} #token -> {doc id: positions}
+        self.positional_description = {}
+        self.nb_documents = 0
+
+    def metadata(self, o):
+        """
+        Entry of a document in the `documents.json` table.
+        """
+        return {
+            "url": o.get("url"),
+            "id_product": o.get("id_product"),
+            "variant": o.get("variant"),
+            "title": o.get("title") or ""
+        }
 
-    # Reviews index
-    index_reviews = index.create_index_reviews(input_file)
+    def docid(self, o):
+        """
+        Return the id of a document, assigning the next one to a new URL,
+        and store its metadata.
+        """
+        url = o.get("url")
+        metadata = self.metadata(o)
+        doc = self.docids.get(url)
+        if doc is None:
+            doc = self.docids[url] = len(self.documents)
+            self.documents.append(metadata)
+            self.reviews.append(None)
+        else:
+            self.documents[doc] = metadata
+        return doc
+
+    def add_field(self, inverted, positional, doc, terms):
+        """
+        Fill the inverted and positional indexes of a field from its
+        analyzed (position, term) pairs.
+        """
+        for pos, term in terms:
+            positional.setdefault(term, {}).setdefault(doc, []).append(pos)
+            inverted.setdefault(term, set()).add(doc)
 
-    # Features inverted index
-    feature_indexes = index.create_inverted_index_features(
-        input_file,
-        features_to_keep=["brand", "origin", "material", "size"]
-    )
+    def add(self, o):
+        """
+        Add one document to every index.
 
-    # Positional indexes
-    pos_index_title = index.create_position_index(input_file, "title")
-    pos_index_desc = index.create_position_index(input_file, "description")
+        Parameters
+        ----------
+        o : dict
+            Document with at least a `url`, and usually `title`,
+            `description`, `product_features` and `product_reviews`.
+        """
+        index = self.index
+        doc = self.docid(o)
+        self.nb_documents += 1
 
-    # Save all indexes
-    index.save_index(index_title, f"{output_dir}/inverted_title.json")
-    index.save_index(index_desc, f"{output_dir}/inverted_description.json")
-    index.save_index(index_reviews, f"{output_dir}/reviews.json")
-    index.save_index(pos_index_title, f"{output_dir}/positional_title.json")
-    index.save_index(pos_index_desc, f"{output_dir}/positional_description.json")
+        title, description = index.analyzer.analyze_fields((o.get("title"), o.get("description")))
+        self.add_field(self.inverted_title, self.positional_title, doc, title)
+        self.add_field(self.inverted_description, self.positional_description, doc, description)
 
-    index.save_index(feature_indexes["brand"], f"{output_dir}/brand_index.json")
-    index.save_index(feature_indexes["origin"], f"{output_dir}/origin_index.json")
-    index.save_index(feature_indexes["material"], f"{output_dir}/material_index.json")
-    index.save_index(feature_indexes["size"], f"{output_dir}/size_index.json")
+        ratings = index.extract_reviews(o)
+        self.reviews[doc] = {
+            "nb_ratings": len(ratings),
+            "avg_rating": (sum(ratings)/len(ratings)) if ratings else 0,
+            "last_rating": ratings[-1] if ratings else 0
+        }
 
-        
\ No newline at end of file
+        feats = o.get("product_features", {}) or {}
+        if o.get("url"):
+            for feat_name in self.features_to_keep:
+                if feat_name not in feats:
+                    continue
+                value = feats[feat_name]
+                text = " ".join(str(x) for x in value) if isinstance(value, list) else str(value)
+                for tok in index.analyzer.analyze(text):
+                    self.features[feat_name].setdefault(tok, set()).add(doc)
+
+    def add_all(self, documents):
+        """
+        Add a stream of documents and return the builder.
+        """
+        for o in documents:
+            self.add(o)
+        return self
+
+    def add_file(self, file):
+        """
+        Add the documents of a JSONL file, reading it once as a stream.
+        """
+        with jsonlines.open(file) as reader:
+            return self.add_all(reader)
+
+    def merge(self, other):
+        """
+        Add the documents of another builder, as if they had been added to
+        this one after its own documents.
+
+        A URL already known keeps its doc id: its postings are added to the
+        existing ones (positions after positions) and its metadata and
+        reviews are replaced, as `add` does. The other new URLs get the next
+        doc ids in their order in `other`.
+
+        Returns
+        -------
+        IndexBuilder
+            This builder.
+        """
+        remap = [] #doc id in other -> doc id in self
+        for metadata, review in zip(other.documents, other.reviews):
+            doc = self.docids.get(metadata["url"])
+            if doc is None:
+                doc = self.docids[metadata["url"]] = len(self.documents)
+                self.documents.append(metadata)
+                self.reviews.append(review)
+            else:
+                self.documents[doc] = metadata
+                self.reviews[doc] = review
+            remap.append(doc)
+        self.nb_documents += other.nb_documents
+
+        inverted = [(self.inverted_title, other.inverted_title),
+                    (self.inverted_description, other.inverted_description)]
+        inverted += [(self.features[feat], other.features[feat]) for feat in self.features_to_keep]
+        for merged, local in inverted:
+            for term, docs in local.items():
+                merged.setdefault(term, set()).update(remap[doc] for doc in docs)
+        for merged, local in ((self.positional_title, other.positional_title),
+                              (self.positional_description, other.positional_description)):
+            for term, postings in local.items():
+                merged_postings = merged.setdefault(term, {})
+                for doc, positions in postings.items():
+                    merged_postings.setdefault(remap[doc], []).extend(positions)
+        return self
+
+    def indexes(self):
+        """
+        Return the indexes, with doc ids in place of the URLs.
+
+        Inverted and feature indexes map a token to the sorted list of its
+        doc ids, positional indexes map a token to [doc id, positions]
+        pairs sorted by doc id, and the reviews index is a list indexed by
+        doc id.
+
+        Returns
+        -------
+        dict
+            Output file name -> index, including the `documents.json`
+            table and the `stats.json` statistics.
+        """
+        def positional(pos_index):
+            return {k: [[doc, v[doc]] for doc in sorted(v)] for k, v in pos_index.items()}
+
+        result = {
+            "documents.json": self.documents,
+            "inverted_title.json": {k: sorted(v) for k, v in self.inverted_title.items()},
+            "inverted_description.json": {k: sorted(v) for k, v in self.inverted_description.items()},
+            "reviews.json": self.reviews,
+            "positional_title.json": positional(self.positional_title),
+            "positional_description.json": positional(self.positional_description)
+        }
+        for feat_name, feat_index in self.features.items():
+            result[f"{feat_name}_index.json"] = {k: sorted(v) for k, v in feat_index.items()}
+        result["stats.json"] = self.stats()
+        return result
+
+    def stats(self):
+        """
+        Statistics of the title and description fields used by BM25 (see
+        `collection_stats`), so the search engine does not have to walk the
+        positional indexes.
+        """
+        fields = []
+        for pos_index in (self.positional_title, self.positional_description):
+            field = FieldStats(len(self.documents))
+            for term, postings in pos_index.items():
+                field.add(term, postings.items())
+            fields.append(field)
+        return collection_stats(*fields)
+
+    def save(self, output_dir, binary=False):
+        """
+        Save every index to `output_dir`, with the file names of the
+        `__main__` block.
+
+        With `binary=True`, the inverted, feature and positional indexes
+        are written in the compressed format of `postings.py` (`.bin`
+        files); the documents table, the reviews and the statistics stay in
+        JSON.
+        """
+        for name, index_obj in self.indexes().items():
+            if binary and name not in ("documents.json", "reviews.json", "stats.json"):
+                kind = POSITIONS if name.startswith("positional") else DOCS
+                save_postings(index_obj, f"{output_dir}/{name[:-len('.json')]}.bin", kind)
+            else:
+                self.index.save_index(index_obj, f"{output_dir}/{name}")
+
+
+def byte_ranges(path, nb_ranges):
+    """
+    Split a file into at most `nb_ranges` contiguous byte ranges of about
+    the same size, each ending at the end of a line.
+
+    Returns
+    -------
+    list of tuple
+        (start, end) offsets, in file order.
+    """
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for k in range(1, nb_ranges):
+            f.seek(max(size * k // nb_ranges - 1, bounds[-1]))
+            f.readline() #up to the next line start
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def index_byte_range(path, start, end, features_to_keep, stop_words=None):
+    """
+    Index the JSONL lines of `path` starting in [start, end) with a new
+    `IndexBuilder`, doc ids starting at 0. Given the stop words, the worker
+    does not load them from NLTK.
+    """
+    builder = IndexBuilder(Index(stop_words), features_to_keep)
+    with open(path, "rb") as f:
+        f.seek(start)
+        for line in iter(f.readline, b""):
+            if line.strip():
+                builder.add(json.loads(line))
+            if f.tell() >= end:
+                break
+    builder.index = None #not picklable, and not needed by merge
+    return builder
+
+
+def build_parallel(input_file, workers=None, features_to_keep=("brand", "origin", "material", "size")):
+    """
+    Index a JSONL file on several processes.
+
+    The file is split into one byte range per worker, each indexed by its
+    own `IndexBuilder`; the builders are then merged in file order, so the
+    doc ids, the postings and the saved files are the same as those of a
+    serial `IndexBuilder().add_file(input_file)`.
+
+    Parameters
+    ----------
+    input_file : str
+        Path to the JSONL file of the documents.
+    workers : int, optional
+        Number of processes (default is the number of CPUs).
+    features_to_keep : list of str, optional
+        Features of `product_features` to index.
+
+    Returns
+    -------
+    IndexBuilder
+        Builder holding the indexes of the whole file.
+    """
+    workers = workers or os.cpu_count()
+    features_to_keep = list(features_to_keep)
+    builder = IndexBuilder(features_to_keep=features_to_keep)
+    enabled = gc.isenabled()
+    gc.disable() #unpickled postings: millions of small lists, none of them in a cycle
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(index_byte_range, input_file, start, end, features_to_keep,
+                                   builder.index.stop_words) #loaded once, here
+                       for start, end in byte_ranges(input_file, workers)]
+            for future in futures: #file order, whatever the order they end in
+                builder.merge(future.result())
+    finally:
+        if enabled:
+            gc.enable()
+    return builder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the indexes of the products.")
+    parser.add_argument("input", nargs="?", default="TP2/input/products_with_id.jsonl")
+    parser.add_argument("output_dir", nargs="?", default="TP2/output")
+    parser.add_argument("--binary", action="store_true", help="write the postings as .bin files")
+    parser.add_argument("--memory-budget", type=float, default=None,
+                        help="build by blocks of this many MB merged on disk (default: all in memory)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="build on this many processes (default: one, in this process)")
+    args = parser.parse_args()
+    if args.memory_budget is not None and args.workers is not None:
+        parser.error("--memory-budget and --workers cannot be combined")
+
+    # All indexes in a single pass over the documents
+    features_to_keep = ["brand", "origin", "material", "size"]
+    if args.workers is not None:
+        builder = build_parallel(args.input, args.workers, features_to_keep)
+    else:
+        if args.memory_budget is None:
+            builder = IndexBuilder(features_to_keep=features_to_keep)
+        else:
+            from spimi import ExternalIndexBuilder #imports this module
+            builder = ExternalIndexBuilder(int(args.memory_budget * 2**20), features_to_keep=features_to_keep)
+        builder.add_file(args.input)
+    builder.save(args.output_dir, binary=args.binary)
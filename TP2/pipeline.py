@@ -0,0 +1,65 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "TP1")) #crawler modules
+
+from crawler import Crawler
+from sink import JsonlSink
+from index import IndexBuilder
+from pre_traitement import iter_enriched
+
+
+def crawl_and_index(crawler, output_dir=None, start_url=None, max_pages=50,
+                    features_to_keep=("brand", "origin", "material", "size"), enriched_path=None):
+    """
+    Crawl a website and build its indexes in a single streaming pass.
+
+    Each crawled record goes through the `id_product` / `variant`
+    enrichment and straight into an `IndexBuilder`, so nothing has to be
+    written to disk between the crawl, the preprocessing and the indexing.
+    The indexes are complete as soon as the crawl ends.
+
+    Parameters
+    ----------
+    crawler : Crawler
+        Crawler (or any subclass) of the website.
+    output_dir : str, optional
+        If given, the indexes are saved there, as `index.py` does.
+    start_url : str, optional
+        URL from which the crawl starts. If None, the base URL is used.
+    max_pages : int, optional
+        Maximum number of pages to crawl (default is 50).
+    features_to_keep : list of str, optional
+        Features of `product_features` to index.
+    enriched_path : str, optional
+        If given, the enriched records are also written to this JSONL file
+        (the former `products_with_id.jsonl`).
+
+    Returns
+    -------
+    IndexBuilder
+        Builder holding all the indexes.
+    """
+    builder = IndexBuilder(features_to_keep=features_to_keep)
+    records = iter_enriched(crawler.iter_crawl(start_url, max_pages))
+    if enriched_path is None:
+        builder.add_all(records)
+    else:
+        with JsonlSink(enriched_path) as sink:
+            crawler.sink = sink #flushed at each crawler checkpoint
+            try:
+                for o in records:
+                    builder.add(o)
+                    sink.write(o)
+            finally:
+                crawler.sink = None
+    if output_dir is not None:
+        builder.save(output_dir)
+    return builder
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    builder = crawl_and_index(Crawler("https://web-scraping.dev/products"), output_dir="TP2/output", max_pages=50)
+    print(f"{builder.nb_documents} documents crawled and indexed in {time.perf_counter() - start:.1f}s")
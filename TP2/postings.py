@@ -0,0 +1,401 @@
+import gc
+import mmap
+import re
+import struct
+from array import array
+from collections.abc import Mapping
+from functools import lru_cache
+from itertools import accumulate, chain
+from pathlib import Path
+
+MAGIC = b"PST2" #PST1 stored the positions without deltas
+DOCS = 0 #token -> sorted doc ids
+POSITIONS = 1 #token -> [doc id, positions] pairs
+HEADER = struct.Struct("<4sB")
+FOOTER = struct.Struct("<QQQ4s") #dictionary start, term table start, number of terms, magic
+MULTIBYTE = re.compile(rb"[\x80-\xff]+[\x00-\x7f]") #varints longer than one byte
+
+
+def encode_varints(values, out=None):
+    """
+    Append non-negative integers to a bytearray as LEB128 varints (7 bits
+    per byte, high bit set on every byte but the last).
+
+    Returns
+    -------
+    bytearray
+        `out`, or a new bytearray.
+    """
+    out = bytearray() if out is None else out
+    for n in values:
+        while n > 127:
+            out.append((n & 127) | 128)
+            n >>= 7
+        out.append(n)
+    return out
+
+
+def decode_varints(data, start=0, end=None):
+    """
+    Decode the LEB128 varints of `data[start:end]`.
+
+    Returns
+    -------
+    list of int
+    """
+    end = len(data) if end is None else end
+    chunk = data[start:end]
+    values = []
+    pos = 0
+    for match in MULTIBYTE.finditer(chunk):
+        values += chunk[pos:match.start()] #one-byte varints are copied as is
+        n = 0
+        for shift, b in enumerate(match.group()):
+            n |= (b & 127) << (7 * shift)
+        values.append(n)
+        pos = match.end()
+    values += chunk[pos:]
+    return values
+
+
+def deltas(values):
+    """
+    Gaps between consecutive sorted integers, the first one kept as is.
+    """
+    previous = 0
+    gaps = []
+    for v in values:
+        gaps.append(v - previous)
+        previous = v
+    return gaps
+
+
+def encode_docs(docs):
+    """
+    Encode a sorted list of doc ids as delta varints.
+    """
+    return bytes(encode_varints(deltas(docs)))
+
+
+def decode_docs(data, start=0, end=None):
+    """
+    Decode the doc ids written by `encode_docs`.
+    """
+    return list(accumulate(decode_varints(data, start, end)))
+
+
+def is_sorted(values):
+    """
+    Whether a list of integers is in increasing order.
+    """
+    return all(a <= b for a, b in zip(values, values[1:]))
+
+
+def encode_positions(pairs):
+    """
+    Encode [doc id, positions] pairs sorted by doc id.
+
+    The pairs are written by blocks, all as varints: their number, a flag,
+    the doc id gaps, the number of positions of each document, then the
+    positions of each document. The flag is 1 when the positions are
+    delta-encoded within each document (the first one kept as is, since
+    positions restart at every document); it is 0, and the positions are
+    written as is, when the positions of a document are not sorted, as
+    after a URL indexed again.
+    """
+    delta = all(is_sorted(positions) for _, positions in pairs)
+    out = encode_varints((len(pairs), int(delta)))
+    encode_varints(deltas([doc for doc, _ in pairs]), out)
+    encode_varints([len(positions) for _, positions in pairs], out)
+    encode_varints(chain.from_iterable(deltas(positions) if delta else positions for _, positions in pairs), out)
+    return bytes(out)
+
+
+def decode_positions(data, start=0, end=None):
+    """
+    Decode the [doc id, positions] pairs written by `encode_positions`.
+
+    Most terms appear once in each of their documents: their positions
+    need no prefix sum and are read in a single pass.
+    """
+    values = decode_varints(data, start, end)
+    if not values:
+        return []
+    df, delta = values[0], values[1]
+    docs = accumulate(values[2:2 + df])
+    if len(values) == 2 + 3 * df: #one position per document
+        return [[doc, [position]] for doc, position in zip(docs, values[2 + 2 * df:])]
+    bounds = list(accumulate(values[2 + df:2 + 2 * df], initial=2 + 2 * df))
+    if not delta:
+        return [[doc, values[a:b]] for doc, a, b in zip(docs, bounds, bounds[1:])]
+    return [[doc, values[a:b] if b - a == 1 else list(accumulate(values[a:b]))]
+            for doc, a, b in zip(docs, bounds, bounds[1:])]
+
+
+class PostingsWriter:
+    """
+    Write a binary postings file one term at a time, the terms coming in
+    increasing order, so an index can be written without holding all of
+    it in memory (only the term dictionary is kept until `close`).
+
+    Parameters
+    ----------
+    out_path : str
+        Path to the output file.
+    kind : int, optional
+        DOCS (default) or POSITIONS.
+    """
+
+    def __init__(self, out_path, kind=DOCS):
+        Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+        self.encode = encode_positions if kind == POSITIONS else encode_docs
+        self.file = open(out_path, "wb")
+        self.file.write(HEADER.pack(MAGIC, kind))
+        self.offset = HEADER.size
+        self.dictionary = bytearray()
+        self.entry_offsets = array("Q")
+        self.last_key = None
+
+    def add(self, term, postings):
+        """
+        Append the postings of a term, greater than the previous ones in
+        code point order.
+        """
+        key = term.encode("utf-8")
+        if self.last_key is not None and key <= self.last_key:
+            raise ValueError(f"term {term!r} is not after {self.last_key.decode('utf-8')!r}")
+        self.last_key = key
+        encoded = self.encode(postings)
+        self.file.write(encoded)
+        self.entry_offsets.append(len(self.dictionary))
+        encode_varints((len(key),), self.dictionary)
+        self.dictionary += key
+        encode_varints((len(postings), self.offset, len(encoded)), self.dictionary)
+        self.offset += len(encoded)
+
+    def close(self):
+        """
+        Write the dictionary, its offset table and the footer.
+        """
+        dictionary_start = self.offset
+        self.file.write(self.dictionary)
+        table_start = dictionary_start + len(self.dictionary)
+        self.file.write(struct.pack(f"<{len(self.entry_offsets)}Q", *self.entry_offsets))
+        self.file.write(FOOTER.pack(dictionary_start, table_start, len(self.entry_offsets), MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def save_postings(index_obj, out_path, kind=DOCS):
+    """
+    Save an index of `IndexBuilder` in the binary postings format.
+
+    The file holds a header (magic, kind), the postings of every term in
+    term order, a term dictionary (for each term: its UTF-8 bytes, its
+    document frequency, and the offset and length of its postings) and a
+    table of fixed-size offsets of the dictionary entries, so a reader can
+    binary search a term without loading the dictionary. All integers are
+    varints except the table and the footer.
+
+    Parameters
+    ----------
+    index_obj : dict
+        token -> sorted doc ids (kind DOCS) or [doc id, positions] pairs
+        sorted by doc id (kind POSITIONS).
+    out_path : str
+        Path to the output file.
+    kind : int, optional
+        DOCS (default) or POSITIONS.
+    """
+    with PostingsWriter(out_path, kind) as writer:
+        for term in sorted(index_obj): #code point order is UTF-8 byte order
+            writer.add(term, index_obj[term])
+
+
+def read_dictionary_entry(data, pos):
+    """
+    Read the dictionary entry starting at `pos`.
+
+    Returns
+    -------
+    tuple
+        (term bytes, document frequency, postings offset, postings length).
+    """
+    values = []
+    for _ in range(4):
+        n = shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            n |= (b & 127) << shift
+            if b < 128:
+                break
+            shift += 7
+        values.append(n)
+        if len(values) == 1: #term length, then the term itself
+            values.append(bytes(data[pos:pos + n]))
+            pos += n
+    return values[1], values[2], values[3], values[4]
+
+
+def iter_dictionary(data):
+    """
+    Yield (term, document frequency, offset, length) for every term of a
+    binary postings file, in term order.
+    """
+    magic, kind = HEADER.unpack_from(data, 0)
+    dictionary_start, table_start, nb_terms, end_magic = FOOTER.unpack_from(data, len(data) - FOOTER.size)
+    if magic != MAGIC or end_magic != MAGIC:
+        raise ValueError("not a binary postings file")
+    for k in range(nb_terms):
+        (entry,) = struct.unpack_from("<Q", data, table_start + 8 * k)
+        key, df, offset, length = read_dictionary_entry(data, dictionary_start + entry)
+        yield key.decode("utf-8"), df, offset, length
+
+
+def find_term(data, term):
+    """
+    Binary search a term in the dictionary of a binary postings file.
+
+    Parameters
+    ----------
+    data : bytes-like
+        Content of the file (bytes or mmap).
+    term : str
+        Term to look up.
+
+    Returns
+    -------
+    tuple or None
+        (document frequency, offset, length) of its postings, or None.
+    """
+    dictionary_start, table_start, nb_terms, _ = FOOTER.unpack_from(data, len(data) - FOOTER.size)
+    key = term.encode("utf-8")
+    lo, hi = 0, nb_terms
+    while lo < hi:
+        mid = (lo + hi) // 2
+        (entry,) = struct.unpack_from("<Q", data, table_start + 8 * mid)
+        found, df, offset, length = read_dictionary_entry(data, dictionary_start + entry)
+        if found == key:
+            return df, offset, length
+        if found < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return None
+
+
+def load_postings(path):
+    """
+    Load and decode a whole binary postings file.
+
+    Returns
+    -------
+    dict
+        The index in the format given to `save_postings`.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    kind = HEADER.unpack_from(data, 0)[1]
+    decode = decode_positions if kind == POSITIONS else decode_docs
+    enabled = gc.isenabled()
+    gc.disable() #millions of small lists, none of them in a cycle
+    try:
+        return {term: decode(data, offset, offset + length) for term, _, offset, length in iter_dictionary(data)}
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def iter_postings(path):
+    """
+    Yield (term, postings) for every term of a binary postings file, in
+    term order, decoding one term at a time.
+    """
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        decode = decode_positions if HEADER.unpack_from(data, 0)[1] == POSITIONS else decode_docs
+        for term, _, offset, length in iter_dictionary(data):
+            yield term, decode(data, offset, offset + length)
+    finally:
+        data.close()
+
+
+class PostingsReader(Mapping):
+    """
+    Read-only mapping term -> postings over a memory-mapped binary postings
+    file.
+
+    Opening the file only reads its footer: a term is found by binary
+    search in the mapped dictionary and its postings are decoded when it is
+    first looked up, then kept in an LRU cache. The pages of the file are
+    shared through the page cache by all the processes mapping it.
+
+    Parameters
+    ----------
+    path : str
+        Path to a file written by `save_postings`.
+    cache_size : int, optional
+        Number of decoded terms kept (default is 4096).
+    convert : callable, optional
+        Applied to the decoded postings before caching, e.g. `set` for doc
+        ids or `dict` for [doc id, positions] pairs.
+    """
+
+    def __init__(self, path, cache_size=4096, convert=None):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.kind = HEADER.unpack_from(self.data, 0)
+        self.dictionary_start, self.table_start, self.nb_terms, end_magic = FOOTER.unpack_from(
+            self.data, len(self.data) - FOOTER.size)
+        if magic != MAGIC or end_magic != MAGIC:
+            raise ValueError(f"{path} is not a binary postings file")
+        self.decode = decode_positions if self.kind == POSITIONS else decode_docs
+        self.convert = convert
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, term):
+        found = find_term(self.data, term)
+        if found is None:
+            return None
+        _, offset, length = found
+        postings = self.decode(self.data, offset, offset + length)
+        return postings if self.convert is None else self.convert(postings)
+
+    def get(self, term, default=None):
+        postings = self.lookup(term)
+        return default if postings is None else postings
+
+    def __getitem__(self, term):
+        postings = self.lookup(term)
+        if postings is None:
+            raise KeyError(term)
+        return postings
+
+    def __contains__(self, term):
+        return self.lookup(term) is not None
+
+    def df(self, term):
+        """
+        Document frequency of a term, read from the dictionary without
+        decoding its postings.
+        """
+        found = find_term(self.data, term)
+        return 0 if found is None else found[0]
+
+    def __iter__(self):
+        for term, _, _, _ in iter_dictionary(self.data):
+            yield term
+
+    def __len__(self):
+        return self.nb_terms
+
+    def close(self):
+        self.lookup.cache_clear()
+        self.data.close()
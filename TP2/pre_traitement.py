@@ -1,6 +1,85 @@
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
 import jsonlines
 from urllib.parse import urlparse, parse_qs
 
+try:
+    import orjson #optional, faster JSON codec
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps(o):
+        return orjson.dumps(o)
+else:
+    loads = json.loads
+    _encoder = json.JSONEncoder(ensure_ascii=False) #same output as jsonlines
+
+    def dumps(o):
+        return _encoder.encode(o).encode("utf-8")
+
+
+def enrich_record(o):
+    """
+    Add the product identifier and the variant found in the URL of a
+    document.
+
+    Parameters
+    ----------
+    o : dict
+        Crawled document, modified in place.
+
+    Returns
+    -------
+    dict
+        The document with `id_product` and `variant` fields.
+    """
+    url = o.get("url", "")
+    p = urlparse(url)
+    # Product id
+    parts = [x for x in p.path.split("/") if x]  # ex: ["product", "10"]
+    id_product = "No id"
+    if len(parts) >= 2 and parts[0] == "product":
+        id_product = parts[1]
+        if id_product.isdigit():
+            id_product = int(id_product)
+    
+    #variant
+    variant = "No variant"
+    qs = parse_qs(p.query)
+    if "variant" in qs and qs["variant"]:
+        variant = qs["variant"][0]
+
+    o["id_product"] = id_product
+    o["variant"] = variant
+    return o
+
+
+def iter_enriched(records):
+    """
+    Enrich a stream of documents one at a time, e.g. straight from
+    `Crawler.iter_crawl`, without loading them all in memory.
+
+    Parameters
+    ----------
+    records : iterable of dict
+        Crawled documents.
+
+    Yields
+    ------
+    dict
+        Documents enriched with `id_product` and `variant` fields.
+    """
+    for o in records:
+        yield enrich_record(o)
+
 
 def extract_information(file):
     """
@@ -16,33 +95,76 @@ def extract_information(file):
     list of dict
         List of documents enriched with `id_product` and `variant` fields.
     """
-    L=[]
     with jsonlines.open(file) as reader:
-        for obj in reader:
-            L.append(obj)
-    
-    for o in L:
-        url = o.get("url", "")
-        p = urlparse(url)
-        # Product id
-        parts = [x for x in p.path.split("/") if x]  # ex: ["product", "10"]
-        id_product = "No id"
-        if len(parts) >= 2 and parts[0] == "product":
-            id_product = parts[1]
-            if id_product.isdigit():
-                id_product = int(id_product)
-        
-        #variant
-        variant = "No variant"
-        qs = parse_qs(p.query)
-        if "variant" in qs and qs["variant"]:
-            variant = qs["variant"][0]
-
-        o["id_product"] = id_product
-        o["variant"] = variant
-    return L
-
-def add_information(L):
+        return list(iter_enriched(reader))
+
+
+def enrich_lines(lines):
+    """
+    Enrich a chunk of raw JSONL lines.
+
+    Parameters
+    ----------
+    lines : list of bytes
+        JSONL lines of crawled documents.
+
+    Returns
+    -------
+    bytes
+        JSONL lines of the enriched documents, in the same order.
+    """
+    return b"".join(dumps(enrich_record(loads(line))) + b"\n" for line in lines if line.strip())
+
+
+def enrich_file(input_path, output_path, workers=None, chunk_size=5000):
+    """
+    Enrich a JSONL file of any size in a streaming way.
+
+    The input is read by chunks of `chunk_size` lines, which a process pool
+    decodes, enriches and encodes again with `orjson` if it is installed
+    (`json` otherwise). Chunks are written in input order, and at most
+    `2 * workers` of them are in flight, so memory does not depend on the
+    size of the file.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the crawled JSONL file.
+    output_path : str
+        Path to the enriched JSONL file.
+    workers : int, optional
+        Number of processes (default is the number of CPUs). With 1, the
+        chunks are processed in the current process.
+    chunk_size : int, optional
+        Number of lines per chunk (default is 5000).
+
+    Returns
+    -------
+    int
+        Number of lines read.
+    """
+    workers = workers or os.cpu_count()
+    nb_lines = 0
+    with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+        chunks = iter(lambda: list(islice(src, chunk_size)), [])
+        if workers == 1:
+            for lines in chunks:
+                dst.write(enrich_lines(lines))
+                nb_lines += len(lines)
+            return nb_lines
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque() #futures in input order
+            for lines in chunks:
+                pending.append(pool.submit(enrich_lines, lines))
+                nb_lines += len(lines)
+                if len(pending) >= 2 * workers:
+                    dst.write(pending.popleft().result())
+            while pending:
+                dst.write(pending.popleft().result())
+    return nb_lines
+
+
+def add_information(L, output_path):
     """
     Save enriched documents to a JSONL output file.
 
@@ -50,18 +172,21 @@ def add_information(L):
     ----------
     L : list of dict
         List of enriched documents to be written to the output file.
+    output_path : str
+        Path to the output JSONL file.
     """
-    with jsonlines.open("/home/ensai/Documents/Indexation/TpScrawler/output/products_with_id.jsonl", mode='w') as writer:
+    with jsonlines.open(output_path, mode='w') as writer:
         for o in L:
             writer.write(o)
 
 
 if __name__ == "__main__":
-    inp = "/home/ensai/Documents/Indexation/TpScrawler/TP2/input/products.jsonl"
-    out = "/home/ensai/Documents/Indexation/TpScrawler/TP2/input/products_with_id.jsonl"
-
-    L = extract_information(inp)
+    parser = argparse.ArgumentParser(description="Add id_product and variant to crawled documents.")
+    parser.add_argument("input", nargs="?", default="TP2/input/products.jsonl")
+    parser.add_argument("output", nargs="?", default="TP2/input/products_with_id.jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="lines per chunk")
+    args = parser.parse_args()
 
-    with jsonlines.open(out, mode="w") as writer:
-        for o in L:
-            writer.write(o)
\ No newline at end of file
+    nb_lines = enrich_file(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size)
+    print(f"{nb_lines} documents enriched")
@@ -0,0 +1,510 @@
+import json
+import math
+import mmap
+import os
+import shutil
+import threading
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+
+import jsonlines
+
+from index import Index, IndexBuilder
+from postings import PostingsReader
+
+MANIFEST = "segments.json"
+TOMBSTONES = "tombstones.log"
+
+
+class SegmentedIndex:
+    """
+    Index updated by batches of documents, each batch becoming a small
+    immutable segment.
+
+    A segment is a directory holding the indexes of its batch, saved by
+    `IndexBuilder.save(..., binary=True)`, plus the batch records
+    (`records.jsonl`, line i being doc id i) and their offsets
+    (`records.offsets`). `segments.json` lists the live segments, each
+    with a sequence number increasing with the batches.
+
+    Updates and deletes are tombstones keyed by URL, appended to
+    `tombstones.log`: a tombstone (url, seq) hides the versions of `url`
+    in the segments older than `seq`. Adding a document writes a tombstone
+    with the sequence number of its segment, so it replaces its former
+    versions; deleting it writes the next sequence number. Adding a batch
+    therefore costs the size of the batch, whatever the size of the index.
+
+    Segments of the same size tier are merged when there are
+    `merge_factor` of them: the live records are indexed again into one
+    segment, which takes the highest sequence number of the merged ones,
+    and the tombstones that no longer hide anything are dropped. Merges
+    run in a background thread if `background` is True.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the index, created if needed.
+    features_to_keep : list of str, optional
+        Features of `product_features` to index.
+    merge_factor : int, optional
+        Number of segments of a tier merged together (default is 4).
+    background : bool, optional
+        Merge in a background thread (default is True).
+    recover : bool, optional
+        Clean up after a crash when opening (default is True); False to
+        open the index for reading while another process writes it.
+    """
+
+    def __init__(self, directory, features_to_keep=("brand", "origin", "material", "size"), merge_factor=4,
+                 background=True, recover=True):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.features_to_keep = list(features_to_keep)
+        self.index = Index() #stop words and analyzer, shared by all segments
+        self.merge_factor = merge_factor
+        self.background = background
+        self.lock = threading.RLock()
+        self.merger = None #background merge thread, while it runs
+        self.merge_requested = False
+        self.manifest = {"next_seq": 0, "next_name": 0, "segments": []}
+        if (self.directory / MANIFEST).exists():
+            with open(self.directory / MANIFEST, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        self.tombstones = read_tombstones(self.directory / TOMBSTONES)
+        if recover:
+            self.recover()
+
+    def recover(self):
+        """
+        Clean up after a crash: delete the segment directories the
+        manifest does not list (a segment being written or merged, or
+        merged away), and write the tombstones of the last added batch if
+        they were not all written. Tombstones are only needed when older
+        segments exist, as in `compact_tombstones`.
+        """
+        segments = self.manifest["segments"]
+        names = {segment["name"] for segment in segments}
+        for path in self.directory.glob("seg_*"):
+            if path.is_dir() and path.name not in names:
+                shutil.rmtree(path, ignore_errors=True)
+        oldest = min((segment["seq"] for segment in segments), default=None)
+        if segments and not segments[-1].get("merged") and segments[-1]["seq"] > oldest:
+            segment = segments[-1] #saved in the manifest before its tombstones
+            with open(self.directory / segment["name"] / "documents.json", "r", encoding="utf-8") as f:
+                urls = [metadata["url"] for metadata in json.load(f)]
+            missing = [url for url in urls if self.tombstones.get(url, -1) < segment["seq"]]
+            if missing:
+                self.append_tombstones((url, segment["seq"]) for url in missing)
+
+    def save_manifest(self):
+        tmp_path = self.directory / f"{MANIFEST}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.directory / MANIFEST) #atomic
+
+    def write_segment(self, records, seq):
+        """
+        Index records into a new segment directory, not yet in the
+        manifest.
+
+        Returns
+        -------
+        dict
+            Manifest entry of the segment.
+        """
+        with self.lock:
+            name = f"seg_{self.manifest['next_name']:06d}"
+            self.manifest["next_name"] += 1
+        tmp_dir = self.directory / f"{name}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True) #left by a crash
+        tmp_dir.mkdir()
+        builder = IndexBuilder(self.index, self.features_to_keep)
+        offsets = array("Q", [0])
+        with open(tmp_dir / "records.jsonl", "wb") as f:
+            for o in records: #unique URLs, so line i is doc id i
+                builder.add(o)
+                offsets.append(offsets[-1] + f.write(json.dumps(o, ensure_ascii=False).encode("utf-8") + b"\n"))
+        with open(tmp_dir / "records.offsets", "wb") as f:
+            offsets.tofile(f)
+        builder.save(tmp_dir, binary=True)
+        os.replace(tmp_dir, self.directory / name)
+        return {"name": name, "seq": seq, "nb_documents": builder.nb_documents}
+
+    def add_batch(self, records):
+        """
+        Add or update a batch of documents as a new segment.
+
+        Parameters
+        ----------
+        records : iterable of dict
+            Enriched documents; for a URL present several times only the
+            last one is kept.
+
+        Returns
+        -------
+        str or None
+            Name of the new segment, None if the batch is empty.
+        """
+        batch = {}
+        for o in records:
+            batch[o.get("url")] = o
+        if not batch:
+            return None
+        with self.lock:
+            seq = self.manifest["next_seq"]
+            self.manifest["next_seq"] += 1
+        segment = self.write_segment(batch.values(), seq)
+        with self.lock:
+            self.manifest["segments"].append(segment)
+            self.save_manifest() #before the tombstones, which would hide the former versions of a lost segment
+            self.append_tombstones((url, seq) for url in batch)
+        self.maybe_merge()
+        return segment["name"]
+
+    def delete(self, urls):
+        """
+        Delete documents by URL.
+        """
+        with self.lock:
+            seq = self.manifest["next_seq"]
+            self.manifest["next_seq"] += 1
+            self.append_tombstones((url, seq) for url in urls)
+            self.save_manifest()
+
+    def append_tombstones(self, entries):
+        with open(self.directory / TOMBSTONES, "a", encoding="utf-8") as f:
+            for url, seq in entries:
+                self.tombstones[url] = max(seq, self.tombstones.get(url, -1)) #batches may end out of order
+                f.write(f"{seq}\t{url}\n")
+
+    def is_live(self, url, seq):
+        """
+        True if the version of `url` in the segment `seq` is not hidden by
+        a tombstone.
+        """
+        return self.tombstones.get(url, -1) <= seq
+
+    def tier(self, segment):
+        return int(math.log(max(segment["nb_documents"], 1), self.merge_factor) + 1e-9)
+
+    def merge_candidates(self):
+        """
+        Segments of the lowest tier holding `merge_factor` segments, or
+        None.
+        """
+        tiers = {}
+        for segment in self.manifest["segments"]:
+            tiers.setdefault(self.tier(segment), []).append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][:self.merge_factor]
+        return None
+
+    def maybe_merge(self):
+        """
+        Start merging if a tier is full, in the background if enabled.
+        """
+        if not self.background:
+            while self.merge_step():
+                pass
+            return
+        with self.lock:
+            self.merge_requested = True
+            if self.merger is not None:
+                return #the running merge thread checks again
+            self.merger = threading.Thread(target=self.merge_loop, daemon=True)
+            self.merger.start()
+
+    def merge_loop(self):
+        while True:
+            with self.lock:
+                if not self.merge_requested:
+                    self.merger = None
+                    return
+                self.merge_requested = False
+            while self.merge_step():
+                pass
+
+    def merge_step(self):
+        """
+        Merge one group of segments if any.
+
+        Returns
+        -------
+        bool
+            True if a merge was done.
+        """
+        with self.lock:
+            segments = self.merge_candidates()
+            if segments is None:
+                return False
+        self.merge(segments)
+        return True
+
+    def merge(self, segments):
+        """
+        Merge segments into one, dropping the documents hidden by
+        tombstones.
+        """
+        segments = sorted(segments, key=lambda segment: segment["seq"])
+        seq = segments[-1]["seq"]
+
+        def live_records():
+            for segment in segments:
+                with jsonlines.open(self.directory / segment["name"] / "records.jsonl") as reader:
+                    for o in reader:
+                        with self.lock:
+                            live = self.is_live(o.get("url"), segment["seq"])
+                        if live:
+                            yield o
+
+        merged = self.write_segment(live_records(), seq)
+        merged["merged"] = True #its records keep the tombstones of their former segments
+        names = {segment["name"] for segment in segments}
+        if merged["nb_documents"] == 0:
+            names.add(merged["name"]) #everything was deleted
+        with self.lock:
+            self.manifest["segments"] = [segment for segment in self.manifest["segments"]
+                                         if segment["name"] not in names]
+            if merged["nb_documents"]:
+                self.manifest["segments"].append(merged)
+            self.manifest["segments"].sort(key=lambda segment: segment["seq"])
+            self.save_manifest()
+            self.compact_tombstones()
+        for name in names:
+            shutil.rmtree(self.directory / name, ignore_errors=True) #open readers keep their mappings
+
+    def compact_tombstones(self):
+        """
+        Rewrite the tombstone log without the tombstones that no longer
+        hide any segment.
+        """
+        oldest = min((segment["seq"] for segment in self.manifest["segments"]), default=self.manifest["next_seq"])
+        self.tombstones = {url: seq for url, seq in self.tombstones.items() if seq > oldest}
+        tmp_path = self.directory / f"{TOMBSTONES}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for url, seq in self.tombstones.items():
+                f.write(f"{seq}\t{url}\n")
+        os.replace(tmp_path, self.directory / TOMBSTONES)
+
+    def wait(self):
+        """
+        Wait for the background merges to finish.
+        """
+        while True:
+            with self.lock:
+                merger = self.merger
+            if merger is None:
+                return
+            merger.join()
+
+    def snapshot(self):
+        """
+        Open a consistent view of the current segments for searching.
+
+        Returns
+        -------
+        SegmentsSnapshot
+        """
+        with self.lock:
+            return SegmentsSnapshot(self.directory, list(self.manifest["segments"]), dict(self.tombstones))
+
+
+def read_tombstones(path):
+    """
+    Replay a tombstone log: url -> highest sequence number.
+    """
+    tombstones = {}
+    if Path(path).exists():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                seq, url = line.rstrip("\n").split("\t", 1)
+                tombstones[url] = max(int(seq), tombstones.get(url, -1))
+    return tombstones
+
+
+class SegmentsSnapshot(Mapping):
+    """
+    Search view over a fixed list of segments, also a read-only mapping
+    URL -> record of the live documents.
+
+    The documents of the segments are numbered one after the other (global
+    doc id = base of the segment + doc id in the segment) and the
+    documents hidden by tombstones are left out of every posting. All the
+    files are opened (memory-mapped) when the snapshot is created, so it
+    stays usable after a merge removes its segments.
+
+    Attributes
+    ----------
+    documents : list of dict
+        Global doc id -> url and metadata.
+    live : list of int
+        Global ids of the live documents.
+    reviews : dict
+        Global doc id -> review statistics, for the live documents.
+    stats : dict or None
+        Statistics of the title and description fields of the live
+        documents, as in `stats.json` but without the document
+        frequencies (they change with the deletes); None if a segment was
+        written without `stats.json`.
+    """
+
+    def __init__(self, directory, segments, tombstones):
+        self.directory = Path(directory)
+        self.segments = segments
+        self.documents = []
+        self.live = []
+        self.reviews = {}
+        self.urls = {} #url -> global id, for the live documents
+        self.bases = []
+        self.deleted = [] #per segment, local ids of the hidden documents
+        self.readers = {} #index name -> PostingsReader of each segment
+        self.records = [] #per segment, (mapped records, offsets)
+        doc_lengths = {"title": [], "description": []}
+        for segment in segments:
+            path = self.directory / segment["name"]
+            base = len(self.documents)
+            with open(path / "documents.json", "r", encoding="utf-8") as f:
+                documents = json.load(f)
+            with open(path / "reviews.json", "r", encoding="utf-8") as f:
+                reviews = json.load(f)
+            deleted = set()
+            for doc, metadata in enumerate(documents):
+                if tombstones.get(metadata["url"], -1) <= segment["seq"]:
+                    self.live.append(base + doc)
+                    self.reviews[base + doc] = reviews[doc]
+                    self.urls[metadata["url"]] = base + doc
+                else:
+                    deleted.add(doc)
+            if doc_lengths is not None and (path / "stats.json").exists():
+                with open(path / "stats.json", "r", encoding="utf-8") as f:
+                    fields = json.load(f)["fields"]
+                for name, lengths in doc_lengths.items():
+                    lengths += [0 if doc in deleted else n for doc, n in enumerate(fields[name]["doc_lengths"])]
+            else:
+                doc_lengths = None
+            self.documents += documents
+            self.bases.append(base)
+            self.deleted.append(deleted)
+            for bin_path in sorted(path.glob("*.bin")):
+                self.readers.setdefault(bin_path.stem, []).append(PostingsReader(bin_path))
+            offsets = array("Q")
+            with open(path / "records.offsets", "rb") as f:
+                offsets.frombytes(f.read())
+            with open(path / "records.jsonl", "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if offsets[-1] else b""
+            self.records.append((data, offsets))
+        self.stats = None
+        if doc_lengths is not None:
+            fields = {}
+            for name, lengths in doc_lengths.items():
+                nb_documents = sum(1 for n in lengths if n)
+                fields[name] = {"avg_length": sum(lengths) / nb_documents if nb_documents else 0.0,
+                                "doc_lengths": lengths}
+            self.stats = {
+                "nb_documents": sum(1 for a, b in zip(doc_lengths["title"], doc_lengths["description"]) if a or b),
+                "fields": fields
+            }
+
+    def postings(self, name, convert=None):
+        """
+        Postings of one index (e.g. "positional_title") across segments.
+
+        Returns
+        -------
+        MultiSegmentPostings
+        """
+        return MultiSegmentPostings(self.readers.get(name, []), self.bases, self.deleted, convert)
+
+    def record(self, doc):
+        """
+        Record of a global doc id.
+        """
+        k = bisect_right(self.bases, doc) - 1
+        data, offsets = self.records[k]
+        local = doc - self.bases[k]
+        return json.loads(data[offsets[local]:offsets[local + 1]])
+
+    def __getitem__(self, url):
+        return self.record(self.urls[url])
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def __iter__(self):
+        return iter(self.urls)
+
+    def __len__(self):
+        return len(self.urls)
+
+
+class MultiSegmentPostings(Mapping):
+    """
+    Read-only mapping term -> postings with global doc ids, over the
+    postings readers of several segments.
+
+    Parameters
+    ----------
+    readers : list of PostingsReader
+        Readers of the same index in each segment.
+    bases : list of int
+        Global id of the first document of each segment.
+    deleted : list of set
+        Local ids of the hidden documents of each segment.
+    convert : callable, optional
+        Applied to the merged postings, as in `PostingsReader`.
+    cache_size : int, optional
+        Number of merged terms kept (default is 4096).
+    """
+
+    def __init__(self, readers, bases, deleted, convert=None, cache_size=4096):
+        self.readers = readers
+        self.bases = bases
+        self.deleted = deleted
+        self.convert = convert
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, term):
+        merged = []
+        found = False
+        for reader, base, deleted in zip(self.readers, self.bases, self.deleted):
+            postings = reader.get(term)
+            if postings is None:
+                continue
+            found = True
+            for posting in postings:
+                if isinstance(posting, list): #[doc id, positions]
+                    if posting[0] not in deleted:
+                        merged.append([base + posting[0], posting[1]])
+                elif posting not in deleted:
+                    merged.append(base + posting)
+        if not found:
+            return None
+        return merged if self.convert is None else self.convert(merged)
+
+    def get(self, term, default=None):
+        postings = self.lookup(term)
+        return default if postings is None else postings
+
+    def __getitem__(self, term):
+        postings = self.lookup(term)
+        if postings is None:
+            raise KeyError(term)
+        return postings
+
+    def __contains__(self, term):
+        return self.lookup(term) is not None
+
+    def __iter__(self):
+        seen = set()
+        for reader in self.readers:
+            for term in reader:
+                if term not in seen:
+                    seen.add(term)
+                    yield term
+
+    def __len__(self):
+        return sum(1 for _ in self)
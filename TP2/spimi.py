@@ -0,0 +1,299 @@
+import heapq
+import json
+import shutil
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+
+from index import FieldStats, IndexBuilder, collection_stats
+from postings import DOCS, POSITIONS, PostingsWriter, iter_postings
+
+#Estimated memory of a block, calibrated with tracemalloc on the products
+#corpus (CPython 3, 64 bits)
+TERM_BYTES = 600 #new term of a field: dict entries, positional dict, doc id set
+POSTING_BYTES = 150 #new (term, doc) pair: dict entry, positions list, set entry
+POSITION_BYTES = 10 #position appended to a list
+DOCUMENT_BYTES = 1200 #metadata, reviews, feature postings, URL -> doc id entry
+
+
+def dump_json_entries(f, entries, brackets):
+    """
+    Write a JSON array or object given as a stream of entries, with the
+    same text as `json.dump(..., ensure_ascii=False, indent=2)`.
+
+    Parameters
+    ----------
+    f : file
+        Text file open for writing.
+    entries : iterable
+        Values of the array, or (key, value) pairs of the object.
+    brackets : str
+        "[]" for an array, "{}" for an object.
+    """
+    f.write(brackets[0])
+    separator = "\n  "
+    for entry in entries:
+        if brackets == "{}":
+            key, value = entry
+            text = f"{json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False, indent=2)}"
+        else:
+            text = json.dumps(entry, ensure_ascii=False, indent=2)
+        f.write(separator)
+        f.write(text.replace("\n", "\n  "))
+        separator = ",\n  "
+    if separator != "\n  ":
+        f.write("\n")
+    f.write(brackets[1])
+
+
+def disjoint(postings, first, last):
+    """
+    Whether the documents of each sorted list come after those of the
+    previous one, the usual case of blocks filled in doc id order (a URL
+    seen again in a later block keeps its former, smaller doc id).
+    """
+    return all(first(b) > last(a) for a, b in zip(postings, postings[1:]))
+
+
+def merge_docs(postings):
+    """
+    Merge sorted doc id lists into one, without duplicates.
+    """
+    if disjoint(postings, itemgetter(0), itemgetter(-1)):
+        return [doc for docs in postings for doc in docs]
+    return [doc for doc, _ in groupby(heapq.merge(*postings))]
+
+
+def merge_positions(postings):
+    """
+    Merge [doc id, positions] pairs sorted by doc id, concatenating the
+    positions of a document found in several lists in list order.
+    """
+    if disjoint(postings, lambda pairs: pairs[0][0], lambda pairs: pairs[-1][0]):
+        return [pair for pairs in postings for pair in pairs]
+    merged = []
+    for doc, pairs in groupby(heapq.merge(*postings, key=itemgetter(0)), key=itemgetter(0)):
+        positions = []
+        for _, p in pairs:
+            positions += p
+        merged.append([doc, positions])
+    return merged
+
+
+def counted(merged, stats):
+    """
+    Pass the (term, postings) pairs of a positional index through, adding
+    them to a `FieldStats`.
+    """
+    for term, postings in merged:
+        stats.add(term, postings)
+        yield term, postings
+
+
+class ExternalIndexBuilder(IndexBuilder):
+    """
+    `IndexBuilder` for corpora larger than the memory, with single-pass
+    in-memory indexing (SPIMI).
+
+    Documents are indexed in memory as by `IndexBuilder` until the
+    estimated size of the current block reaches `memory_budget`. The block
+    is then flushed to `work_dir`: each index as a binary postings file
+    (terms sorted, doc ids sorted) and the documents table and reviews of
+    the block as JSON lines sorted by doc id. `save` k-way merges the
+    blocks, one term at a time, into the final indexes, which are the same
+    as those of `IndexBuilder` (the JSON objects list their terms in
+    sorted order). `indexes` merges them in memory instead, for corpora
+    that fit in it.
+
+    Only the URL -> doc id map and the merge heads stay in memory for the
+    whole corpus. The block size is estimated from the number of terms,
+    postings, positions and documents it holds (see `TERM_BYTES`...).
+
+    Parameters
+    ----------
+    memory_budget : int, optional
+        Estimated size in bytes of a block (default is 256 MB).
+    work_dir : str, optional
+        Directory for the blocks (default is the system temporary
+        directory); they are removed by `save`.
+    index : Index, optional
+        Index providing the tokenizer and the stop words.
+    features_to_keep : list of str, optional
+        Features of `product_features` to index.
+    """
+
+    def __init__(self, memory_budget=256 * 2**20, work_dir=None, index=None,
+                 features_to_keep=("brand", "origin", "material", "size")):
+        super().__init__(index, features_to_keep)
+        self.memory_budget = memory_budget
+        self.work_dir = Path(tempfile.mkdtemp(prefix="spimi_", dir=work_dir))
+        self.blocks = [] #flushed block directories, in order
+        self.documents = {} #doc id -> metadata, for the current block
+        self.reviews = {}
+        self.block_bytes = 0
+
+    def docid(self, o):
+        url = o.get("url")
+        doc = self.docids.setdefault(url, len(self.docids))
+        self.documents[doc] = self.metadata(o)
+        return doc
+
+    def add_field(self, inverted, positional, doc, terms):
+        for pos, term in terms:
+            postings = positional.get(term)
+            if postings is None:
+                postings = positional[term] = {}
+                inverted[term] = set()
+                self.block_bytes += TERM_BYTES
+            positions = postings.get(doc)
+            if positions is None:
+                positions = postings[doc] = []
+                inverted[term].add(doc)
+                self.block_bytes += POSTING_BYTES
+            positions.append(pos)
+        self.block_bytes += POSITION_BYTES * len(terms)
+
+    def add(self, o):
+        super().add(o)
+        self.block_bytes += DOCUMENT_BYTES
+        if self.block_bytes >= self.memory_budget:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the current block to disk and empty it.
+        """
+        block = self.work_dir / f"block_{len(self.blocks)}"
+        for name, inverted in self.inverted_indexes().items():
+            with PostingsWriter(block / f"{name}.bin", DOCS) as writer:
+                for term in sorted(inverted):
+                    writer.add(term, sorted(inverted[term]))
+                    del inverted[term] #freed as soon as written
+        for name, positional in (("positional_title", self.positional_title),
+                                 ("positional_description", self.positional_description)):
+            with PostingsWriter(block / f"{name}.bin", POSITIONS) as writer:
+                for term in sorted(positional):
+                    postings = positional.pop(term)
+                    writer.add(term, [[doc, postings[doc]] for doc in sorted(postings)])
+        with open(block / "documents.jsonl", "w", encoding="utf-8") as f:
+            for doc in sorted(self.documents):
+                f.write(json.dumps([doc, self.documents[doc], self.reviews[doc]], ensure_ascii=False) + "\n")
+        self.documents.clear()
+        self.reviews.clear()
+        self.blocks.append(block)
+        self.block_bytes = 0
+
+    def inverted_indexes(self):
+        """
+        Inverted and feature indexes of the current block, by file name
+        (without extension).
+        """
+        result = {"inverted_title": self.inverted_title, "inverted_description": self.inverted_description}
+        for feat_name, feat_index in self.features.items():
+            result[f"{feat_name}_index"] = feat_index
+        return result
+
+    def indexes(self):
+        """
+        Return the indexes of `IndexBuilder.indexes`, merging the blocks in
+        memory. The current block is flushed first; documents can still be
+        added afterwards.
+        """
+        if self.documents or not self.blocks:
+            self.flush()
+        rows = list(self.merged_documents())
+        result = {"documents.json": [row[1] for row in rows], "reviews.json": [row[2] for row in rows]}
+        stats = self.field_stats()
+        for name, merged in self.merged_indexes(stats):
+            result[f"{name}.json"] = dict(merged)
+        result["stats.json"] = collection_stats(*stats.values())
+        return result
+
+    def postings_names(self):
+        """
+        File names (without extension) of the postings indexes, the
+        positional ones first.
+        """
+        return ["positional_title", "positional_description", *self.inverted_indexes()]
+
+    def stats(self):
+        if self.documents or not self.blocks:
+            self.flush()
+        stats = self.field_stats()
+        for name, field in stats.items():
+            for term, postings in self.merged_postings(name):
+                field.add(term, postings)
+        return collection_stats(*stats.values())
+
+    def field_stats(self):
+        """
+        Empty `FieldStats` of the title and description, by positional
+        index name.
+        """
+        return {"positional_title": FieldStats(len(self.docids)),
+                "positional_description": FieldStats(len(self.docids))}
+
+    def merged_documents(self):
+        """
+        Yield (doc id, metadata, reviews) by doc id, the last block holding
+        a document giving its final values.
+        """
+        files = [open(block / "documents.jsonl", "r", encoding="utf-8") for block in self.blocks]
+        try:
+            rows = heapq.merge(*(map(json.loads, f) for f in files), key=itemgetter(0))
+            for _, group in groupby(rows, key=itemgetter(0)):
+                *_, last = group
+                yield last
+        finally:
+            for f in files:
+                f.close()
+
+    def merged_postings(self, name):
+        """
+        Yield (term, postings) of an index in term order, merging the
+        blocks.
+        """
+        merge = merge_positions if name.startswith("positional") else merge_docs
+        streams = [((term, k, postings) for term, postings in iter_postings(block / f"{name}.bin"))
+                   for k, block in enumerate(self.blocks)]
+        for term, group in groupby(heapq.merge(*streams, key=itemgetter(0, 1)), key=itemgetter(0)):
+            yield term, merge([postings for _, _, postings in group])
+
+    def merged_indexes(self, stats):
+        """
+        Yield (name, (term, postings) stream) for every postings index,
+        the positional ones first, adding their postings to `stats` as
+        they are read.
+        """
+        for name in self.postings_names():
+            merged = self.merged_postings(name)
+            yield name, counted(merged, stats[name]) if name in stats else merged
+
+    def save(self, output_dir, binary=False):
+        """
+        Flush the last block and merge all the blocks into the indexes of
+        `IndexBuilder.save`, then remove the blocks. This ends the build.
+        """
+        if self.documents or not self.blocks:
+            self.flush()
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            for name, column in (("documents.json", 1), ("reviews.json", 2)):
+                with open(output_dir / name, "w", encoding="utf-8") as f:
+                    dump_json_entries(f, (row[column] for row in self.merged_documents()), "[]")
+            stats = self.field_stats()
+            for name, merged in self.merged_indexes(stats):
+                if binary:
+                    kind = POSITIONS if name.startswith("positional") else DOCS
+                    with PostingsWriter(output_dir / f"{name}.bin", kind) as writer:
+                        for term, postings in merged:
+                            writer.add(term, postings)
+                else:
+                    with open(output_dir / f"{name}.json", "w", encoding="utf-8") as f:
+                        dump_json_entries(f, merged, "{}")
+            self.index.save_index(collection_stats(*stats.values()), output_dir / "stats.json")
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            self.blocks = []
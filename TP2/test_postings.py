@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from postings import (DOCS, POSITIONS, PostingsReader, decode_docs, decode_positions, decode_varints, encode_docs,
+                      encode_positions, encode_varints, find_term, load_postings, save_postings)
+
+DOCS_INDEX = {"": [0], "a": [0, 1, 2], "café": [3, 10 ** 9], "日本": [7], "big": list(range(0, 10 ** 6, 7))}
+POSITIONS_INDEX = {"x": [[0, [0, 3]], [4, [2]]], "y": [[1, [5]], [3, [0]]], "é": [[2 ** 40, [0, 200, 70000]]],
+                   "zzz": []}
+
+
+def test_varints():
+    values = [0, 1, 127, 128, 255, 16383, 16384, 2 ** 31, 2 ** 63 + 5]
+    assert decode_varints(encode_varints(values)) == values
+    assert decode_varints(b"") == []
+    assert decode_docs(encode_docs([])) == []
+    assert decode_positions(encode_positions([])) == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_postings(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        docs = sorted(rng.sample(range(10 ** rng.randint(1, 7)), rng.randint(1, 10)))
+        assert decode_docs(encode_docs(docs)) == docs
+        pairs = [[doc, sorted(rng.sample(range(5000), rng.randint(1, 6)))] for doc in docs]
+        assert decode_positions(encode_positions(pairs)) == pairs
+        pairs[-1][1].reverse()
+        assert decode_positions(encode_positions(pairs)) == pairs
+        single = [[doc, [rng.randrange(300)]] for doc in docs] #one position per document
+        assert decode_positions(encode_positions(single)) == single
+
+
+def test_positions_are_delta_encoded():
+    assert encode_positions([[5, [100, 101, 103]]]) == bytes([1, 1, 5, 3, 100, 1, 2])
+    assert encode_positions([[5, [1000, 1001]]]) == encode_varints([1, 1, 5, 2, 1000, 1])
+
+
+def test_unsorted_positions():
+    pairs = [[0, [4, 9]], [2, [0, 3, 0, 3]], [7, [1]]] #doc 2 indexed twice
+    assert encode_positions(pairs)[1] == 0
+    assert decode_positions(encode_positions(pairs)) == pairs
+
+
+def test_files(tmp_path):
+    save_postings(DOCS_INDEX, tmp_path / "docs.bin", DOCS)
+    save_postings(POSITIONS_INDEX, tmp_path / "pos.bin", POSITIONS)
+    assert load_postings(tmp_path / "docs.bin") == DOCS_INDEX
+    assert load_postings(tmp_path / "pos.bin") == POSITIONS_INDEX
+
+    data = (tmp_path / "docs.bin").read_bytes()
+    for term, docs in DOCS_INDEX.items():
+        df, offset, length = find_term(data, term)
+        assert df == len(docs) and decode_docs(data, offset, offset + length) == docs
+    assert find_term(data, "b") is None and find_term(data, "zz") is None
+
+    reader = PostingsReader(tmp_path / "pos.bin", convert=dict)
+    assert reader["x"] == {0: [0, 3], 4: [2]} and reader.df("é") == 1 and "w" not in reader
+    assert sorted(reader) == sorted(POSITIONS_INDEX)
+    reader.close()
+
+    save_postings({}, tmp_path / "empty.bin")
+    assert load_postings(tmp_path / "empty.bin") == {}
@@ -0,0 +1,38 @@
+import json
+import os
+from pathlib import Path
+
+from index import IndexBuilder
+from spimi import ExternalIndexBuilder
+
+INPUT = Path(__file__).resolve().parent / "input" / "products_with_id.jsonl"
+BUDGET = 64 * 2**10 #a few documents per block
+
+
+def documents():
+    with open(INPUT, "r", encoding="utf-8") as f:
+        docs = [json.loads(line) for line in f]
+    return docs + docs[20:60] #URLs seen again in later blocks
+
+
+def test_index_larger_than_budget(tmp_path):
+    docs = documents()
+    (tmp_path / "memory").mkdir()
+    IndexBuilder().add_all(docs).save(tmp_path / "memory", binary=True)
+    builder = ExternalIndexBuilder(memory_budget=BUDGET, work_dir=tmp_path).add_all(docs)
+    assert len(builder.blocks) > 1
+    builder.save(tmp_path / "external", binary=True)
+
+    names = sorted(os.listdir(tmp_path / "memory"))
+    assert names == sorted(os.listdir(tmp_path / "external"))
+    for name in names:
+        assert (tmp_path / "memory" / name).read_bytes() == (tmp_path / "external" / name).read_bytes(), name
+
+
+def test_indexes_merged_in_memory(tmp_path):
+    docs = documents()
+    builder = ExternalIndexBuilder(memory_budget=BUDGET, work_dir=tmp_path).add_all(docs[:100])
+    builder.indexes() #flushes the current block, the build goes on
+    builder.add_all(docs[100:])
+    assert len(builder.blocks) > 1
+    assert builder.indexes() == IndexBuilder().add_all(docs).indexes()
@@ -0,0 +1,110 @@
+import multiprocessing
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "TP2")) #index builder
+
+from bench_index import make_input
+from index import IndexBuilder
+from websearcher import Websearcher
+
+QUERIES = ["sandals", "candy", "energy potion", "cat-ear beanie", "italian sneakers",
+           "versatile italian sneakers with good reviews"]
+
+
+def memory():
+    """
+    Resident memory of the process in MB: total, and private (not shared
+    with other processes through the page cache).
+    """
+    values = {}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return values["Rss"], values["Private_Clean"] + values["Private_Dirty"]
+
+
+def run(index_dir, products_path, ext, lazy):
+    start = time.perf_counter()
+    websearcher = Websearcher(
+        title_pos_path=f"{index_dir}/positional_title.{ext}",
+        desc_pos_path=f"{index_dir}/positional_description.{ext}",
+        reviews_path=f"{index_dir}/reviews.json",
+        synonyms_path=str(Path(__file__).resolve().parent / "input" / "origin_synonyms.json"),
+        origin_path=f"{index_dir}/made in_index.{ext}",
+        brand_path=f"{index_dir}/brand_index.{ext}",
+        documents_path=f"{index_dir}/documents.json",
+        products_path=products_path,
+        lazy=lazy,
+        stats_path=f"{index_dir}/stats.json"
+    )
+    startup = time.perf_counter() - start
+    rss_start, _ = memory()
+    start = time.perf_counter()
+    candidates = [websearcher.filter_documents(query, mode) for query in QUERIES for mode in ("OR", "AND")]
+    per_query = (time.perf_counter() - start) / len(candidates)
+    start = time.perf_counter()
+    results = [websearcher.search(query, mode)["search_result"] for query in QUERIES for mode in ("OR", "AND")]
+    per_search = (time.perf_counter() - start) / len(results)
+    rss, private = memory()
+    urls = [sorted(websearcher.doc_url(doc) for doc in docs) for docs in candidates]
+    return startup, rss_start, per_query, per_search, rss, private, (urls, results)
+
+
+def former_ranking_cost(index_dir, products_path):
+    """
+    Time of the former BM25 length normalisation of one search: a walk
+    over the title and description positional indexes for every candidate
+    document (estimated from one walk).
+    """
+    websearcher = Websearcher(
+        title_pos_path=f"{index_dir}/positional_title.json",
+        desc_pos_path=f"{index_dir}/positional_description.json",
+        reviews_path=f"{index_dir}/reviews.json",
+        synonyms_path=str(Path(__file__).resolve().parent / "input" / "origin_synonyms.json"),
+        origin_path=f"{index_dir}/made in_index.json",
+        brand_path=f"{index_dir}/brand_index.json",
+        documents_path=f"{index_dir}/documents.json",
+        products_path=products_path
+    )
+    start = time.perf_counter()
+    websearcher._compute_doc_lengths(websearcher.title_pos)
+    websearcher._compute_doc_lengths(websearcher.desc_pos)
+    walk = time.perf_counter() - start
+    candidates = [len(websearcher.filter_documents(query, mode)) for query in QUERIES for mode in ("OR", "AND")]
+    return walk * sum(candidates) / len(candidates)
+
+
+if __name__ == "__main__":
+    nb_records = 20000
+    with tempfile.TemporaryDirectory(prefix="search_") as workdir:
+        products_path = f"{workdir}/products_with_id.jsonl"
+        make_input(products_path, str(Path(__file__).resolve().parent.parent / "TP2/input/products_with_id.jsonl"),
+                   nb_records)
+        builder = IndexBuilder(features_to_keep=["brand", "made in"]).add_file(products_path)
+        builder.save(workdir)
+        builder.save(workdir, binary=True)
+        del builder
+        print(f"{nb_records} documents")
+
+        rankings = []
+        scenarios = (("JSON, fully loaded", "json", False), ("binary, lazy, 1st run", "bin", True),
+                     ("binary, lazy", "bin", True)) #the 1st run writes the .idx of the product store
+        for name, ext, lazy in scenarios:
+            with ProcessPoolExecutor(1, multiprocessing.get_context("spawn")) as runner:
+                startup, rss_start, per_query, per_search, rss, private, ranking = runner.submit(
+                    run, workdir, products_path, ext, lazy).result()
+            rankings.append(ranking)
+            print(f"{name:<22}: startup {startup:6.2f}s, RSS {rss_start:5.0f} MB after startup,"
+                  f" {1000 * per_query:7.1f} ms/filter, {1000 * per_search:7.1f} ms/search,"
+                  f" RSS {rss:5.0f} MB after queries ({private:5.0f} MB private)")
+        assert rankings[0] == rankings[1] == rankings[2]
+        print("same candidate documents and rankings")
+        with ProcessPoolExecutor(1, multiprocessing.get_context("spawn")) as runner:
+            former = runner.submit(former_ranking_cost, workdir, products_path).result()
+        print(f"BM25 lengths recomputed per candidate (before stats.json): about {former:.0f} s/search")
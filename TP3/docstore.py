@@ -0,0 +1,153 @@
+import json
+import mmap
+import os
+import re
+from collections.abc import Mapping
+
+SEPARATOR = re.compile(r"[\s,]*") #between the elements of a JSON array
+
+
+def map_file(path):
+    """
+    Memory-map a file for reading (an empty bytes object for an empty file).
+    """
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+
+def is_stale(index_path, path):
+    """
+    Whether the offsets file `index_path` is missing or older than `path`.
+    """
+    return not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(path)
+
+
+class JsonlStore(Mapping):
+    """
+    Read-only mapping URL -> document over a memory-mapped JSONL file.
+
+    Only the position of each line is kept in memory, in an `.idx` file
+    (offset, length and URL of each line, as the crawler archive does); a
+    document is parsed when it is looked up. The `.idx` file is rebuilt
+    when the JSONL is newer.
+
+    Parameters
+    ----------
+    path : str
+        Path to the JSONL file, one document with a `url` per line.
+    index_path : str, optional
+        Path to the `.idx` file (default is `<path>.idx`, next to the
+        JSONL).
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = f"{path}.idx" if index_path is None else index_path
+        self.data = map_file(path)
+        if is_stale(self.index_path, path):
+            self.build_index()
+        self.offsets = {}
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                offset, length, url = line.rstrip("\n").split("\t", 2)
+                self.offsets[url] = (int(offset), int(length))
+
+    def build_index(self):
+        """
+        Write the `.idx` file of the JSONL (one pass over the file).
+        """
+        tmp_path = f"{self.index_path}.tmp"
+        with open(self.path, "rb") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+            offset = 0
+            for line in src:
+                if line.strip():
+                    url = json.loads(line)["url"]
+                    dst.write(f"{offset}\t{len(line)}\t{url}\n")
+                offset += len(line)
+        os.replace(tmp_path, self.index_path) #atomic
+
+    def __getitem__(self, url):
+        offset, length = self.offsets[url]
+        return json.loads(self.data[offset:offset + length])
+
+    def __contains__(self, url):
+        return url in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+class JsonListStore(Mapping):
+    """
+    Read-only mapping position -> element over a memory-mapped JSON array
+    file, such as the `documents.json` and `reviews.json` tables of TP2
+    `index.py`.
+
+    Only the position of each element is kept in memory, in an `.idx` file
+    (offset and length of each element); an element is parsed when it is
+    looked up. The `.idx` file is rebuilt when the JSON file is newer.
+
+    Parameters
+    ----------
+    path : str
+        Path to the JSON file, holding one array.
+    index_path : str, optional
+        Path to the `.idx` file (default is `<path>.idx`).
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = f"{path}.idx" if index_path is None else index_path
+        self.data = map_file(path)
+        if is_stale(self.index_path, path):
+            self.build_index()
+        self.offsets = []
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                offset, length = line.split("\t")
+                self.offsets.append((int(offset), int(length)))
+
+    def build_index(self):
+        """
+        Write the `.idx` file of the array (one pass over the file).
+        """
+        text = bytes(self.data).decode("utf-8")
+        decoder = json.JSONDecoder()
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as dst:
+            pos = SEPARATOR.match(text, text.index("[") + 1).end()
+            offset = len(text[:pos].encode("utf-8"))
+            while text[pos] != "]":
+                _, end = decoder.raw_decode(text, pos)
+                length = len(text[pos:end].encode("utf-8"))
+                dst.write(f"{offset}\t{length}\n")
+                next_pos = SEPARATOR.match(text, end).end()
+                offset += length + next_pos - end #the separators are ASCII
+                pos = next_pos
+        os.replace(tmp_path, self.index_path) #atomic
+
+    def __getitem__(self, position):
+        if not isinstance(position, int) or not 0 <= position < len(self.offsets):
+            raise KeyError(position)
+        offset, length = self.offsets[position]
+        return json.loads(self.data[offset:offset + length])
+
+    def __contains__(self, position):
+        return isinstance(position, int) and 0 <= position < len(self.offsets)
+
+    def __iter__(self):
+        return iter(range(len(self.offsets)))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
@@ -5,8 +5,16 @@ import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import RegexpTokenizer
 import jsonlines    
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "TP2")) #analyzer and binary postings format
+
+from analyzer import Analyzer
+from postings import PostingsReader
+from segments import SegmentedIndex
+from docstore import JsonListStore, JsonlStore
+
 class Websearcher:
 
     def __init__(self,
@@ -15,27 +23,167 @@ class Websearcher:
                  reviews_path,
                  synonyms_path,
                  origin_path,
-                 brand_path):
-        self.title_pos = self._load_json(title_pos_path)     
-        self.desc_pos = self._load_json(desc_pos_path)       
-        self.reviews = self._load_json(reviews_path)
-        self.synonyms = self._load_json(synonyms_path)
-        self.origin = self._load_json(origin_path)
-        self.brand = self._load_json(brand_path)
-        self.data = self.read_jsonl("/home/ensai/Documents/Indexation/TpScrawler/TP3/input/rearranged_products.jsonl")
+                 brand_path,
+                 documents_path=None,
+                 products_path="/home/ensai/Documents/Indexation/TpScrawler/TP3/input/rearranged_products.jsonl",
+                 lazy=False,
+                 stats_path=None,
+                 store_index_path=None):
+        docids = documents_path is not None
+        if lazy and not docids:
+            raise ValueError("lazy loading needs indexes built with doc ids (documents_path)")
+        if stats_path is not None and not docids:
+            raise ValueError("stats.json is indexed by doc id: documents_path is needed")
+        if lazy: #nothing is parsed before a query needs it
+            for path in (title_pos_path, desc_pos_path, origin_path, brand_path):
+                if not str(path).endswith(".bin"):
+                    raise ValueError(f"lazy loading needs binary indexes (.bin), got {path}")
+            documents = JsonListStore(documents_path)
+            reviews = JsonListStore(reviews_path)
+            data = JsonlStore(products_path, store_index_path)
+            stats = None if stats_path is None else str(stats_path) #read the first time it is needed
+            docs = range(len(documents)) if stats_path is None else None
+        else:
+            documents = None #doc id -> url and metadata, for indexes built with doc ids
+            reviews = self._load_json(reviews_path)
+            if docids:
+                documents = self._load_json(documents_path)
+                reviews = {doc: r for doc, r in enumerate(reviews) if r is not None}
+            data = self.read_jsonl(products_path)
+            stats = self._load_json(stats_path) if stats_path is not None else None
+            docs = None
+        self._setup(self._load_index(title_pos_path, dict if docids else None),
+                    self._load_index(desc_pos_path, dict if docids else None),
+                    reviews,
+                    self._load_json(synonyms_path),
+                    self._load_index(origin_path, set if docids else None),
+                    self._load_index(brand_path, set if docids else None),
+                    data, documents, docs, stats)
+
+    @classmethod
+    def from_segments(cls, segments_dir, synonyms_path, origin_feature="origin", brand_feature="brand"):
+        """
+        Build a search engine over the current segments of an incrementally
+        updated index (TP2 `segments.py`).
+
+        Parameters
+        ----------
+        segments_dir : str
+            Directory of the `SegmentedIndex`.
+        synonyms_path : str
+            Path to the synonyms JSON file.
+        origin_feature, brand_feature : str, optional
+            Feature indexes used as origin and brand.
+
+        Returns
+        -------
+        Websearcher
+            Search engine over a snapshot of the segments: later updates are
+            seen by a new one.
+        """
+        snapshot = SegmentedIndex(segments_dir, background=False, recover=False).snapshot()
+        websearcher = cls.__new__(cls)
+        websearcher._setup(
+            snapshot.postings("positional_title", dict),
+            snapshot.postings("positional_description", dict),
+            snapshot.reviews,
+            websearcher._load_json(synonyms_path),
+            snapshot.postings(f"{origin_feature}_index", set),
+            snapshot.postings(f"{brand_feature}_index", set),
+            snapshot, #url -> record of the live documents
+            snapshot.documents,
+            snapshot.live,
+            snapshot.stats
+        )
+        return websearcher
+
+    def _setup(self, title_pos, desc_pos, reviews, synonyms, origin, brand, data, documents=None, docs=None,
+               stats=None):
+        """
+    Set the indexes and the document store of the search engine.
+
+    Parameters
+    ----------
+    title_pos, desc_pos : mapping
+        Positional indexes of the title and the description.
+    reviews : mapping
+        Document -> review statistics.
+    synonyms : dict
+        Synonyms dictionary.
+    origin, brand : mapping
+        Feature indexes.
+    data : mapping
+        URL -> document (title and description).
+    documents : list of dict, optional
+        Doc id -> url and metadata, for indexes built with doc ids.
+    docs : iterable, optional
+        Documents of the collection. If None, they are the documents with
+        a title or description term, read from the statistics when given,
+        else from the positional indexes.
+    stats : dict or str, optional
+        Field statistics (`stats.json` of TP2 `index.py`), or the path of
+        the file, read the first time they are needed. If None, they are
+        computed from the positional indexes the first time a field is
+        ranked.
+    """
+        self.title_pos = title_pos
+        self.desc_pos = desc_pos
+        self.reviews = reviews
+        self.synonyms = synonyms
+        self.origin = origin
+        self.brand = brand
+        self.data = data
+        self.documents = documents
+        self.stats = stats
+        self.field_stats = {} #field -> lengths, df
         nltk.download('stopwords')
         nltk.download('punkt')
         self.stop_words = set(stopwords.words('english')) #words we dont want
-        self.docs = set()
-        for idx in (self.title_pos, self.desc_pos):
-            for posting in idx.values():
-                self.docs.update(posting.keys())
-        # Number of documents
-        self.N = len(self.docs)
+        self.analyzer = Analyzer(self.stop_words) #same analysis as the indexes
+        self._docs = docs
+
+    def collection_stats(self):
+        """
+    Field statistics of the collection, loaded on the first call when
+    given as a path.
+
+    Returns
+    -------
+    dict or None
+        Content of `stats.json`, None if it was not given.
+    """
+        if isinstance(self.stats, str):
+            self.stats = self._load_json(self.stats)
+        return self.stats
+
+    @property
+    def docs(self):
+        """
+    Documents of the collection, found on the first use.
+    """
+        if self._docs is None:
+            stats = self.collection_stats()
+            if stats is not None:
+                lengths = zip(stats["fields"]["title"]["doc_lengths"], stats["fields"]["description"]["doc_lengths"])
+                self._docs = [doc for doc, (a, b) in enumerate(lengths) if a or b]
+            else:
+                self._docs = set()
+                for idx in (self.title_pos, self.desc_pos):
+                    for posting in idx.values():
+                        self._docs.update(posting.keys())
+        return self._docs
+
+    @property
+    def N(self):
+        """
+    Number of documents.
+    """
+        return len(self.docs)
 
     def tokenize(self, query):
         """
-    Tokenize and normalize a user query.
+    Tokenize and normalize a user query, with the analyzer used to build
+    the indexes.
 
     Parameters
     ----------
@@ -46,10 +194,7 @@ class Websearcher:
     -------
     list of str
     """
-        
-        raw = query.lower().split()
-        cleaned = [w.strip('.,!?;"\'()[]{}').lower() for w in raw]
-        return [w for w in cleaned if w and w not in self.stop_words] #if the query is not empty and not a stop word...
+        return self.analyzer.analyze(query)
     
     def _load_json(self, path):
         """
@@ -69,6 +214,44 @@ class Websearcher:
             return json.load(f)
 
 
+    def _load_index(self, path, convert=None):
+        """
+    Load an index file.
+
+    JSON files are fully loaded. Binary postings files (`.bin`, TP2
+    `postings.py`) are memory-mapped and each term is decoded the first
+    time a query looks it up.
+
+    Parameters
+    ----------
+    path : str
+        Path to the index file.
+    convert : callable, optional
+        Applied to the postings of each term (e.g. `dict` to turn
+        [doc id, positions] pairs into a dict, `set` for doc id lists).
+
+    Returns
+    -------
+    dict or PostingsReader
+        Mapping token -> postings.
+    """
+        if str(path).endswith(".bin"):
+            if convert is None:
+                raise ValueError("binary indexes hold doc ids: documents_path is needed")
+            return PostingsReader(path, convert=convert)
+        index = self._load_json(path)
+        if convert is not None:
+            index = {tok: convert(postings) for tok, postings in index.items()}
+        return index
+
+    def doc_url(self, document):
+        """
+    Return the URL of a document identifier (doc id or URL).
+    """
+        if self.documents is None:
+            return document
+        return self.documents[document]["url"]
+
     def read_jsonl(self, path):
         """
         Parameter
@@ -109,13 +292,13 @@ class Websearcher:
             # Case 1: token is a key in the synonyms dictionary
             if t in self.synonyms:
                 for syn in self.synonyms[t]:
-                    expanded.update(syn.lower().split())
+                    expanded.update(self.analyzer.analyze(syn))
 
             # Case 2: token appears in a synonym list 
             for key, syns in self.synonyms.items():
                 for syn in syns:
-                    if t in syn.lower().split():
-                        expanded.update(key.lower().split())
+                    if t in self.analyzer.analyze(syn):
+                        expanded.update(self.analyzer.analyze(key))
 
         return expanded
     
@@ -253,12 +436,61 @@ class Websearcher:
         IDF value of the token. Returns 0.0 if the token does not appear
         in any document.
     """
-        idx = self.desc_pos if field == "desc" else self.title_pos
-        n = len(idx.get(token, {}))
+        n = self.df(token, field=field)
         if n == 0:
             return 0.0
         return math.log(self.N / n)
 
+    def df(self, token, field="desc"):
+        """
+    Document frequency of a token in a field, read from the field
+    statistics when they have it.
+
+    Parameters
+    ----------
+    token : str
+        Query token.
+    field : str, optional
+        Field to consider ("desc" for description or "title").
+        Default is "desc".
+
+    Returns
+    -------
+    int
+        Number of documents containing the token in the field.
+    """
+        df = self._field_stats(field).get("df")
+        if df is not None:
+            return df.get(token, 0)
+        idx = self.desc_pos if field == "desc" else self.title_pos
+        return len(idx.get(token, {}))
+
+    def _field_stats(self, field):
+        """
+    Statistics of a field: document lengths, average length and, when
+    loaded from `stats.json`, document frequencies. Computed from the
+    positional index on the first call if they were not given.
+
+    Parameters
+    ----------
+    field : str
+        Field to consider ("desc" for description or "title").
+
+    Returns
+    -------
+    dict
+        "doc_lengths" (doc id -> length, a list for stats files or a dict),
+        "avg_length" and optionally "df".
+    """
+        name = "title" if field == "title" else "description"
+        if name not in self.field_stats and self.collection_stats() is not None:
+            self.field_stats[name] = self.stats["fields"][name]
+        if name not in self.field_stats:
+            idx = self.title_pos if field == "title" else self.desc_pos
+            doc_lengths, avg_length = self._compute_doc_lengths(idx)
+            self.field_stats[name] = {"doc_lengths": doc_lengths, "avg_length": avg_length}
+        return self.field_stats[name]
+
     
     def _compute_doc_lengths(self, pos_index):
         """
@@ -331,11 +563,9 @@ class Websearcher:
         BM25 relevance score of the document for the given tokens and field.
     """
     
-        if field == "title":
-            dl_dict, avg_len = self._compute_doc_lengths(self.title_pos)
-        else:
-            dl_dict, avg_len = self._compute_doc_lengths(self.desc_pos)
-        dl = dl_dict.get(url, 0)
+        stats = self._field_stats(field) #O(1) per document, not a walk over the index
+        lengths, avg_len = stats["doc_lengths"], stats["avg_length"]
+        dl = lengths.get(url, 0) if isinstance(lengths, dict) else lengths[url]
         score = 0.0
         for t in tokens:
             f = self.tf(t, url, field=field)   
@@ -419,7 +649,7 @@ class Websearcher:
             score += 4.0 * brand_hits
             score += 6.0 * origin_hits
 
-            r = self.reviews.get(url, {})
+            r = self.reviews.get(url) or {} #null for documents without reviews
             nb = r.get("nb_ratings", 0)
             avg = r.get("avg_rating", 0)
             score += math.log(1 + nb) * avg * 0.5
@@ -469,8 +699,9 @@ class Websearcher:
     tuple of str
         The document title and description.
     """
-        title = self.data[document]["title"]
-        description = self.data[document]["description"]
+        url = self.doc_url(document)
+        title = self.data[url]["title"]
+        description = self.data[url]["description"]
         return title, description
     
     def search(self, request, mode="OR", top_k=20):
@@ -519,7 +750,7 @@ class Websearcher:
         search_result = {}
         for score, doc in scored:
             title, description = self.extract_title_and_description(doc)
-            search_result[doc] = {
+            search_result[self.doc_url(doc)] = {
                 "rank": score,
                 "title": title,
                 "description": description